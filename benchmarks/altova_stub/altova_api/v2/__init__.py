@@ -0,0 +1 @@
+"""Stand-in for the parts of the RaptorXML Python API v2 used by eba_validation.py."""
@@ -0,0 +1,548 @@
+"""Stand-in for altova_api.v2.xbrl.
+
+Implements the XBRL instance object model used by eba_validation.py on top of xml.etree.ElementTree. It is
+intended for benchmarks and local testing only: there is no XBRL 2.1 or Dimensions validation and all
+taxonomy information comes from a synthetic DTS (see taxonomy.DTS).
+"""
+
+import datetime
+import enum
+import os
+import re
+import xml.etree.ElementTree as ElementTree
+
+from .. import xml
+from .. import xsd
+from . import taxonomy
+
+XBRLI = 'http://www.xbrl.org/2003/instance'
+LINK = 'http://www.xbrl.org/2003/linkbase'
+XLINK = 'http://www.w3.org/1999/xlink'
+XBRLDI = 'http://xbrl.org/2006/xbrldi'
+XSI = 'http://www.w3.org/2001/XMLSchema-instance'
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+ISO4217 = 'http://www.xbrl.org/2003/iso4217'
+
+class Aspect(enum.Enum):
+    CONCEPT = 'concept'
+    ENTITY_IDENTIFIER = 'entity-identifier'
+    PERIOD = 'period'
+    UNIT = 'unit'
+
+class Error:
+    """A structured error message with optional location, parameters and child errors."""
+
+    def __init__(self, message, severity, location, children, params):
+        self.message = message
+        self.severity = severity
+        self.location = location
+        self.children = children
+        self.params = params
+
+    @classmethod
+    def create(cls, message, severity=xml.ErrorSeverity.ERROR, location=None, children=None, **params):
+        return cls(message, severity, location, list(children or []), params)
+
+    @property
+    def text(self):
+        try:
+            return self.message.format(**{name: str(value) for name, value in self.params.items()})
+        except (KeyError, IndexError, ValueError):
+            return self.message
+
+    def __str__(self):
+        return self.text
+
+class EntityIdentifierAspectValue:
+    __slots__ = ('scheme', 'value')
+
+    def __init__(self, scheme, value):
+        self.scheme = scheme
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, EntityIdentifierAspectValue) and (self.scheme, self.value) == (other.scheme, other.value)
+
+    def __hash__(self):
+        return hash((self.scheme, self.value))
+
+class PeriodAspectValue:
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, other):
+        return isinstance(other, PeriodAspectValue) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+class UnitAspectValue:
+    __slots__ = ('numerator', 'denominator')
+
+    def __init__(self, numerator, denominator=()):
+        self.numerator = tuple(sorted(numerator, key=lambda q: (q.namespace_name or '', q.local_name)))
+        self.denominator = tuple(sorted(denominator, key=lambda q: (q.namespace_name or '', q.local_name)))
+
+    def is_monetary(self):
+        return len(self.numerator) == 1 and not self.denominator and self.numerator[0].namespace_name == ISO4217
+
+    def is_pure(self):
+        return len(self.numerator) == 1 and not self.denominator and self.numerator[0] == xml.QName('pure', XBRLI)
+
+    @property
+    def iso4217_currency(self):
+        return self.numerator[0].local_name if self.is_monetary() else None
+
+    def __eq__(self, other):
+        return isinstance(other, UnitAspectValue) and (self.numerator, self.denominator) == (other.numerator, other.denominator)
+
+    def __hash__(self):
+        return hash((self.numerator, self.denominator))
+
+class DimensionAspectValue:
+    __slots__ = ('dimension', 'value')
+
+    def __init__(self, dimension, value):
+        self.dimension = dimension
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, DimensionAspectValue) and (self.dimension, self.value) == (other.dimension, other.value)
+
+    def __hash__(self):
+        return hash((self.dimension, self.value))
+
+class ConstraintSet(dict):
+    """A hashable mapping of aspects to aspect values."""
+
+    def __init__(self, obj=None):
+        super().__init__()
+        if isinstance(obj, Context):
+            self[Aspect.ENTITY_IDENTIFIER] = obj.entity_identifier_aspect_value
+            self[Aspect.PERIOD] = obj.period_aspect_value
+            self.update(obj.dimension_members)
+        elif isinstance(obj, Unit):
+            self[Aspect.UNIT] = obj.aspect_value
+
+    def __hash__(self):
+        return hash(frozenset(self.items()))
+
+    def matches(self, fact):
+        aspect_values = fact.aspect_values
+        for aspect, value in self.items():
+            actual = aspect_values.get(aspect)
+            if isinstance(actual, DimensionAspectValue):
+                actual = actual.value
+            if actual != value:
+                return False
+        return True
+
+class Instant:
+    def __init__(self, element, value):
+        self.element = element
+        self.value = value
+
+class Period:
+    def __init__(self, element):
+        self.element = element
+        self.instant = None
+        self.forever = None
+        self.start_date = None
+        self.end_date = None
+        for child in element.children:
+            if child.local_name == 'instant':
+                self.instant = Instant(child, _date_value(child))
+            elif child.local_name == 'forever':
+                self.forever = child
+            elif child.local_name == 'startDate':
+                self.start_date = Instant(child, _date_value(child))
+            elif child.local_name == 'endDate':
+                self.end_date = Instant(child, _date_value(child))
+
+    def is_instant(self):
+        return self.instant is not None
+
+    def is_forever(self):
+        return self.forever is not None
+
+    def is_start_end(self):
+        return self.start_date is not None
+
+    @property
+    def aspect_value(self):
+        if self.instant:
+            return PeriodAspectValue(('instant', self.instant.element.text))
+        if self.forever:
+            return PeriodAspectValue(('forever',))
+        return PeriodAspectValue(('duration', self.start_date.element.text, self.end_date.element.text))
+
+    def __str__(self):
+        return str(self.element)
+
+_DATE_RE = re.compile(r'^(-?\d{4,})-(\d{2})-(\d{2})(T[^Z+-]*)?(Z|[+-]\d{2}:\d{2})?$')
+
+def _date_value(elem):
+    match = _DATE_RE.match(elem.text)
+    tzinfo = None
+    if match and match.group(5):
+        tz = match.group(5)
+        if tz == 'Z':
+            tzinfo = datetime.timezone.utc
+        else:
+            offset = datetime.timedelta(hours=int(tz[1:3]), minutes=int(tz[4:6]))
+            tzinfo = datetime.timezone(offset if tz[0] == '+' else -offset)
+    elem.member_type_definition = xml.TypeDefinition('dateTime' if match and match.group(4) else 'date')
+    if match:
+        value = datetime.datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)), tzinfo=tzinfo)
+    else:
+        value = datetime.datetime(1, 1, 1)
+    return value
+
+class Entity:
+    def __init__(self, element):
+        self.element = element
+        self.identifier = element.find_child_element(('identifier', XBRLI))
+        self.segment = element.find_child_element(('segment', XBRLI))
+
+class Scenario:
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def non_xdt_child_elements(self):
+        return iter([child for child in self.element.children if child.namespace_name != XBRLDI])
+
+    def __bool__(self):
+        return True
+
+    def __str__(self):
+        return str(self.element)
+
+class Context:
+    def __init__(self, element, dts):
+        self.element = element
+        self.id = element.find_attribute('id').normalized_value
+        self.entity = Entity(element.find_child_element(('entity', XBRLI)))
+        self.period = Period(element.find_child_element(('period', XBRLI)))
+        scenario = element.find_child_element(('scenario', XBRLI))
+        self.scenario = Scenario(scenario) if scenario is not None else None
+        identifier = self.entity.identifier
+        self.entity_identifier_aspect_value = EntityIdentifierAspectValue(identifier.find_attribute('scheme').normalized_value, identifier.text.strip())
+        self.period_aspect_value = self.period.aspect_value
+        self.dimension_members = {}
+        for container in (self.entity.segment, scenario):
+            if container is None:
+                continue
+            for member in container.children:
+                if member.namespace_name == XBRLDI:
+                    dimension = _resolve_qname_value(member.find_attribute('dimension'))
+                    dimension_concept = dts.concept(dimension, dimension.prefix)
+                    if member.local_name == 'explicitMember':
+                        member_qname = member.schema_actual_value.value
+                        self.dimension_members[dimension_concept] = dts.concept(member_qname, member_qname.prefix)
+                    else:
+                        self.dimension_members[dimension_concept] = ''.join(child.text for child in member.children)
+
+    def __str__(self):
+        return self.id
+
+class Unit:
+    def __init__(self, element):
+        self.element = element
+        self.id = element.find_attribute('id').normalized_value
+        divide = element.find_child_element(('divide', XBRLI))
+        if divide is not None:
+            numerator = [m.schema_actual_value.value for m in divide.children[0].children]
+            denominator = [m.schema_actual_value.value for m in divide.children[1].children]
+        else:
+            numerator = [m.schema_actual_value.value for m in element.children]
+            denominator = []
+        self.aspect_value = UnitAspectValue(numerator, denominator)
+
+    def __str__(self):
+        return self.id
+
+class Fact:
+    def __init__(self, element, concept):
+        self.element = element
+        self.concept = concept
+        id_attr = element.find_attribute('id')
+        self.id = id_attr.normalized_value if id_attr else None
+
+    def __str__(self):
+        return '%s[%s]' % (self.concept, self.id) if self.id else str(self.concept)
+
+class Item(Fact):
+    def __init__(self, element, concept, context, unit):
+        super().__init__(element, concept)
+        self.context = context
+        self.unit = unit
+        precision = element.find_attribute('precision')
+        self.precision = precision.normalized_value if precision else None
+        decimals = element.find_attribute('decimals')
+        self.decimals = decimals.normalized_value if decimals else None
+        nil = element.find_attribute(('nil', XSI))
+        self.xsi_nil = bool(nil) and nil.normalized_value in ('true', '1')
+        self.normalized_value = element.text.strip()
+        self.xml_lang = None
+        parent = element
+        while parent is not None and self.xml_lang is None:
+            lang = parent.find_attribute(('lang', XML_NS))
+            if lang:
+                self.xml_lang = lang.normalized_value
+            parent = parent.parent
+
+    @property
+    def aspect_values(self):
+        aspect_values = {Aspect.CONCEPT: self.concept, Aspect.ENTITY_IDENTIFIER: self.context.entity_identifier_aspect_value, Aspect.PERIOD: self.context.period_aspect_value}
+        if self.unit:
+            aspect_values[Aspect.UNIT] = self.unit.aspect_value
+        for dimension, member in self.context.dimension_members.items():
+            aspect_values[dimension] = DimensionAspectValue(dimension, member)
+        return aspect_values
+
+class Tuple(Fact):
+    def __init__(self, element, concept, facts):
+        super().__init__(element, concept)
+        self.child_facts = FactSet(facts)
+
+class ConceptAspectValue:
+    def __init__(self, concept):
+        self.concept = concept
+
+class FactSet:
+    """An ordered set of facts."""
+
+    def __init__(self, facts=()):
+        self._facts = list(facts)
+
+    def __iter__(self):
+        return iter(self._facts)
+
+    def __len__(self):
+        return len(self._facts)
+
+    def __bool__(self):
+        return bool(self._facts)
+
+    def __contains__(self, fact):
+        return fact in set(self._facts)
+
+    def __sub__(self, other):
+        other = set(other)
+        return FactSet(fact for fact in self._facts if fact not in other)
+
+    def filter(self, constraint):
+        if isinstance(constraint, xml.QName):
+            return FactSet(fact for fact in self._facts if fact.concept.qname == constraint)
+        if isinstance(constraint, taxonomy.Concept):
+            return FactSet(fact for fact in self._facts if fact.concept is constraint)
+        if isinstance(constraint, Context):
+            return FactSet(fact for fact in self._facts if isinstance(fact, Item) and fact.context is constraint)
+        if isinstance(constraint, Unit):
+            return FactSet(fact for fact in self._facts if isinstance(fact, Item) and fact.unit is constraint)
+        if isinstance(constraint, ConstraintSet):
+            return FactSet(fact for fact in self._facts if isinstance(fact, Item) and constraint.matches(fact))
+        raise TypeError('Unsupported filter %r' % (constraint,))
+
+    def concept_aspect_values(self):
+        seen = {}
+        for fact in self._facts:
+            seen.setdefault(fact.concept, None)
+        return iter([ConceptAspectValue(concept) for concept in seen])
+
+class SchemaRef:
+    def __init__(self, element):
+        self.element = element
+        self.xlink_href = element.find_attribute(('href', XLINK)).normalized_value
+
+    def __str__(self):
+        return str(self.element)
+
+class FootnoteLink:
+    def __init__(self, element):
+        self.element = element
+        self.locators = []
+        self.resources = []
+        for child in element.children:
+            if child.local_name == 'loc':
+                child.xlink_href = child.find_attribute(('href', XLINK)).normalized_value
+                self.locators.append(child)
+            elif child.local_name == 'footnote':
+                self.resources.append(child)
+
+class Instance:
+    """An XBRL instance loaded from a synthetic EBA filing."""
+
+    def __init__(self, uri, document, dts):
+        self.uri = uri
+        self.document = document
+        self.document_element = document.document_element
+        self.dts = dts
+        self._schema_refs = []
+        self._linkbase_refs = []
+        self._footnote_links = []
+        self._contexts = {}
+        self._units = {}
+        facts = []
+        for child in self.document_element.children:
+            ns, name = child.namespace_name, child.local_name
+            if ns == LINK and name == 'schemaRef':
+                self._schema_refs.append(SchemaRef(child))
+            elif ns == LINK and name == 'linkbaseRef':
+                self._linkbase_refs.append(SchemaRef(child))
+            elif ns == LINK and name == 'footnoteLink':
+                self._footnote_links.append(FootnoteLink(child))
+            elif ns == XBRLI and name == 'context':
+                context = Context(child, dts)
+                self._contexts[context.id] = context
+            elif ns == XBRLI and name == 'unit':
+                unit = Unit(child)
+                self._units[unit.id] = unit
+        self._all_facts = []
+        for child in self.document_element.children:
+            if child.namespace_name not in (LINK, XBRLI):
+                facts.append(self._create_fact(child))
+        self._child_facts = FactSet(facts)
+        self._facts = FactSet(self._all_facts)
+
+    def _create_fact(self, elem):
+        concept = self.dts.concept(elem.qname, elem.prefix)
+        if isinstance(concept, taxonomy.Tuple):
+            fact = Tuple(elem, concept, [self._create_fact(child) for child in elem.children])
+        else:
+            context_ref = elem.find_attribute('contextRef')
+            unit_ref = elem.find_attribute('unitRef')
+            context = self._contexts[context_ref.normalized_value]
+            unit = self._units[unit_ref.normalized_value] if unit_ref else None
+            fact = Item(elem, concept, context, unit)
+            if concept.data_type == 'string':
+                elem.schema_actual_value = xsd.string(elem.text)
+            elif concept.is_numeric() and not fact.xsi_nil:
+                elem.schema_actual_value = xsd.decimal(elem.text.strip())
+        self._all_facts.append(fact)
+        return fact
+
+    @classmethod
+    def create_from_url(cls, url, dts=None):
+        """Loads the instance document at the given path. Returns a tuple of the instance and an error log."""
+        if dts is None:
+            dts = taxonomy.DTS.create_from_url(os.path.splitext(url)[0] + '.taxonomy.json')
+        document = _parse_document(url)
+        return cls(url, document, dts), xml.ErrorLog()
+
+    @property
+    def contexts(self):
+        return iter(self._contexts.values())
+
+    @property
+    def units(self):
+        return iter(self._units.values())
+
+    @property
+    def facts(self):
+        return self._facts
+
+    @property
+    def child_facts(self):
+        return self._child_facts
+
+    @property
+    def child_items(self):
+        return FactSet(fact for fact in self._child_facts if isinstance(fact, Item))
+
+    @property
+    def schema_refs(self):
+        return iter(self._schema_refs)
+
+    @property
+    def linkbase_refs(self):
+        return iter(self._linkbase_refs)
+
+    @property
+    def footnote_links(self):
+        return iter(self._footnote_links)
+
+_XML_DECL_RE = re.compile(br'^<\?xml\s+([^?]*)\?>')
+_PSEUDO_ATTR_RE = re.compile(br'(\w+)\s*=\s*["\']([^"\']*)["\']')
+
+# Elements and attributes with xs:QName content in XBRL instances
+_QNAME_ELEMENTS = {(XBRLI, 'measure'), (XBRLDI, 'explicitMember')}
+_QNAME_ATTRIBUTES = {'dimension'}
+
+def _resolve_qname_value(attr):
+    return attr.schema_actual_value.value
+
+def _parse_document(path):
+    with open(path, 'rb') as f:
+        head = f.read(256)
+    encoding, standalone = 'UTF-8', None
+    match = _XML_DECL_RE.match(head.lstrip(b'\xef\xbb\xbf'))
+    if match:
+        pseudo_attrs = dict(_PSEUDO_ATTR_RE.findall(match.group(1)))
+        if b'encoding' in pseudo_attrs:
+            encoding = pseudo_attrs[b'encoding'].decode('ascii')
+        if b'standalone' in pseudo_attrs:
+            standalone = pseudo_attrs[b'standalone'] == b'yes'
+
+    scopes = [{'xml': XML_NS}]
+    pending_ns = []
+    stack = []
+    root = None
+    for event, value in ElementTree.iterparse(path, events=('start-ns', 'start', 'end')):
+        if event == 'start-ns':
+            pending_ns.append(value)
+            continue
+        if event == 'end':
+            elem = stack.pop()
+            elem.text = value.text or ''
+            if (elem.namespace_name, elem.local_name) in _QNAME_ELEMENTS:
+                elem.schema_actual_value = _qname_value(elem.text.strip(), scopes[-1])
+            scopes.pop()
+            value.clear()
+            continue
+
+        scope = scopes[-1]
+        if pending_ns:
+            scope = dict(scope)
+            scope.update((prefix, uri) for prefix, uri in pending_ns)
+        ns, local = _split(value.tag)
+        elem = xml.Element(local, ns, _prefix_for(ns, scope))
+        elem.namespace_attributes = [xml.NamespaceAttribute(elem, prefix, uri) for prefix, uri in pending_ns]
+        pending_ns = []
+        for name, attr_value in value.attrib.items():
+            attr_ns, attr_local = _split(name)
+            attr = xml.Attribute(elem, attr_local, attr_ns, _prefix_for(attr_ns, scope) if attr_ns else None, attr_value)
+            if attr_ns is None and attr_local in _QNAME_ATTRIBUTES:
+                attr.schema_actual_value = _qname_value(attr_value, scope)
+            elem.attributes.append(attr)
+        if stack:
+            elem.parent = stack[-1]
+            stack[-1].children.append(elem)
+        else:
+            root = elem
+        stack.append(elem)
+        scopes.append(scope)
+    return xml.Document(path, root, encoding, standalone)
+
+def _split(tag):
+    if tag[0] == '{':
+        ns, local = tag[1:].split('}', 1)
+        return ns, local
+    return None, tag
+
+def _prefix_for(ns, scope):
+    if ns is None:
+        return None
+    if ns == XML_NS:
+        return 'xml'
+    for prefix, uri in reversed(list(scope.items())):
+        if uri == ns:
+            return prefix or None
+    return None
+
+def _qname_value(text, scope):
+    prefix, _, local = text.rpartition(':')
+    return xsd.QName(xml.QName(local, scope.get(prefix), prefix or None), prefix or None)
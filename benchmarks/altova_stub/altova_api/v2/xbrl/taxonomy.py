@@ -0,0 +1,109 @@
+"""Stand-in for altova_api.v2.xbrl.taxonomy.
+
+A synthetic DTS is described by a small JSON document (see benchmarks/generate_instance.py) instead of
+being discovered from XML schemas and linkbases.
+"""
+
+import json
+
+from .. import xml
+
+class Concept:
+    """A concept declared in the DTS."""
+
+    def __init__(self, qname, data_type='string', prefix=None):
+        self.qname = qname
+        self.name = qname.local_name
+        self.target_namespace = qname.namespace_name
+        self.prefix = prefix
+        self.data_type = data_type
+
+    def is_numeric(self):
+        return self.data_type in ('monetary', 'decimal')
+
+    def is_monetary(self):
+        return self.data_type == 'monetary'
+
+    def __str__(self):
+        return '%s:%s' % (self.prefix, self.name) if self.prefix else self.name
+
+    def __repr__(self):
+        return 'Concept(%r)' % self.qname
+
+class Item(Concept):
+    pass
+
+class Tuple(Concept):
+    pass
+
+class Dimension(Concept):
+    pass
+
+class Label:
+    def __init__(self, text, label_role):
+        self.text = text
+        self.label_role = label_role
+
+class Table:
+    """A table linkbase table with its filing indicator labels."""
+
+    def __init__(self, name, filing_indicator):
+        self.name = name
+        self._labels = [Label(filing_indicator, 'http://www.eurofiling.info/xbrl/role/filing-indicator-code')]
+
+    def labels(self, label_role=None):
+        return iter([label for label in self._labels if label_role is None or label.label_role == label_role])
+
+class TaxonomySchema:
+    def __init__(self, uri, target_namespace, prefix):
+        self.uri = uri
+        self.target_namespace = target_namespace
+        self.element = xml.Element('schema', 'http://www.w3.org/2001/XMLSchema', 'xs')
+        self.element.namespace_attributes = [
+            xml.NamespaceAttribute(self.element, 'xs', 'http://www.w3.org/2001/XMLSchema'),
+            xml.NamespaceAttribute(self.element, prefix, target_namespace),
+        ]
+
+_CONCEPT_CLASSES = {'tuple': Tuple, 'dimension': Dimension}
+
+class DTS:
+    """A discoverable taxonomy set loaded from a synthetic taxonomy description."""
+
+    def __init__(self, entry_point, concepts=(), tables=(), schemas=()):
+        self.entry_point = entry_point
+        self._concepts = {}
+        for qname, data_type, prefix in concepts:
+            self._concepts[qname] = _CONCEPT_CLASSES.get(data_type, Item)(qname, data_type, prefix)
+        self._tables = [Table(name, code) for name, code in tables]
+        self._schemas = [TaxonomySchema(uri, ns, prefix) for uri, ns, prefix in schemas]
+
+    @classmethod
+    def create_from_url(cls, url):
+        with open(url, encoding='utf-8') as f:
+            data = json.load(f)
+        concepts = [(xml.QName(c['name'], c['namespace']), c['type'], c.get('prefix')) for c in data.get('concepts', [])]
+        tables = [(t['name'], t['filing_indicator']) for t in data.get('tables', [])]
+        schemas = [(s['uri'], s['namespace'], s['prefix']) for s in data.get('schemas', [])]
+        return cls(data.get('entry_point'), concepts, tables, schemas)
+
+    @property
+    def tables(self):
+        return iter(self._tables)
+
+    @property
+    def taxonomy_schemas(self):
+        return iter(self._schemas)
+
+    @property
+    def concepts(self):
+        return iter(self._concepts.values())
+
+    def resolve_concept(self, qname):
+        return self._concepts.get(qname)
+
+    def concept(self, qname, prefix=None):
+        """Returns the concept with the given name, declaring an untyped item on first use."""
+        concept = self._concepts.get(qname)
+        if concept is None:
+            concept = self._concepts[qname] = Item(qname, 'string', prefix)
+        return concept
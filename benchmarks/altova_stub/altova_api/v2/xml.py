@@ -0,0 +1,138 @@
+"""Stand-in for altova_api.v2.xml backed by xml.etree.ElementTree."""
+
+import enum
+
+class ErrorSeverity(enum.IntEnum):
+    OTHER = 0
+    INFO = 1
+    WARNING = 2
+    ERROR = 3
+
+class QName:
+    """An expanded XML name."""
+
+    __slots__ = ('local_name', 'namespace_name', 'prefix')
+
+    def __init__(self, local_name, namespace_name=None, prefix=None):
+        self.local_name = local_name
+        self.namespace_name = namespace_name
+        self.prefix = prefix
+
+    def __eq__(self, other):
+        if isinstance(other, tuple):
+            other = QName(*other)
+        return isinstance(other, QName) and self.local_name == other.local_name and self.namespace_name == other.namespace_name
+
+    def __hash__(self):
+        return hash((self.local_name, self.namespace_name))
+
+    def __str__(self):
+        return '%s:%s' % (self.prefix, self.local_name) if self.prefix else self.local_name
+
+    def __repr__(self):
+        return 'QName(%r, %r)' % (self.local_name, self.namespace_name)
+
+def _as_qname(name):
+    if isinstance(name, QName):
+        return name
+    if isinstance(name, tuple):
+        return QName(*name)
+    return QName(name)
+
+class Attribute:
+    """An attribute information item."""
+
+    def __init__(self, parent, local_name, namespace_name, prefix, normalized_value, schema_actual_value=None):
+        self.parent = parent
+        self.local_name = local_name
+        self.namespace_name = namespace_name
+        self.prefix = prefix
+        self.normalized_value = normalized_value
+        self.schema_actual_value = schema_actual_value
+
+    @property
+    def qname(self):
+        return QName(self.local_name, self.namespace_name, self.prefix)
+
+    def __str__(self):
+        return '@%s' % self.qname
+
+class NamespaceAttribute(Attribute):
+    """A namespace declaration attribute (xmlns or xmlns:prefix)."""
+
+    def __init__(self, parent, prefix, namespace_name):
+        if prefix:
+            super().__init__(parent, prefix, 'http://www.w3.org/2000/xmlns/', 'xmlns', namespace_name)
+        else:
+            super().__init__(parent, 'xmlns', 'http://www.w3.org/2000/xmlns/', None, namespace_name)
+
+    def __str__(self):
+        return 'xmlns:%s' % self.local_name if self.prefix else 'xmlns'
+
+class TypeDefinition:
+    def __init__(self, name):
+        self.name = name
+
+class Element:
+    """An element information item."""
+
+    def __init__(self, local_name, namespace_name, prefix, line=None):
+        self.local_name = local_name
+        self.namespace_name = namespace_name
+        self.prefix = prefix
+        self.line = line
+        self.parent = None
+        self.attributes = []
+        self.namespace_attributes = []
+        self.children = []
+        self.text = ''
+        self.schema_actual_value = None
+        self.member_type_definition = None
+
+    @property
+    def qname(self):
+        return QName(self.local_name, self.namespace_name, self.prefix)
+
+    def element_children(self):
+        return iter(self.children)
+
+    def find_attribute(self, name):
+        name = _as_qname(name)
+        for attr in self.attributes:
+            if attr.local_name == name.local_name and attr.namespace_name == name.namespace_name:
+                return attr
+        return None
+
+    def find_child_element(self, name):
+        name = _as_qname(name)
+        for child in self.children:
+            if child.local_name == name.local_name and child.namespace_name == name.namespace_name:
+                return child
+        return None
+
+    def __str__(self):
+        return '<%s>' % self.qname
+
+class Document:
+    """A document information item."""
+
+    def __init__(self, uri, document_element, character_encoding_scheme='UTF-8', standalone=None):
+        self.uri = uri
+        self.document_element = document_element
+        self.character_encoding_scheme = character_encoding_scheme
+        self.standalone = standalone
+
+class ErrorLog:
+    """Collects the errors reported by a validation job."""
+
+    def __init__(self):
+        self.errors = []
+
+    def report(self, error):
+        self.errors.append(error)
+
+    def clear(self):
+        self.errors = []
+
+    def has_errors(self):
+        return bool(self.errors)
@@ -0,0 +1,21 @@
+"""Stand-in for the typed values of altova_api.v2.xsd."""
+
+class AnySimpleType:
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return str(self.value)
+
+class string(AnySimpleType):
+    pass
+
+class decimal(AnySimpleType):
+    pass
+
+class QName(AnySimpleType):
+    """A typed xs:QName value."""
+
+    def __init__(self, value, prefix=None):
+        super().__init__(value)
+        self.prefix = prefix
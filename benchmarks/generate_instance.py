@@ -0,0 +1,300 @@
+# Generates synthetic EBA-shaped XBRL instances together with a description of their synthetic DTS.
+#
+# The size of the instance is controlled by the number of contexts, facts, units, additional namespaces and
+# footnotes. Violations of individual EBA filing rules can be injected at a given rate, which is relative to
+# the number of contexts, units or facts the rule applies to.
+#
+# Example invocations:
+#
+# Generate a clean instance with 100k facts
+#   python generate_instance.py --facts 100000 corep.xbrl
+# Generate an instance where 1% of all facts are nil and 5% of all contexts are unused
+#   python generate_instance.py --facts 100000 --violation 2.19=0.01 --violation 2.7-unused=0.05 corep.xbrl
+
+import argparse
+import json
+import os
+import random
+from xml.sax.saxutils import escape
+
+ENTRY_POINT = 'http://www.eba.europa.eu/eu/fr/xbrl/crr/fws/corep/its-2016-Q4/2016-12-31/mod/corep_of.xsd'
+REFERENCE_DATE = '2016-12-31'
+LEI = '529900T8BM49AURSDO55'
+
+NAMESPACES = [
+    ('xbrli', 'http://www.xbrl.org/2003/instance'),
+    ('link', 'http://www.xbrl.org/2003/linkbase'),
+    ('xlink', 'http://www.w3.org/1999/xlink'),
+    ('xsi', 'http://www.w3.org/2001/XMLSchema-instance'),
+    ('iso4217', 'http://www.xbrl.org/2003/iso4217'),
+    ('xbrldi', 'http://xbrl.org/2006/xbrldi'),
+    ('find', 'http://www.eurofiling.info/xbrl/ext/filing-indicators'),
+    ('eba_dim', 'http://www.eba.europa.eu/xbrl/crr/dict/dim'),
+    ('eba_CA', 'http://www.eba.europa.eu/xbrl/crr/dict/dom/CA'),
+    ('eba_CU', 'http://www.eba.europa.eu/xbrl/crr/dict/dom/CU'),
+    ('eba_MC', 'http://www.eba.europa.eu/xbrl/crr/dict/dom/MC'),
+]
+METRICS_NAMESPACE = 'http://www.eba.europa.eu/xbrl/crr/dict/met'
+CURRENCIES = ['EUR', 'USD', 'GBP', 'CHF', 'JPY', 'SEK', 'DKK', 'PLN', 'CZK', 'HUF', 'NOK', 'CAD', 'AUD']
+
+# Violations which can be injected, with the objects their rate is relative to
+VIOLATIONS = {
+    '2.1': 'facts',             # xml:base attribute on facts
+    '2.6': 'contexts',          # overlong context ids
+    '2.7-unused': 'contexts',   # additional unused contexts
+    '2.7-duplicate': 'contexts',  # additional duplicates of used contexts
+    '2.9': 'contexts',          # contexts with a different entity identifier
+    '2.10': 'contexts',         # instants with a timezone
+    '2.11': 'contexts',         # forever periods
+    '2.13': 'contexts',         # instants with a different reference date
+    '2.14': 'contexts',         # contexts with a segment
+    '2.15': 'contexts',         # scenarios with non-XDT content
+    '2.16': 'facts',            # duplicate facts
+    '2.16.1': 'facts',          # duplicate facts with a different unit
+    '2.16-context': 'facts',    # duplicate facts in a duplicate of their context
+    '2.16-lang': 'facts',       # duplicate string facts with the xml:lang of the document element given explicitly
+    '2.17': 'facts',            # @precision instead of @decimals
+    '2.19': 'facts',            # nil facts
+    '2.21': 'units',            # additional duplicates of used units
+    '2.22': 'units',            # additional unused units
+    '3.1': 'facts',             # monetary facts in a second currency
+    '3.2': 'facts',             # non-monetary numeric facts with a currency unit
+    '3.4': 'namespaces',        # additional unused namespace declarations
+    '3.6': 'contexts',          # the deprecated LEI scheme
+    '3.7': 'facts',             # unused fact ids
+    '3.8': 'facts',             # overlong strings
+    '3.9': 'facts',             # namespace declarations on facts
+    '3.10': 'namespaces',       # additional prefixes for the metrics namespace
+}
+
+def parse_violation(text):
+    rule, _, rate = text.partition('=')
+    if rule not in VIOLATIONS:
+        raise argparse.ArgumentTypeError('unknown violation %r (expected one of %s)' % (rule, ', '.join(sorted(VIOLATIONS))))
+    return rule, float(rate or 1.0)
+
+class InstanceGenerator:
+    """Writes a synthetic EBA instance and the description of its DTS."""
+
+    def __init__(self, contexts=1000, facts=10000, units=3, namespaces=1, footnotes=0, tables=20, violations=None, seed=0):
+        self.num_contexts = max(1, contexts)
+        self.num_facts = max(1, facts)
+        self.num_units = max(2, min(units, len(CURRENCIES) + 1))
+        self.num_namespaces = max(1, namespaces)
+        self.num_footnotes = max(0, min(footnotes, facts))
+        self.num_tables = max(1, tables)
+        self.violations = dict(violations or {})
+        self.random = random.Random(seed)
+
+    def count(self, rule):
+        """Number of objects which should violate the given rule."""
+        base = {'facts': self.num_facts, 'contexts': self.num_contexts, 'units': self.num_units, 'namespaces': self.num_namespaces}[VIOLATIONS[rule]]
+        return int(round(self.violations.get(rule, 0.0) * base))
+
+    def sample(self, rule, population):
+        """Returns the set of positions in range(population) which should violate the given rule."""
+        return set(self.random.sample(range(population), min(population, self.count(rule))))
+
+    def metric_namespaces(self):
+        return [('eba_met' if i == 0 else 'eba_met%d' % i, METRICS_NAMESPACE if i == 0 else '%s/%d' % (METRICS_NAMESPACE, i)) for i in range(self.num_namespaces)]
+
+    def write(self, path):
+        """Writes the instance to path and its DTS description next to it. Returns the path of the DTS description."""
+        metric_namespaces = self.metric_namespaces()
+        # Denomination contexts (CCA=x1) carry the currency of their facts in the CUS dimension
+        currencies = CURRENCIES[:self.num_units - 1]
+        denomination_every = 10 if len(currencies) > 1 else 0
+        concepts_per_context = (self.num_facts + self.num_contexts - 1) // self.num_contexts
+        concept_types = ['monetary', 'monetary', 'monetary', 'decimal', 'string']
+        concepts = []
+        for i in range(concepts_per_context):
+            prefix, ns = metric_namespaces[i % len(metric_namespaces)]
+            data_type = concept_types[i % len(concept_types)]
+            concepts.append((prefix, ns, '%si%d' % ({'monetary': 'm', 'decimal': 'p', 'string': 's'}[data_type], i), data_type))
+
+        fact_positions = {rule: self.sample(rule, self.num_facts) for rule in VIOLATIONS if VIOLATIONS[rule] == 'facts'}
+        context_positions = {rule: self.sample(rule, self.num_contexts) for rule in VIOLATIONS if VIOLATIONS[rule] == 'contexts'}
+        footnoted = set(self.random.sample(range(self.num_facts), self.num_footnotes))
+
+        with open(path, 'w', encoding='utf-8') as out:
+            out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            declarations = NAMESPACES + metric_namespaces
+            declarations += [('unused%d' % i, 'http://example.com/unused/%d' % i) for i in range(self.count('3.4'))]
+            declarations += [('met%d' % i, METRICS_NAMESPACE) for i in range(self.count('3.10'))]
+            root_attrs = ['xmlns:%s="%s"' % decl for decl in declarations]
+            if fact_positions['2.16-lang']:
+                root_attrs.append('xml:lang="en"')
+            out.write('<xbrli:xbrl %s>\n' % ' '.join(root_attrs))
+            out.write('<link:schemaRef xlink:type="simple" xlink:href="%s"/>\n' % ENTRY_POINT)
+
+            # Contexts
+            out.write(self.context_xml('c0', LEI, 'http://standards.iso.org/iso/17442', REFERENCE_DATE, None))
+            context_ids = []
+            for i in range(self.num_contexts):
+                context_id = 'c%d' % (i + 1)
+                if i in context_positions['2.6']:
+                    context_id = 'context_with_a_semantic_and_far_too_long_identifier_%d' % (i + 1)
+                context_ids.append(context_id)
+                out.write(self.context_xml_for(i, context_id, context_positions, currencies, denomination_every))
+            for i in range(self.count('2.7-unused')):
+                out.write(self.context_xml('unused%d' % i, LEI, 'http://standards.iso.org/iso/17442', REFERENCE_DATE, [('eba_dim:MCY', 'eba_MC:u%d' % i)]))
+            for i in range(self.count('2.7-duplicate')):
+                j = i % self.num_contexts
+                out.write(self.context_xml_for(j, 'dup%d' % i, context_positions, currencies, denomination_every))
+            for f in sorted(fact_positions['2.16-context']):
+                out.write(self.context_xml_for(f % self.num_contexts, 'dupf%d' % f, context_positions, currencies, denomination_every))
+
+            # Units
+            unit_ids = ['u%s' % currency for currency in currencies] + ['pure']
+            for currency in currencies:
+                out.write('<xbrli:unit id="u%s"><xbrli:measure>iso4217:%s</xbrli:measure></xbrli:unit>\n' % (currency, currency))
+            out.write('<xbrli:unit id="pure"><xbrli:measure>xbrli:pure</xbrli:measure></xbrli:unit>\n')
+            for i in range(self.count('2.21')):
+                out.write('<xbrli:unit id="dupEUR%d"><xbrli:measure>iso4217:EUR</xbrli:measure></xbrli:unit>\n' % i)
+            for i in range(self.count('2.22')):
+                out.write('<xbrli:unit id="unused%d"><xbrli:measure>iso4217:XA%d</xbrli:measure></xbrli:unit>\n' % (i, i))
+
+            # Filing indicators
+            out.write('<find:fIndicators>\n')
+            for t in range(self.num_tables):
+                out.write('<find:filingIndicator contextRef="c0">C_%02d.00</find:filingIndicator>\n' % (t + 1))
+            out.write('</find:fIndicators>\n')
+
+            # Facts
+            for f in range(self.num_facts):
+                c = f % self.num_contexts
+                prefix, ns, name, data_type = concepts[f // self.num_contexts]
+                unit = None
+                if data_type == 'monetary':
+                    unit = 'u%s' % self.context_currency(c, currencies, denomination_every)
+                    if f in fact_positions['3.1'] and len(currencies) > 1 and not self.is_denomination(c, denomination_every):
+                        unit = 'u%s' % currencies[1]
+                elif data_type == 'decimal':
+                    unit = 'uEUR' if f in fact_positions['3.2'] else 'pure'
+                out.write(self.fact_xml(f, prefix, name, data_type, context_ids[c], unit, fact_positions, f in footnoted))
+                if f in fact_positions['2.16']:
+                    out.write(self.fact_xml(None, prefix, name, data_type, context_ids[c], unit, fact_positions, False))
+                if f in fact_positions['2.16.1'] and data_type != 'string':
+                    # Monetary facts must stay XBRL valid, so their second unit is another currency
+                    other = 'uEUR' if unit == 'pure' else ('u%s' % currencies[-1] if unit != 'u%s' % currencies[-1] else 'u%s' % currencies[0])
+                    out.write(self.fact_xml(None, prefix, name, data_type, context_ids[c], other, fact_positions, False))
+                if f in fact_positions['2.16-context']:
+                    out.write(self.fact_xml(None, prefix, name, data_type, 'dupf%d' % f, unit, fact_positions, False))
+                if f in fact_positions['2.16-lang'] and data_type == 'string':
+                    out.write(self.fact_xml(None, prefix, name, data_type, context_ids[c], unit, fact_positions, False, lang='en'))
+
+            # Footnotes
+            if footnoted:
+                out.write('<link:footnoteLink xlink:type="extended" xlink:role="http://www.xbrl.org/2003/role/link">\n')
+                for f in sorted(footnoted):
+                    out.write('<link:loc xlink:type="locator" xlink:href="#f%d" xlink:label="fact%d"/>\n' % (f, f))
+                    out.write('<link:footnote xlink:type="resource" xlink:label="note%d" xml:lang="en">Footnote %d</link:footnote>\n' % (f, f))
+                    out.write('<link:footnoteArc xlink:type="arc" xlink:arcrole="http://www.xbrl.org/2003/arcrole/fact-footnote" xlink:from="fact%d" xlink:to="note%d"/>\n' % (f, f))
+                out.write('</link:footnoteLink>\n')
+            out.write('</xbrli:xbrl>\n')
+
+        dts_path = os.path.splitext(path)[0] + '.taxonomy.json'
+        with open(dts_path, 'w', encoding='utf-8') as out:
+            json.dump(self.dts_description(concepts, metric_namespaces), out, indent=1)
+        return dts_path
+
+    def is_denomination(self, c, denomination_every):
+        return bool(denomination_every) and c % denomination_every == denomination_every - 1
+
+    def context_currency(self, c, currencies, denomination_every):
+        if self.is_denomination(c, denomination_every):
+            return currencies[1 + (c // denomination_every) % (len(currencies) - 1)]
+        return currencies[0]
+
+    def context_xml_for(self, i, context_id, positions, currencies, denomination_every):
+        identifier, scheme, date = LEI, 'http://standards.iso.org/iso/17442', REFERENCE_DATE
+        if i in positions['2.9']:
+            identifier = 'OTHER%d' % i
+        if i in positions['3.6']:
+            scheme = 'http://standard.iso.org/iso/17442'
+        if i in positions['2.13']:
+            date = '2016-09-30'
+        if i in positions['2.10']:
+            date += 'Z'
+        members = [('eba_dim:MCY', 'eba_MC:x%d' % i)]
+        if self.is_denomination(i, denomination_every):
+            members += [('eba_dim:CCA', 'eba_CA:x1'), ('eba_dim:CUS', 'eba_CU:%s' % self.context_currency(i, currencies, denomination_every))]
+        return self.context_xml(context_id, identifier, scheme, date, members, forever=i in positions['2.11'], segment=i in positions['2.14'], non_xdt=i in positions['2.15'])
+
+    def context_xml(self, context_id, identifier, scheme, date, members, forever=False, segment=False, non_xdt=False):
+        parts = ['<xbrli:context id="%s"><xbrli:entity><xbrli:identifier scheme="%s">%s</xbrli:identifier>' % (context_id, scheme, identifier)]
+        if segment:
+            parts.append('<xbrli:segment><xbrldi:explicitMember dimension="eba_dim:SEG">eba_MC:x0</xbrldi:explicitMember></xbrli:segment>')
+        parts.append('</xbrli:entity><xbrli:period>')
+        parts.append('<xbrli:forever/>' if forever else '<xbrli:instant>%s</xbrli:instant>' % date)
+        parts.append('</xbrli:period>')
+        if members or non_xdt:
+            parts.append('<xbrli:scenario>')
+            parts.extend('<xbrldi:explicitMember dimension="%s">%s</xbrldi:explicitMember>' % member for member in members or [])
+            if non_xdt:
+                parts.append('<find:note>free text</find:note>')
+            parts.append('</xbrli:scenario>')
+        parts.append('</xbrli:context>\n')
+        return ''.join(parts)
+
+    def fact_xml(self, f, prefix, name, data_type, context_id, unit, positions, footnoted, lang=None):
+        attrs = ['contextRef="%s"' % context_id]
+        if lang:
+            attrs.append('xml:lang="%s"' % lang)
+        if unit:
+            attrs.append('unitRef="%s"' % unit)
+            attrs.append('precision="4"' if f in positions['2.17'] else 'decimals="0"')
+        if f is not None and (footnoted or f in positions['3.7']):
+            attrs.append('id="f%d"' % f)
+        if f in positions['2.1']:
+            attrs.append('xml:base="http://example.com/"')
+        if f in positions['3.9']:
+            attrs.append('xmlns:nested="http://example.com/nested"')
+        if f in positions['2.19']:
+            attrs.append('xsi:nil="true"')
+            return '<%s:%s %s/>\n' % (prefix, name, ' '.join(attrs))
+        if data_type == 'string':
+            value = 'Text %d' % (f or 0)
+            if f in positions['3.8']:
+                value = 'A far too long text value ' * 8
+            value = escape(value)
+        else:
+            value = str(self.random.randint(0, 10 ** 9))
+        return '<%s:%s %s>%s</%s:%s>\n' % (prefix, name, ' '.join(attrs), value, prefix, name)
+
+    def dts_description(self, concepts, metric_namespaces):
+        dts_concepts = [{'namespace': ns, 'name': name, 'type': data_type, 'prefix': prefix} for prefix, ns, name, data_type in concepts]
+        dts_concepts.append({'namespace': 'http://www.eurofiling.info/xbrl/ext/filing-indicators', 'name': 'fIndicators', 'type': 'tuple', 'prefix': 'find'})
+        dts_concepts.append({'namespace': 'http://www.eurofiling.info/xbrl/ext/filing-indicators', 'name': 'filingIndicator', 'type': 'string', 'prefix': 'find'})
+        for dimension in ('CCA', 'CUS', 'MCY', 'SEG'):
+            dts_concepts.append({'namespace': 'http://www.eba.europa.eu/xbrl/crr/dict/dim', 'name': dimension, 'type': 'dimension', 'prefix': 'eba_dim'})
+        dts_concepts.append({'namespace': 'http://www.eba.europa.eu/xbrl/crr/dict/dom/CA', 'name': 'x1', 'type': 'domain', 'prefix': 'eba_CA'})
+        schemas = [{'uri': ENTRY_POINT, 'namespace': 'http://www.eba.europa.eu/eu/fr/xbrl/crr/fws/corep/its-2016-Q4/2016-12-31/mod/corep_of', 'prefix': 'corep_of'}]
+        for prefix, ns in NAMESPACES[6:] + metric_namespaces:
+            schemas.append({'uri': ns + '.xsd', 'namespace': ns, 'prefix': prefix})
+        return {
+            'entry_point': ENTRY_POINT,
+            'concepts': dts_concepts,
+            'tables': [{'name': 'C_%02d.00' % (t + 1), 'filing_indicator': 'C_%02d.00' % (t + 1)} for t in range(self.num_tables)],
+            'schemas': schemas,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic EBA XBRL instance.')
+    parser.add_argument('output', help='path of the generated instance')
+    parser.add_argument('--contexts', type=int, default=None, help='number of contexts (default: facts/10)')
+    parser.add_argument('--facts', type=int, default=10000, help='number of facts (default: 10000)')
+    parser.add_argument('--units', type=int, default=3, help='number of units (default: 3)')
+    parser.add_argument('--namespaces', type=int, default=1, help='number of metric namespaces (default: 1)')
+    parser.add_argument('--footnotes', type=int, default=0, help='number of footnoted facts (default: 0)')
+    parser.add_argument('--tables', type=int, default=20, help='number of tables with filing indicators (default: 20)')
+    parser.add_argument('--violation', type=parse_violation, action='append', default=[], metavar='RULE=RATE', help='inject violations of RULE at RATE (may be repeated)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    args = parser.parse_args()
+
+    contexts = args.contexts if args.contexts is not None else max(1, args.facts // 10)
+    generator = InstanceGenerator(contexts, args.facts, args.units, args.namespaces, args.footnotes, args.tables, dict(args.violation), args.seed)
+    generator.write(args.output)
+
+if __name__ == '__main__':
+    main()
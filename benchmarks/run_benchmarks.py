@@ -0,0 +1,140 @@
+# Times every EBA rule of eba_validation.py and the whole check_eba_filing_rules on synthetic instances of
+# increasing size.
+#
+# The instances are generated with generate_instance.py and loaded into the stand-in for the RaptorXML Python
+# API in altova_stub/, so absolute numbers are not those of RaptorXML. They are reproducible, however, and show
+# how each rule scales with the size of the instance. Per-rule times are taken from the rule-stats
+# instrumentation of eba_validation.py; the time per fact of a rule should stay flat as the instance grows.
+#
+# Example invocations:
+#
+# Benchmark at 10k, 100k and 1M facts
+#   python run_benchmarks.py
+# Benchmark at 10k and 100k facts with 1% nil facts, keeping the best of 5 runs and writing the results as JSON
+#   python run_benchmarks.py --sizes 10000 100000 --violation 2.19=0.01 --repeat 5 --json results.json
+# Check that the context and unit usage counts of 2.7 and 2.22 scale linearly
+#   python run_benchmarks.py --sizes 10000 100000 1000000 --script-param=rules:2.7,2.22
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, 'altova_stub'))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+import altova_api.v2.xml as xml
+import altova_api.v2.xbrl as xbrl
+
+import eba_validation
+from generate_instance import InstanceGenerator, parse_violation
+
+# A few violations of every kind, so that the reporting paths of all rules are exercised
+DEFAULT_VIOLATIONS = {
+    '2.6': 0.001, '2.7-unused': 0.001, '2.7-duplicate': 0.001, '2.13': 0.001, '2.16': 0.001, '2.16.1': 0.001,
+    '2.17': 0.001, '2.19': 0.001, '3.1': 0.001, '3.7': 0.001, '3.8': 0.001, '3.9': 0.0001,
+}
+
+# Rules faster than this at the smallest size get no scaling factor, their times are dominated by timer resolution
+MIN_SCALING_SECONDS = 0.0001
+
+class Job:
+    """Stand-in for the RaptorXML job object passed to the script entry points."""
+
+    def __init__(self, script_params=None, options=None):
+        self.catalog = None
+        self.script_params = dict(script_params or {})
+        self.options = dict(options or {})
+        self.error_log = xml.ErrorLog()
+
+def generate(workdir, facts, violations, seed):
+    path = os.path.join(workdir, 'eba_%d.xbrl' % facts)
+    if not os.path.exists(path):
+        InstanceGenerator(contexts=max(1, facts // 10), facts=facts, units=4, namespaces=2, footnotes=facts // 1000, violations=violations, seed=seed).write(path)
+    return path
+
+def run_rules(instance, params):
+    """Runs all rules once and returns the per-rule statistics and the total wall time."""
+    with tempfile.TemporaryDirectory() as tmp:
+        stats_path = os.path.join(tmp, 'stats.json')
+        job = Job(dict(params, **{'rule-stats': stats_path}))
+        start = time.perf_counter()
+        eba_validation.on_xbrl_finished(job, instance)
+        total = time.perf_counter() - start
+        with open(stats_path, encoding='utf-8') as f:
+            stats = json.load(f)['rules']
+    return stats, total, len(job.error_log.errors)
+
+def benchmark(path, repeat, params):
+    start = time.perf_counter()
+    instance, _ = xbrl.Instance.create_from_url(path)
+    load_seconds = time.perf_counter() - start
+    best = {}
+    best_total = None
+    for _ in range(repeat):
+        stats, total, errors = run_rules(instance, params)
+        for entry in stats:
+            if entry['rule'] not in best or entry['seconds'] < best[entry['rule']]['seconds']:
+                best[entry['rule']] = entry
+        best_total = total if best_total is None else min(best_total, total)
+    return {'instance': path, 'facts': len(instance.facts), 'load_seconds': load_seconds, 'seconds': best_total, 'errors': errors, 'rules': list(best.values())}
+
+def print_table(results, out):
+    """Prints the time and time per fact of every rule at every size.
+
+    With more than one size, the last column is the time per fact at the largest size relative to that at the
+    smallest size, which stays close to 1 for a rule that scales linearly. Rules which take less than
+    MIN_SCALING_SECONDS at the smallest size are too fast to compare.
+    """
+    sizes = [result['facts'] for result in results]
+    scaling = len(results) > 1
+    out.write('%-16s' % 'rule' + ''.join('%14s %8s' % ('%d facts' % size, 'us/fact') for size in sizes) + ('%9s' % 'scaling' if scaling else '') + '\n')
+    rows = [entry['rule'] for entry in results[0]['rules']]
+    for rule in rows + ['total']:
+        line = '%-16s' % rule
+        seconds_by_size = []
+        for result in results:
+            if rule == 'total':
+                seconds = result['seconds']
+            else:
+                seconds = next((entry['seconds'] for entry in result['rules'] if entry['rule'] == rule), 0.0)
+            seconds_by_size.append(seconds)
+            line += '%13.4fs %8.3f' % (seconds, seconds * 1e6 / result['facts'])
+        if scaling:
+            if seconds_by_size[0] >= MIN_SCALING_SECONDS:
+                line += '%8.2fx' % ((seconds_by_size[-1] / sizes[-1]) / (seconds_by_size[0] / sizes[0]))
+            else:
+                line += '%9s' % '-'
+        out.write(line + '\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the EBA rules on synthetic instances.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='numbers of facts (default: 10000 100000 1000000)')
+    parser.add_argument('--violation', type=parse_violation, action='append', default=None, metavar='RULE=RATE', help='inject violations of RULE at RATE (default: a few of every kind)')
+    parser.add_argument('--repeat', type=int, default=3, help='number of runs per size, the fastest is reported (default: 3)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the generator (default: 0)')
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'eba-benchmarks'), help='directory for the generated instances (reused between runs)')
+    parser.add_argument('--script-param', action='append', default=[], metavar='NAME:VALUE', help='script parameter passed to eba_validation.py (may be repeated)')
+    parser.add_argument('--json', metavar='PATH', help='also write the results as JSON')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    violations = dict(args.violation) if args.violation is not None else DEFAULT_VIOLATIONS
+    params = dict(param.split(':', 1) for param in args.script_param)
+    results = []
+    for size in args.sizes:
+        path = generate(args.workdir, size, violations, args.seed)
+        result = benchmark(path, args.repeat, params)
+        sys.stderr.write('%s: %d facts loaded in %.2fs, rules took %.3fs, %d errors\n' % (path, result['facts'], result['load_seconds'], result['seconds'], result['errors']))
+        results.append(result)
+
+    print_table(results, sys.stdout)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
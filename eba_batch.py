@@ -0,0 +1,185 @@
+# This script validates many EBA filings in parallel on a pool of worker processes.
+#
+# Instances can be given as files, directories (searched recursively for *.xbrl and *.xml files), glob patterns
+# or manifest files (@manifest.txt, one path per line). Zip archives stand for the *.xbrl and *.xml files inside
+# them, which are read without extracting the archive. Each instance is validated by one of two engines:
+#
+#   streaming       eba_streaming.py inside the worker process (default)
+#   raptorxml       eba_validation.py in a RaptorXML+XBRL Server process started by the worker
+#
+# Taxonomy derived data is loaded once per worker: the streaming engine loads the taxonomy tables given with
+# --taxonomy-tables when the worker starts and the raptorxml engine passes --taxonomy-cache-dir on to
+# eba_validation.py, so that all RaptorXML runs share the cached lookup tables. Taxonomy packages given with
+# --taxonomy-package are read from their zip files by both engines.
+#
+# The raptorxml engine loads the findings of eba_validation.py from its findings-output, which is set to a
+# temporary file for each instance, so that instances with EBA errors count as failed with both engines.
+#
+# Example invocations:
+#
+# Pre-screen all filings in a directory on all cores
+#   python eba_batch.py submissions/
+# Validate the filings listed in a manifest with RaptorXML on 8 workers, reporting results in input order
+#   python eba_batch.py --engine=raptorxml --workers=8 --ordered --taxonomy-cache-dir=cache @manifest.txt
+# Pre-screen zipped submissions against a taxonomy package
+#   python eba_batch.py --taxonomy-package=taxonomy.zip 'submissions/*.zip'
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import eba_streaming
+
+INSTANCE_EXTENSIONS = ('.xbrl', '.xml')
+
+def collect_instances(inputs):
+    """Expands files, directories, glob patterns and @manifest files into a list of instance paths."""
+    instances = []
+    for item in inputs:
+        if item.startswith('@'):
+            with open(item[1:], encoding='utf-8') as f:
+                instances.extend(collect_instances(line.strip() for line in f if line.strip() and not line.startswith('#')))
+        elif os.path.isdir(item):
+            for dirpath, dirnames, filenames in os.walk(item):
+                dirnames.sort()
+                instances.extend(os.path.join(dirpath, filename) for filename in sorted(filenames) if filename.lower().endswith(INSTANCE_EXTENSIONS + ('.zip',)))
+        elif any(c in item for c in '*?['):
+            instances.extend(sorted(glob.glob(item, recursive=True)))
+        else:
+            instances.append(item)
+    return eba_streaming.expand_archives(instances)
+
+class BatchResult:
+    """The outcome of validating a single instance."""
+
+    def __init__(self, path, findings=(), output='', failure=None, elapsed=0.0):
+        self.path = path
+        self.findings = list(findings)
+        self.output = output
+        self.failure = failure
+        self.elapsed = elapsed
+
+    @property
+    def has_errors(self):
+        return self.failure is not None or any(finding.severity == eba_streaming.ERROR for finding in self.findings)
+
+# Per-worker state, set up once by init_worker
+
+_worker = {}
+
+def init_worker(engine, params, taxonomy_tables_path, raptorxml, taxonomy_cache_dir, taxonomy_packages):
+    _worker['engine'] = engine
+    _worker['params'] = params
+    _worker['raptorxml'] = raptorxml
+    _worker['taxonomy_cache_dir'] = taxonomy_cache_dir
+    _worker['taxonomy_packages'] = taxonomy_packages
+    if engine == 'streaming':
+        taxonomy_tables = eba_streaming.load_taxonomy_tables(taxonomy_tables_path) if taxonomy_tables_path else None
+        _worker['validator'] = eba_streaming.StreamingValidator(params, taxonomy_tables, taxonomy_packages)
+
+def validate_instance(path):
+    """Validates a single instance in a worker process."""
+    start = time.perf_counter()
+    try:
+        if _worker['engine'] == 'streaming':
+            result = BatchResult(path, findings=_worker['validator'].validate_file(path))
+        else:
+            result = run_raptorxml(path)
+    except Exception as e:
+        result = BatchResult(path, failure='%s: %s' % (type(e).__name__, e))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+def run_raptorxml(path):
+    """Validates a single instance with eba_validation.py in RaptorXML+XBRL Server.
+
+    The EBA findings are written by the script to a temporary findings-output file and loaded from it, so that
+    they count for has_errors like those of the streaming engine. Unless findings-only is given, they are only
+    written to that file and not repeated in RaptorXML's output.
+    """
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'eba_validation.py')
+    params = dict(_worker['params'])
+    if _worker['taxonomy_cache_dir']:
+        params['taxonomy-cache-dir'] = _worker['taxonomy_cache_dir']
+    fd, findings_path = tempfile.mkstemp(prefix='eba-findings-', suffix='.jsonl')
+    os.close(fd)
+    params['findings-output'] = findings_path
+    params['findings-format'] = 'jsonl'
+    params.setdefault('findings-only', 'true')
+    command = [_worker['raptorxml'], 'valxbrl', '--script=%s' % script]
+    command.extend('--taxonomy-package=%s' % package for package in _worker['taxonomy_packages'])
+    command.extend('--script-param=%s:%s' % item for item in sorted(params.items()))
+    command.append(path)
+    try:
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        with open(findings_path, encoding='utf-8') as f:
+            findings = [eba_streaming.Finding(**json.loads(line)) for line in f if line.strip()]
+    finally:
+        os.remove(findings_path)
+    return BatchResult(path, findings=findings, output=process.stdout, failure=None if process.returncode == 0 else 'RaptorXML exited with code %d' % process.returncode)
+
+def run_batch(instances, engine='streaming', workers=None, ordered=False, params=None, taxonomy_tables=None, raptorxml='raptorxmlxbrl', taxonomy_cache_dir=None, taxonomy_packages=None):
+    """Validates all instances on a pool of worker processes and yields a BatchResult per instance.
+
+    Results are yielded in input order if ordered is set, otherwise as soon as each instance is done.
+    """
+    workers = workers or os.cpu_count() or 1
+    initargs = (engine, dict(params or {}), taxonomy_tables, raptorxml, taxonomy_cache_dir, list(taxonomy_packages or ()))
+    if workers == 1:
+        init_worker(*initargs)
+        for path in instances:
+            yield validate_instance(path)
+        return
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=initargs) as pool:
+        results = pool.imap if ordered else pool.imap_unordered
+        for result in results(validate_instance, instances):
+            yield result
+
+def write_result(result, out, output_format):
+    if output_format == 'jsonl':
+        record = {'instance': result.path, 'elapsed': round(result.elapsed, 3), 'failure': result.failure, 'output': result.output or None}
+        record['findings'] = [finding._asdict() for finding in result.findings]
+        out.write(json.dumps(record) + '\n')
+    else:
+        for finding in result.findings:
+            out.write('%s: %s\n' % (result.path, eba_streaming.format_finding(finding)))
+        if result.output:
+            out.write(result.output if result.output.endswith('\n') else result.output + '\n')
+        if result.failure:
+            out.write('%s: FAILED: %s\n' % (result.path, result.failure))
+        out.write('%s: %d findings in %.3fs\n' % (result.path, len(result.findings), result.elapsed))
+    out.flush()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validate many EBA filings in parallel.')
+    parser.add_argument('inputs', nargs='+', help='instance files, directories, glob patterns or @manifest files')
+    parser.add_argument('--engine', choices=('streaming', 'raptorxml'), default='streaming', help='validation engine (default: streaming)')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--ordered', action='store_true', help='report results in input order instead of as they complete')
+    parser.add_argument('--format', choices=('text', 'jsonl'), default='text', help='output format (default: text)')
+    parser.add_argument('--script-param', action='append', default=[], metavar='NAME:VALUE', help='script parameter as accepted by eba_validation.py (may be repeated)')
+    parser.add_argument('--taxonomy-tables', metavar='PATH', help='taxonomy tables cached by eba_validation.py (streaming engine)')
+    parser.add_argument('--taxonomy-cache-dir', metavar='DIR', help='taxonomy cache directory shared by all RaptorXML runs (raptorxml engine)')
+    parser.add_argument('--taxonomy-package', action='append', default=[], metavar='PATH', help='taxonomy package read from its zip file (may be repeated)')
+    parser.add_argument('--raptorxml', default='raptorxmlxbrl', metavar='PATH', help='RaptorXML+XBRL executable (default: raptorxmlxbrl)')
+    args = parser.parse_args(argv)
+
+    instances = collect_instances(args.inputs)
+    params = dict(param.split(':', 1) for param in args.script_param)
+    failed = 0
+    start = time.perf_counter()
+    for result in run_batch(instances, args.engine, args.workers, args.ordered, params, args.taxonomy_tables, args.raptorxml, args.taxonomy_cache_dir, args.taxonomy_package):
+        write_result(result, sys.stdout, args.format)
+        failed += result.has_errors
+    if args.format == 'text':
+        sys.stdout.write('%d instances validated in %.3fs, %d with errors\n' % (len(instances), time.perf_counter() - start, failed))
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,409 @@
+# This script runs a resident validation service which keeps its workers and their taxonomy tables warm.
+#
+# Requests are accepted over HTTP, either on a local TCP port or on a unix domain socket, by an asyncio front end
+# and validated on a fixed pool of worker processes. Every worker process loads taxonomy tables and opens the
+# taxonomy packages given with --taxonomy-package once, and keeps them and the tables derived from the packages
+# for all later requests, so that a request only pays for the validation of the instance itself. Findings
+# are sent back as newline delimited JSON while the instance is being validated, one eba_streaming.Finding per
+# line, followed by a summary line.
+#
+# Workers use the streaming engine of eba_streaming.py, which serves as local stand-in for RaptorXML: it needs
+# neither a RaptorXML installation nor a DTS.
+#
+#   POST /validate                  Validate the instance in the request body. Script parameters are given as
+#                                   ?script-param=NAME:VALUE query parameters and taxonomy tables as
+#                                   ?taxonomy-tables=PATH. If the server runs with --instance-root, the body may
+#                                   instead be a JSON object {"instance": PATH, "params": {...}, "taxonomy_tables": PATH}
+#                                   naming a file below that directory.
+#   GET /health                     Number of workers, busy workers and queued requests
+#
+# With --taxonomy-package, the taxonomy tables derived from the packages for the entry point of the instance take
+# precedence over the taxonomy tables of the request.
+#
+# Requests cannot make the server read arbitrary files: instance paths are refused unless --instance-root is given
+# and must then resolve to a file below it, per request taxonomy tables must be one of the files given with
+# --taxonomy-tables or --allow-taxonomy-tables, and only the script parameters in REQUEST_PARAMS may be set per
+# request.
+#
+# At most --workers requests are validated at the same time and at most --max-queue further requests wait for a
+# worker. Requests beyond that are rejected with 503 Service Unavailable.
+#
+# Example invocations:
+#
+# Serve on localhost:8765 with one worker per CPU
+#   python eba_server.py --taxonomy-tables=cache/0123abcd.json
+# Serve on a unix domain socket and validate a filing
+#   python eba_server.py --socket=/tmp/eba.sock --workers=4
+#   curl --unix-socket /tmp/eba.sock --data-binary @instance.xbrl http://localhost/validate
+# Serve pre-screening against the taxonomy package of the entry point of each filing, read from its zip file
+#   python eba_server.py --taxonomy-package=EBA_CRD_IV_XBRL_2.6_Dictionary_2.6.0.0.zip
+# Validate filings from a shared directory against one of two taxonomy versions
+#   python eba_server.py --instance-root=/srv/filings --allow-taxonomy-tables=cache/0123abcd.json --allow-taxonomy-tables=cache/4567ef01.json
+#   curl -H 'Content-Type: application/json' -d '{"instance": "/srv/filings/instance.xbrl", "taxonomy_tables": "cache/4567ef01.json"}' http://localhost:8765/validate
+
+import argparse
+import asyncio
+import concurrent.futures
+import io
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import urllib.parse
+import zipfile
+
+import eba_streaming
+
+# Worker processes
+
+class TaxonomyTablesCache:
+    """Taxonomy tables loaded by a worker process, reloaded only if the file changes."""
+
+    def __init__(self):
+        self.tables = {}
+
+    def get(self, path):
+        if not path:
+            return None
+        mtime = os.stat(path).st_mtime
+        entry = self.tables.get(path)
+        if entry is None or entry[0] != mtime:
+            entry = self.tables[path] = (mtime, eba_streaming.load_taxonomy_tables(path))
+        return entry[1]
+
+def worker_main(conn, taxonomy_packages):
+    """Validates the requests received on conn and sends back each finding as soon as it is found."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    taxonomy_tables = TaxonomyTablesCache()
+    # Opened once, the tables of each entry point are derived from them by the first request which needs them
+    packages = [eba_streaming.TaxonomyPackage(path) for path in taxonomy_packages]
+    package_tables = {}
+    while True:
+        request = conn.recv()
+        if request is None:
+            break
+        source, params, taxonomy_tables_path = request
+        try:
+            validator = eba_streaming.StreamingValidator(params, taxonomy_tables.get(taxonomy_tables_path), packages, package_tables)
+            validator.validate(io.BytesIO(source) if isinstance(source, bytes) else source, lambda finding: conn.send(('finding', finding._asdict())))
+            conn.send(('done', None))
+        except Exception as e:
+            conn.send(('failed', '%s: %s' % (type(e).__name__, e)))
+    conn.close()
+
+class ValidationFailed(Exception):
+    pass
+
+class Worker:
+    def __init__(self, taxonomy_packages=()):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, args=(child_conn, list(taxonomy_packages)), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, EOFError):
+            pass
+        self.process.join(1)
+        if self.process.is_alive():
+            self.process.terminate()
+
+class WorkerPool:
+    """A fixed number of worker processes, handed out to one request at a time."""
+
+    def __init__(self, workers, max_queue, taxonomy_packages=()):
+        self.size = workers
+        self.max_queue = max_queue
+        self.taxonomy_packages = list(taxonomy_packages)
+        self.queued = 0
+        self.closed = False
+        self.workers = [Worker(self.taxonomy_packages) for _ in range(workers)]
+        self.idle = asyncio.Queue()
+        for worker in self.workers:
+            self.idle.put_nowait(worker)
+        # Blocking pipe reads are done on threads, one per worker at most
+        self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+
+    @property
+    def busy(self):
+        return self.size - self.idle.qsize()
+
+    def full(self):
+        return self.idle.empty() and self.queued >= self.max_queue
+
+    async def validate(self, source, params, taxonomy_tables_path):
+        """Validates the instance (a path or its content) on the next idle worker and yields the findings as they arrive."""
+        loop = asyncio.get_event_loop()
+        self.queued += 1
+        try:
+            worker = await self.idle.get()
+        finally:
+            self.queued -= 1
+        finished = False
+        try:
+            try:
+                await loop.run_in_executor(self.executor, worker.conn.send, (source, params, taxonomy_tables_path))
+                while True:
+                    kind, value = await loop.run_in_executor(self.executor, worker.conn.recv)
+                    if kind != 'finding':
+                        break
+                    yield value
+            except (EOFError, OSError):
+                raise ValidationFailed('worker exited') from None
+            finished = True
+            if kind == 'failed':
+                raise ValidationFailed(value)
+        finally:
+            if not finished:
+                # The client went away or the worker died: skip the rest of the findings or replace the worker.
+                # Only the pipe is read on the executor thread, workers are stopped and started on the loop thread.
+                if not await loop.run_in_executor(self.executor, self.drain, worker):
+                    worker = self.replace(worker)
+            if worker is not None:
+                self.idle.put_nowait(worker)
+
+    def drain(self, worker):
+        """Skips the remaining findings of the current request and returns whether the worker is still alive."""
+        try:
+            while worker.conn.recv()[0] == 'finding':
+                pass
+            return True
+        except (OSError, EOFError):
+            return False
+
+    def replace(self, worker):
+        """Stops a worker which exited and returns the worker started in its place, or None once the pool is closed."""
+        worker.stop()
+        if self.closed:
+            return None
+        replacement = Worker(self.taxonomy_packages)
+        self.workers[self.workers.index(worker)] = replacement
+        return replacement
+
+    def close(self):
+        self.closed = True
+        for worker in self.workers:
+            worker.stop()
+        self.executor.shutdown(wait=False)
+
+# HTTP front end
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+STATUS_TEXTS = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large', 501: 'Not Implemented', 503: 'Service Unavailable'}
+
+# Script parameters which may be set per request, none of them names a file
+REQUEST_PARAMS = {'max-id-length', 'max-string-length'}
+
+class ValidationServer:
+    """Accepts validation requests over HTTP/1.1 and streams the findings back as newline delimited JSON."""
+
+    def __init__(self, pool, taxonomy_tables=None, params=None, max_request_size=256 * 1024 * 1024, instance_root=None, allowed_taxonomy_tables=()):
+        self.pool = pool
+        self.taxonomy_tables = taxonomy_tables
+        self.params = dict(params or {})
+        self.max_request_size = max_request_size
+        self.instance_root = os.path.realpath(instance_root) if instance_root else None
+        self.allowed_taxonomy_tables = {os.path.realpath(path): path for path in allowed_taxonomy_tables}
+        if taxonomy_tables:
+            self.allowed_taxonomy_tables[os.path.realpath(taxonomy_tables)] = taxonomy_tables
+
+    async def handle(self, reader, writer):
+        try:
+            while await self.handle_request(reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, reader, writer):
+        """Handles a single request and returns whether the connection can be reused."""
+        # Until the request body has been read, the start of the next request is unknown and the connection is closed on errors
+        keep_alive = False
+        try:
+            request = await self.read_request_head(reader)
+            if request is None:
+                return False
+            method, target, headers = request
+            if 'transfer-encoding' in headers:
+                raise HttpError(501, 'request bodies must be sent with Content-Length')
+            length = headers.get('content-length', '0')
+            if not length.isdigit():
+                raise HttpError(400, 'malformed Content-Length header')
+            length = int(length)
+            if length > self.max_request_size:
+                raise HttpError(413, 'request body exceeds %d bytes' % self.max_request_size)
+            body = await reader.readexactly(length) if length else b''
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            url = urllib.parse.urlsplit(target)
+            if url.path == '/health':
+                if method != 'GET':
+                    raise HttpError(405, 'use GET')
+                self.send_json(writer, 200, {'workers': self.pool.size, 'busy': self.pool.busy, 'queued': self.pool.queued})
+            elif url.path == '/validate':
+                if method != 'POST':
+                    raise HttpError(405, 'use POST')
+                await self.validate(writer, self.parse_validation_request(url.query, headers, body))
+            else:
+                raise HttpError(404, 'unknown path %s' % url.path)
+        except HttpError as e:
+            self.send_json(writer, e.status, {'error': str(e)}, keep_alive)
+        except ValueError as e:
+            self.send_json(writer, 400, {'error': str(e)}, keep_alive)
+        await writer.drain()
+        return keep_alive
+
+    async def read_request_head(self, reader):
+        """Returns the method, target and headers of the next request, or None if the connection ends before them."""
+        # readline() raises ValueError for lines beyond the stream limit
+        request_line = await reader.readline()
+        if not request_line.endswith(b'\n'):
+            return None
+        parts = request_line.decode('latin-1').rstrip('\r\n').split(' ')
+        if len(parts) != 3 or not parts[0].isalpha() or not parts[2].startswith('HTTP/1.'):
+            raise HttpError(400, 'malformed request line')
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if not line.endswith(b'\n'):
+                return None
+            if line in (b'\r\n', b'\n'):
+                return parts[0], parts[1], headers
+            name, colon, value = line.decode('latin-1').partition(':')
+            if not colon or not name or name != name.strip():
+                raise HttpError(400, 'malformed header line')
+            headers[name.lower()] = value.strip()
+
+    def parse_validation_request(self, query, headers, body):
+        """Returns the instance (path or content), the script parameters and the taxonomy tables path of a request."""
+        params = dict(self.params)
+        taxonomy_tables = self.taxonomy_tables
+        if headers.get('content-type', '').split(';')[0].strip() == 'application/json':
+            if self.instance_root is None:
+                raise HttpError(403, 'instance paths are not accepted, send the instance as request body')
+            request = json.loads(body.decode('utf-8'))
+            if not isinstance(request, dict) or not isinstance(request.get('instance'), str):
+                raise ValueError('expected a JSON object with an "instance" path')
+            source = self.instance_path(request['instance'])
+            request_params = request.get('params') or {}
+            if not isinstance(request_params, dict):
+                raise ValueError('expected "params" to be a JSON object')
+            for name, value in request_params.items():
+                params[self.request_param(name)] = str(value)
+            if request.get('taxonomy_tables') is not None:
+                taxonomy_tables = self.taxonomy_tables_path(request['taxonomy_tables'])
+        else:
+            if not body:
+                raise ValueError('empty request body')
+            source = body
+            for name, value in urllib.parse.parse_qsl(query):
+                if name == 'script-param':
+                    name, _, value = value.partition(':')
+                    params[self.request_param(name)] = value
+                elif name == 'taxonomy-tables':
+                    taxonomy_tables = self.taxonomy_tables_path(value)
+                else:
+                    raise ValueError('unknown query parameter %s' % name)
+        return source, params, taxonomy_tables
+
+    def instance_path(self, path):
+        """Returns the real path of an instance, which must be a file below --instance-root."""
+        path = os.path.realpath(os.path.join(self.instance_root, path))
+        if os.path.commonpath([path, self.instance_root]) != self.instance_root or not os.path.isfile(path):
+            raise HttpError(403, 'instance is not a file below the instance root')
+        return path
+
+    def taxonomy_tables_path(self, path):
+        """Returns the taxonomy tables path, which must have been allowed at startup."""
+        if not isinstance(path, str) or os.path.realpath(path) not in self.allowed_taxonomy_tables:
+            raise HttpError(403, 'taxonomy tables %s are not allowed' % path)
+        return self.allowed_taxonomy_tables[os.path.realpath(path)]
+
+    def request_param(self, name):
+        if name not in REQUEST_PARAMS:
+            raise HttpError(403, 'script parameter %s cannot be set per request' % name)
+        return name
+
+    async def validate(self, writer, request):
+        if self.pool.full():
+            raise HttpError(503, 'all %d workers are busy and %d requests are queued' % (self.pool.size, self.pool.queued))
+        start = time.perf_counter()
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n')
+        summary = {'findings': 0, 'errors': 0}
+        try:
+            async for finding in self.pool.validate(*request):
+                summary['findings'] += 1
+                summary['errors'] += finding['severity'] == eba_streaming.ERROR
+                self.write_chunk(writer, json.dumps(finding) + '\n')
+                await writer.drain()
+        except ValidationFailed as e:
+            summary['failure'] = str(e)
+        summary['elapsed'] = round(time.perf_counter() - start, 6)
+        self.write_chunk(writer, json.dumps(summary) + '\n')
+        writer.write(b'0\r\n\r\n')
+
+    def write_chunk(self, writer, text):
+        data = text.encode('utf-8')
+        writer.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+    def send_json(self, writer, status, value, keep_alive=True):
+        data = (json.dumps(value) + '\n').encode('utf-8')
+        connection = b'' if keep_alive else b'Connection: close\r\n'
+        writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n%s\r\n%s' % (status, STATUS_TEXTS[status].encode('ascii'), len(data), connection, data))
+
+async def serve(args, params):
+    pool = WorkerPool(args.workers or os.cpu_count() or 1, args.max_queue, args.taxonomy_package)
+    server = ValidationServer(pool, args.taxonomy_tables, params, instance_root=args.instance_root, allowed_taxonomy_tables=args.allow_taxonomy_tables)
+    if args.socket:
+        listener = await asyncio.start_unix_server(server.handle, path=args.socket)
+        address = args.socket
+    else:
+        listener = await asyncio.start_server(server.handle, args.host, args.port)
+        address = 'http://%s:%d' % listener.sockets[0].getsockname()[:2]
+    stopped = asyncio.Event()
+    loop = asyncio.get_event_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stopped.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    sys.stderr.write('Serving on %s with %d workers\n' % (address, pool.size))
+    try:
+        async with listener:
+            await stopped.wait()
+    finally:
+        pool.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve EBA filing rule validations from warm worker processes.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on (default: 8765)')
+    parser.add_argument('--socket', metavar='PATH', help='listen on a unix domain socket instead of a TCP port')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--max-queue', type=int, default=64, help='number of requests which may wait for a worker (default: 64)')
+    parser.add_argument('--script-param', action='append', default=[], metavar='NAME:VALUE', help='default script parameter as accepted by eba_validation.py (may be repeated)')
+    parser.add_argument('--taxonomy-tables', metavar='PATH', help='default taxonomy tables cached by eba_validation.py')
+    parser.add_argument('--taxonomy-package', action='append', default=[], metavar='PATH', help='taxonomy package to derive the taxonomy tables from, opened once per worker (may be repeated, enables rules 1.6.3 and 3.5)')
+    parser.add_argument('--allow-taxonomy-tables', action='append', default=[], metavar='PATH', help='further taxonomy tables which requests may select (may be repeated)')
+    parser.add_argument('--instance-root', metavar='DIR', help='accept JSON requests naming an instance file below this directory (default: only uploaded instances)')
+    args = parser.parse_args(argv)
+    for path in args.taxonomy_package:
+        if not zipfile.is_zipfile(path):
+            parser.error('taxonomy package %s is not a zip file' % path)
+
+    params = dict(param.split(':', 1) for param in args.script_param)
+    asyncio.run(serve(args, params))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
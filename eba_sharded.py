@@ -0,0 +1,382 @@
+# This script checks a single huge EBA filing with eba_streaming.py on several worker processes.
+#
+# The instance document is not parsed to find the shards. The main process only searches it for the start of the
+# first fact and splits the facts into byte ranges of about the same size, each starting at the start tag of an
+# item. It parses and checks the head before the first fact, with the contexts, units, schemaRef and filing
+# indicators, once. The shards are parsed and checked in parallel by the worker processes, which get the contexts
+# and units of the head when they start. Each worker returns the findings which only depend on its own facts
+# together with a mergeable partial state:
+#
+#   2.16    the first fact of every fact key (keyed by context equivalence class) and the later facts with the same key
+#   1.6.1   the first filing indicator of every code and the later ones with the same code
+#   2.7     context and unit usage counts (and 2.22)
+#   3.1     the first monetary unit seen outside denomination contexts
+#   3.4     the used prefixes and namespaces
+#   3.7     the fact ids and the ids referenced by footnote links
+#
+# The partial states are merged in document order and the rules which can only be decided at the end of the
+# document are checked on the merged state. The findings are exactly those of eba_streaming.py, in the same
+# order. A shard whose first monetary unit differs from that of the preceding shards is checked again with the
+# unit of the preceding shards.
+#
+# A shard boundary is found lexically and may be inside a child of the document element (e.g. an item in a tuple),
+# in which case the shard is not well-formed on its own. Instances with such a shard, with contexts, units or
+# schemaRefs after the first fact, or which are not well-formed are checked sequentially.
+#
+# Example invocations:
+#
+# Check a filing on all cores
+#   python eba_sharded.py instance.xbrl
+# Check a filing in 16 shards on 8 workers with additional options
+#   python eba_sharded.py --workers=8 --shards=16 --script-param=max-id-length:10 --taxonomy-tables=cache/0123abcd.json instance.xbrl
+
+import argparse
+import mmap
+import multiprocessing
+import os
+import re
+import sys
+
+import eba_streaming
+
+# Markup of the document before the document element, start tags with '>' allowed in attribute values and the
+# contextRef attribute of items
+_PROLOG_MARKUP_RE = re.compile(br"""\s*(?:<\?.*?\?>|<!--.*?-->|<!DOCTYPE(?:[^>\[]|\[[^\]]*\])*>)\s*""", re.S)
+_START_TAG_RE = re.compile(br"""<([^\s!?/>]+)((?:[^>"']|"[^"]*"|'[^']*')*)>""")
+_NAMESPACE_RE = re.compile(br"""xmlns(?::([^\s=]+))?\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+_CONTEXT_REF_RE = re.compile(br'\scontextRef\s*=')
+# Comments, PIs and white space after the end of the document element
+_MISC_RE = re.compile(br"""(?:\s|<!--.*?-->|<\?.*?\?>)*""", re.S)
+
+class DocumentLayout:
+    """Where the facts of an instance document are split into shards, found lexically without parsing the document.
+
+    prolog_end is the end of the document element's start tag and root_name its qualified name. head_end is the
+    start of the first item which is a child of the document element. The head before it holds the contexts, units,
+    schemaRef and filing indicators and is checked by the main process. shards holds a (start, end) byte range for
+    each shard of the facts between head_end and the end tag of the document element.
+
+    A shard starts at the first item start tag (with a contextRef attribute) after an even split of the facts in
+    bytes, skipping filing indicators, which are nested in find:fIndicators. This is a guess: an item nested in a
+    tuple or a start tag in a comment could be taken for a child of the document element. A shard's range is only
+    well-formed on its own if its boundaries are between children of the document element, so validate_sharded
+    checks the instance sequentially if the head or a shard cannot be parsed.
+    """
+
+    def __init__(self, prolog_end, root_name, head_end, shards):
+        self.prolog_end = prolog_end
+        self.root_name = root_name
+        self.head_end = head_end
+        self.shards = shards
+
+    @classmethod
+    def scan(cls, path, count):
+        """Scans the instance document at path for count shards. Returns None if it is not a UTF-8 document or its document element is not found."""
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return cls.scan_data(data, count)
+
+    @classmethod
+    def scan_data(cls, data, count):
+        encoding, standalone = eba_streaming.read_xml_declaration(data[:1024])
+        if (encoding or 'UTF-8').upper() != 'UTF-8' or data[:2] in (b'\xff\xfe', b'\xfe\xff') or data[:1] == b'\x00' or data[1:2] == b'\x00':
+            # Byte ranges are only found in UTF-8 documents
+            return None
+        offset = 3 if data[:3] == b'\xef\xbb\xbf' else 0
+        prolog = _PROLOG_MARKUP_RE.match(data, offset)
+        while prolog:
+            offset = prolog.end()
+            prolog = _PROLOG_MARKUP_RE.match(data, offset)
+        root = _START_TAG_RE.match(data, offset)
+        if root is None or root.group(2).endswith(b'/'):
+            return None
+        root_name = root.group(1)
+        body_end = data.rfind(b'</' + root_name, root.end())
+        end_tag = re.compile(br'</' + re.escape(root_name) + br'\s*>').match(data, body_end) if body_end >= 0 else None
+        if end_tag is None or _MISC_RE.match(data, end_tag.end()).end() != len(data):
+            return None
+        # Items with these prefixes are filing indicators
+        indicator_prefixes = {match.group(1) or b'' for match in _NAMESPACE_RE.finditer(root.group(2)) if (match.group(2) if match.group(2) is not None else match.group(3)) == eba_streaming.FIND.encode('utf-8')}
+
+        def next_item(offset):
+            match = _CONTEXT_REF_RE.search(data, offset, body_end)
+            while match:
+                start = data.rfind(b'<', offset, match.start())
+                tag = _START_TAG_RE.match(data, start) if start >= 0 else None
+                if tag is not None and tag.end() > match.start() and tag.group(1).rpartition(b':')[0] not in indicator_prefixes:
+                    return start
+                match = _CONTEXT_REF_RE.search(data, match.end(), body_end)
+            return body_end
+
+        head_end = next_item(root.end())
+        size = body_end - head_end
+        boundaries = [head_end]
+        for k in range(1, count):
+            boundary = next_item(max(head_end + size * k // count, boundaries[-1] + 1))
+            if boundary >= body_end:
+                break
+            boundaries.append(boundary)
+        boundaries.append(body_end)
+        shards = [(start, end) for start, end in zip(boundaries, boundaries[1:]) if start < end]
+        return cls(root.end(), root_name, head_end, shards)
+
+class _RangesReader:
+    """A binary file object which reads the prolog, the given byte ranges and the end of the document element."""
+
+    def __init__(self, data, prolog_end, root_name, ranges):
+        self.chunks = [(0, prolog_end)] + list(ranges)
+        self.chunks.reverse()
+        self.data = data
+        self.tail = b'</' + root_name + b'>'
+
+    def read(self, size=-1):
+        if not self.chunks:
+            tail, self.tail = self.tail, b''
+            return tail
+        start, end = self.chunks.pop()
+        if size is not None and 0 <= size < end - start:
+            self.chunks.append((start + size, end))
+            end = start + size
+        return self.data[start:end]
+
+class _OrderedFindings:
+    """Keeps the findings with their position in the document instead of reporting them.
+
+    A position is the number of the shard, the ordinal of the child of the document element in the shard during
+    which a finding was reported and the sequence number of the finding within that element. The head checked by
+    the main process is shard 0, and its XML declaration and document element come before all children (ordinal -1).
+    """
+
+    def init_positions(self, shard):
+        self.findings = []
+        self.shard = shard
+        self.ordinal = -1
+        self.sequence = 0
+        self.report = lambda finding: self.findings.append((self.next_position(), finding))
+
+    def start_top_level_element(self):
+        self.ordinal += 1
+        self.sequence = 0
+
+    def next_position(self):
+        self.sequence += 1
+        return (self.shard, self.ordinal, self.sequence)
+
+    def report_at(self, position, check, *args):
+        """Runs a check whose findings belong to the given position."""
+        findings = []
+        report, self.report = self.report, findings.append
+        try:
+            check(*args)
+        finally:
+            self.report = report
+        self.findings.extend((position, finding) for finding in findings)
+
+class ShardResult:
+    """The findings and the mergeable partial state of a shard of facts."""
+
+    def __init__(self, state, completed):
+        self.completed = completed and not state.interleaved
+        self.findings = state.findings
+        self.context_usage = state.context_usage
+        self.unit_usage = state.unit_usage
+        self.fact_ids = state.fact_ids
+        self.footnote_ids = state.footnote_ids
+        self.used_prefixes = state.used_prefixes
+        self.used_namespaces = state.used_namespaces
+        self.pending_facts = state.pending_facts
+        self.pending_duplicates = state.pending_duplicates
+        self.pending_indicators = state.pending_indicators
+        self.fact_keys = state.fact_keys
+        self.duplicate_facts = state.duplicate_facts
+        self.first_indicators = state.first_indicators
+        self.duplicate_indicators = state.duplicate_indicators
+        self.single_currency_unit = state.single_currency_unit
+
+class _ShardState(_OrderedFindings, eba_streaming._ValidationState):
+    """Checks the facts of a shard against the contexts and units checked by the main process."""
+
+    def __init__(self, validator, shard, contexts, units, currency_unit):
+        super().__init__(validator, None)
+        self.init_positions(shard)
+        self.contexts = contexts
+        self.units = units
+        self.single_currency_unit = currency_unit
+        self.interleaved = False
+        self.duplicate_facts = []
+        self.first_indicators = {}
+        self.duplicate_indicators = []
+
+    def check_xml_declaration(self, head):
+        # Checked by the main process
+        pass
+
+    def start_document_element(self, root, namespaces):
+        # Checked by the main process, the shard only needs the prefixes
+        for prefix, uri in namespaces:
+            if prefix:
+                self.root_prefixes.setdefault(uri, prefix)
+        self.root_namespaces = namespaces
+
+    def start_element(self, elem):
+        if self.ordinal >= 0:
+            super().start_element(elem)
+
+    def end_top_level_element(self, elem):
+        ns, local = eba_streaming._split(elem.tag)
+        if ns == eba_streaming.XBRLI or (ns == eba_streaming.LINK and local == 'schemaRef'):
+            # Contexts, units and schemaRefs which follow facts change the state all later facts are checked with
+            self.interleaved = True
+            return
+        super().end_top_level_element(elem)
+
+    def check_fact_key(self, key, context_ref, unit_ref, fact_id, concept, location, ids):
+        # Whether the first fact of a key is a duplicate is only known once the preceding shards are merged
+        position = self.next_position()
+        if key in self.fact_keys:
+            self.duplicate_facts.append((position, key, context_ref, unit_ref, fact_id))
+        else:
+            self.fact_keys[key] = (unit_ref, fact_id, position, context_ref)
+
+    def check_duplicate_indicator(self, code, location, ids):
+        position = self.next_position()
+        if code in self.first_indicators:
+            self.duplicate_indicators.append((position, code, location, ids))
+        else:
+            self.first_indicators[code] = (position, location, ids)
+
+class _MergeState(_OrderedFindings, eba_streaming._ValidationState):
+    """Checks the head of the document, with the contexts and units, and merges the partial states of the shards."""
+
+    def __init__(self, validator):
+        super().__init__(validator, None)
+        self.init_positions(0)
+
+    def merge(self, shard):
+        self.findings.extend(shard.findings)
+        self.context_usage.update(shard.context_usage)
+        self.unit_usage.update(shard.unit_usage)
+        self.fact_ids.update(shard.fact_ids)
+        self.footnote_ids |= shard.footnote_ids
+        self.used_prefixes |= shard.used_prefixes
+        self.used_namespaces |= shard.used_namespaces
+        self.pending_facts.extend(shard.pending_facts)
+        self.pending_duplicates.extend(shard.pending_duplicates)
+        self.pending_indicators.extend(shard.pending_indicators)
+        if self.single_currency_unit is None:
+            self.single_currency_unit = shard.single_currency_unit
+
+        # EBA 2.16 - The first facts of the shard's keys may duplicate facts of the preceding shards
+        duplicates = [(first[2], key, first[3]) + first[:2] for key, first in shard.fact_keys.items() if key in self.fact_keys]
+        duplicates.extend(shard.duplicate_facts)
+        shard.fact_keys.update(self.fact_keys)
+        self.fact_keys = shard.fact_keys
+        for position, key, context_ref, unit_ref, fact_id in duplicates:
+            ns, local, context_class, lang = key
+            concept = self.name(ns, local)
+            location, ids = eba_streaming.fact_location(concept, context_ref, unit_ref, fact_id)
+            self.report_at(position, self.report_duplicate_fact, self.fact_keys[key], unit_ref, concept, location, ids)
+
+        # EBA 1.6.1 - The same for the shard's first filing indicators
+        for code, (position, location, ids) in shard.first_indicators.items():
+            if code in self.filing_indicators:
+                self.report_at(position, self.report_duplicate_indicator, code, location, ids)
+        for position, code, location, ids in shard.duplicate_indicators:
+            self.report_at(position, self.report_duplicate_indicator, code, location, ids)
+        self.filing_indicators.update(shard.first_indicators)
+
+# Per-worker state, set up once by init_worker
+
+_worker = {}
+
+def init_worker(params, taxonomy_tables_path, taxonomy_packages, contexts=None, units=None):
+    taxonomy_tables = eba_streaming.load_taxonomy_tables(taxonomy_tables_path) if taxonomy_tables_path else None
+    _worker['validator'] = eba_streaming.StreamingValidator(params, taxonomy_tables, taxonomy_packages)
+    # The contexts and units checked by the main process, passed once per worker instead of with every shard
+    _worker['contexts'] = contexts
+    _worker['units'] = units
+
+def validate_shard(task):
+    """Checks a shard of facts and returns its ShardResult."""
+    path, prolog_end, root_name, entry_point, shard, byte_range, currency_unit = task
+    state = _ShardState(_worker['validator'], shard, _worker['contexts'], _worker['units'], currency_unit)
+    state.use_taxonomy(entry_point)
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            completed = state.parse(_RangesReader(data, prolog_end, root_name, [byte_range]))
+    return ShardResult(state, completed)
+
+def validate_sharded(path, workers=None, shards=None, params=None, taxonomy_tables=None, taxonomy_packages=None):
+    """Validates the instance at path in shards of facts on a pool of worker processes and returns the list of findings.
+
+    The findings are the same as those of eba_streaming.StreamingValidator.validate_file, in the same order.
+    """
+    workers = workers or os.cpu_count() or 1
+    initargs = (dict(params or {}), taxonomy_tables, list(taxonomy_packages or ()))
+    init_worker(*initargs)
+    # Compressed members of zip archives cannot be read at random offsets
+    layout = DocumentLayout.scan(path, shards or workers) if eba_streaming.split_archive_path(path)[1] is None else None
+    if layout is None:
+        return _worker['validator'].validate_file(path)
+
+    # The head with the contexts and units is parsed once, by the main process
+    merged = _MergeState(_worker['validator'])
+    entry_point = None
+    if taxonomy_packages:
+        with open(path, 'rb') as f:
+            head, entry_point = eba_streaming.read_entry_point(f)
+    merged.use_taxonomy(entry_point)
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            completed = merged.parse(_RangesReader(data, layout.prolog_end, layout.root_name, [(layout.prolog_end, layout.head_end)]))
+    if not completed:
+        # Not well-formed, or the head does not end between children of the document element
+        return _worker['validator'].validate_file(path)
+
+    _worker['contexts'] = merged.contexts
+    _worker['units'] = merged.units
+    tasks = [(path, layout.prolog_end, layout.root_name, entry_point, shard, byte_range, None) for shard, byte_range in enumerate(layout.shards, 1)]
+    if workers == 1 or len(tasks) <= 1:
+        results = [validate_shard(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(min(workers, len(tasks)), initializer=init_worker, initargs=initargs + (merged.contexts, merged.units)) as pool:
+            results = pool.map(validate_shard, tasks)
+    if not all(result.completed for result in results):
+        # Not well-formed, a shard boundary inside a child of the document element, or contexts or units after facts
+        return _worker['validator'].validate_file(path)
+
+    for task, result in zip(tasks, results):
+        # EBA 3.1 - A shard which saw another currency first is checked again against the currency of the preceding shards
+        if merged.single_currency_unit is not None and result.single_currency_unit not in (None, merged.single_currency_unit):
+            result = validate_shard(task[:-1] + (merged.single_currency_unit,))
+        merged.merge(result)
+
+    # Rules decided at the end of the document come after all shards
+    merged.shard = len(tasks) + 1
+    merged.ordinal = 0
+    merged.sequence = 0
+    merged.end_document()
+    return [finding for position, finding in sorted(merged.findings, key=lambda item: item[0])]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check a huge EBA filing in parallel shards without RaptorXML.')
+    parser.add_argument('instances', nargs='+', help='XBRL instance documents, zip archives or archive.zip|zip/instance.xbrl')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: number of CPUs)')
+    parser.add_argument('--shards', type=int, default=None, help='number of shards of facts (default: number of workers)')
+    parser.add_argument('--script-param', action='append', default=[], metavar='NAME:VALUE', help='script parameter as accepted by eba_validation.py (may be repeated)')
+    parser.add_argument('--taxonomy-tables', metavar='PATH', help='taxonomy tables cached by eba_validation.py (enables rules 1.6.3 and 3.5)')
+    parser.add_argument('--taxonomy-package', action='append', default=[], metavar='PATH', help='taxonomy package to derive the taxonomy tables from (may be repeated, enables rules 1.6.3 and 3.5)')
+    args = parser.parse_args(argv)
+
+    params = dict(param.split(':', 1) for param in args.script_param)
+    has_errors = False
+    for path in eba_streaming.expand_archives(args.instances):
+        for finding in validate_sharded(path, args.workers, args.shards, params, args.taxonomy_tables, args.taxonomy_package):
+            print('%s: %s' % (path, eba_streaming.format_finding(finding)))
+            has_errors = has_errors or finding.severity == eba_streaming.ERROR
+    return 1 if has_errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,819 @@
+# This script checks the EBA XBRL Filing Rules (Version 4.1) implemented by eba_validation.py without RaptorXML.
+#
+# The instance is streamed with xml.etree.ElementTree.iterparse. Contexts and units are kept in compact tables
+# and every fact is checked and discarded as soon as it has been parsed. Memory still grows with the number of
+# facts by the keys needed for duplicate detection (2.16) and by the concept, contextRef and unitRef of every fact
+# with an id, which wait for the footnote links (3.7), but not by the facts themselves.
+#
+# There is no XBRL 2.1 or XBRL Dimensions validation and no DTS. Rules which need the taxonomy are therefore
+# either approximated or skipped:
+#
+#   1.6     Filing indicator codes are only checked if taxonomy tables are given (--taxonomy-tables or --taxonomy-package)
+#   3.1     Facts with an ISO 4217 unit are treated as monetary facts
+#   3.2     Numeric facts whose unit is neither pure nor an ISO 4217 currency are reported
+#   3.4     A prefix counts as used if its namespace is used by any element or attribute name
+#   3.5     Only checked if taxonomy tables are given (--taxonomy-tables or --taxonomy-package)
+#   3.8     The content of all non-numeric facts is checked
+#   2.7     Periods are compared by their lexical values, e.g. 2015-12-31 and 2015-12-31T24:00:00 are different
+#           periods, so such contexts are not duplicates (nor equivalent for 2.16)
+#   2.13    Periods are compared by their lexical values as for 2.7
+#   2.16    Facts which precede the definition of their context or unit are compared at the end of the document
+#
+# The taxonomy tables file is the JSON file written by eba_validation.py into its taxonomy-cache-dir. Instead,
+# the tables can be derived from taxonomy packages (--taxonomy-package), which are read straight from the zip
+# files: the DTS of the instance's entry point is discovered through the package catalogs, the filing indicator
+# codes are taken from all filing indicator code labels and the canonical prefixes from all schemas in the DTS.
+#
+# Instances inside zip archives are read without extracting them, either given as archive.zip|zip/instance.xbrl
+# or as archive.zip for all *.xbrl and *.xml files in the archive.
+#
+# Example invocations:
+#
+# Pre-screen a single filing
+#   python eba_streaming.py instance.xbrl
+# Pre-screen a filing with additional options
+#   python eba_streaming.py --script-param=max-id-length:10 --taxonomy-tables=cache/0123abcd.json instance.xbrl
+# Pre-screen a zipped submission against the taxonomy package of its entry point
+#   python eba_streaming.py --taxonomy-package=EBA_CRD_IV_XBRL_2.6_Dictionary_2.6.0.0.zip submission.zip
+
+import argparse
+import collections
+import json
+import posixpath
+import re
+import sys
+import urllib.parse
+import xml.etree.ElementTree as ElementTree
+import zipfile
+
+XBRLI = 'http://www.xbrl.org/2003/instance'
+LINK = 'http://www.xbrl.org/2003/linkbase'
+XLINK = 'http://www.w3.org/1999/xlink'
+XBRLDI = 'http://xbrl.org/2006/xbrldi'
+XSI = 'http://www.w3.org/2001/XMLSchema-instance'
+XML_NS = 'http://www.w3.org/XML/1998/namespace'
+XINCLUDE = 'http://www.w3.org/2001/XInclude'
+ISO4217 = 'http://www.xbrl.org/2003/iso4217'
+FIND = 'http://www.eurofiling.info/xbrl/ext/filing-indicators'
+EBA_DIM = 'http://www.eba.europa.eu/xbrl/crr/dict/dim'
+EBA_CA = 'http://www.eba.europa.eu/xbrl/crr/dict/dom/CA'
+XSD = 'http://www.w3.org/2001/XMLSchema'
+CATALOG = 'urn:oasis:names:tc:entity:xmlns:xml:catalog'
+FILING_INDICATOR_CODE_ROLE = 'http://www.eurofiling.info/xbrl/role/filing-indicator-code'
+
+# Separates the path of a zip archive from the name of a file inside it, as in RaptorXML
+ARCHIVE_SEPARATOR = '|zip/'
+INSTANCE_EXTENSIONS = ('.xbrl', '.xml')
+
+ERROR = 'error'
+WARNING = 'warning'
+
+Finding = collections.namedtuple('Finding', 'rule severity message detail location ids')
+Finding.__doc__ = """A single violation of an EBA filing rule.
+
+rule is the rule number (e.g. '2.16.1'), message and detail are the texts used by eba_validation.py, location
+describes the offending object and ids maps object kinds ('context', 'unit', 'fact', 'concept', ...) to the
+ids of the objects involved.
+"""
+
+def _clark(ns, local):
+    return '{%s}%s' % (ns, local) if ns else local
+
+def _split(tag):
+    if tag[0] == '{':
+        ns, local = tag[1:].split('}', 1)
+        return ns, local
+    return None, tag
+
+_XML_DECL_RE = re.compile(br'^<\?xml\s+([^?]*)\?>')
+_PSEUDO_ATTR_RE = re.compile(br'(\w+)\s*=\s*["\']([^"\']*)["\']')
+_DATE_RE = re.compile(r'^-?\d{4,}-\d{2}-\d{2}$')
+
+def fact_location(concept, context_ref, unit_ref, fact_id):
+    """Returns the location and the ids of the objects involved as reported for a fact."""
+    ids = {'concept': concept, 'context': context_ref}
+    if fact_id:
+        ids['fact'] = fact_id
+    if unit_ref:
+        ids['unit'] = unit_ref
+    return 'fact %s (context %s)' % (concept, context_ref), ids
+
+def read_xml_declaration(head):
+    """Returns the encoding and standalone pseudo-attributes of the XML declaration at the start of head (bytes)."""
+    match = _XML_DECL_RE.match(head.lstrip(b'\xef\xbb\xbf'))
+    if not match:
+        return None, None
+    pseudo_attrs = dict(_PSEUDO_ATTR_RE.findall(match.group(1)))
+    encoding = pseudo_attrs.get(b'encoding')
+    standalone = pseudo_attrs.get(b'standalone')
+    return (encoding.decode('ascii') if encoding else None), (standalone.decode('ascii') if standalone else None)
+
+def load_taxonomy_tables(path):
+    """Loads the filing indicator codes and canonical namespace prefixes cached by eba_validation.py."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return set(data['filing_indicators']), data['namespace_bindings']
+
+# Zip archives
+
+def split_archive_path(path):
+    """Splits archive.zip|zip/member into the path of the archive and the member name, which is None for plain files."""
+    archive, separator, member = path.partition(ARCHIVE_SEPARATOR)
+    return (archive, member) if separator else (path, None)
+
+def open_instance(path):
+    """Opens the instance document at path for binary reading, decompressing members of zip archives on the fly."""
+    archive, member = split_archive_path(path)
+    if member is None:
+        return open(path, 'rb')
+    try:
+        with zipfile.ZipFile(archive) as z:
+            # The member keeps the archive file open until it is closed itself
+            return z.open(member)
+    except (zipfile.BadZipFile, KeyError) as e:
+        raise OSError('cannot read %s: %s' % (path, e))
+
+def expand_archives(paths):
+    """Replaces the paths of zip archives by the paths of the instance documents inside them."""
+    expanded = []
+    for path in paths:
+        if split_archive_path(path)[1] is None and path.lower().endswith('.zip'):
+            with zipfile.ZipFile(path) as z:
+                expanded.extend(path + ARCHIVE_SEPARATOR + name for name in z.namelist() if name.lower().endswith(INSTANCE_EXTENSIONS) and not name.startswith('META-INF/') and '/META-INF/' not in name)
+        else:
+            expanded.append(path)
+    return expanded
+
+def read_entry_point(f):
+    """Reads the instance from the binary file object f up to its first link:schemaRef.
+
+    Returns the bytes read, which must be passed on to the parser before the rest of f, and the entry point (None
+    if the first child of the document element is not a link:schemaRef).
+    """
+    head = []
+    parser = ElementTree.XMLPullParser(events=('start',))
+    depth = 0
+    try:
+        while True:
+            data = f.read(16 * 1024)
+            head.append(data)
+            if not data:
+                return b''.join(head), None
+            parser.feed(data)
+            for event, elem in parser.read_events():
+                if depth == 1:
+                    href = elem.get(_clark(XLINK, 'href')) if elem.tag == _clark(LINK, 'schemaRef') else None
+                    return b''.join(head), href
+                depth += 1
+    except ElementTree.ParseError:
+        # Reported by the validation
+        return b''.join(head), None
+
+class TaxonomyPackage:
+    """A taxonomy package, whose documents are read straight from the zip file.
+
+    URLs are mapped to documents in the package with the rewriteURI entries of its META-INF/catalog.xml.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.archive = zipfile.ZipFile(path)
+        self.names = set(self.archive.namelist())
+        self.rewrites = []
+        for name in sorted(self.names):
+            if name == 'META-INF/catalog.xml' or name.endswith('/META-INF/catalog.xml'):
+                base = posixpath.dirname(name)
+                with self.archive.open(name) as f:
+                    for event, elem in ElementTree.iterparse(f):
+                        if elem.tag == _clark(CATALOG, 'rewriteURI'):
+                            self.rewrites.append((elem.get('uriStartString', ''), posixpath.normpath(posixpath.join(base, elem.get('rewritePrefix', '')))))
+        # Longest prefixes first
+        self.rewrites.sort(key=lambda rewrite: len(rewrite[0]), reverse=True)
+
+    def resolve(self, url):
+        """Returns the name of the document with the given URL in the package, or None."""
+        for prefix, rewrite in self.rewrites:
+            if url.startswith(prefix):
+                name = posixpath.normpath(posixpath.join(rewrite, url[len(prefix):]))
+                return name if name in self.names else None
+        return None
+
+    def open(self, url):
+        name = self.resolve(url)
+        return self.archive.open(name) if name else None
+
+def discover_taxonomy_tables(packages, entry_point):
+    """Derives the filing indicator codes and canonical namespace prefixes of an entry point from taxonomy packages.
+
+    Follows schema imports and includes, linkbase references and locators through all documents of the DTS which
+    are found in the packages. Schemas are only read up to their first definition, as imports and linkbase
+    references precede all definitions.
+    """
+    filing_indicators = set()
+    namespace_bindings = {}
+    discovered = {entry_point}
+    queue = [entry_point]
+    while queue:
+        url = queue.pop()
+        f = next((f for f in (package.open(url) for package in packages) if f is not None), None)
+        if f is None:
+            continue
+
+        def discover(href):
+            href = urllib.parse.urljoin(url, href).partition('#')[0]
+            if href and href not in discovered:
+                discovered.add(href)
+                queue.append(href)
+
+        with f:
+            depth = 0
+            namespaces = []
+            for event, elem in ElementTree.iterparse(f, events=('start-ns', 'start', 'end')):
+                if event == 'start-ns':
+                    if depth == 0:
+                        namespaces.append(elem)
+                    continue
+                if event == 'end':
+                    depth -= 1
+                    if elem.tag == _clark(LINK, 'label') and elem.get(_clark(XLINK, 'role')) == FILING_INDICATOR_CODE_ROLE:
+                        filing_indicators.add((elem.text or '').strip())
+                    elem.clear()
+                    continue
+                depth += 1
+                ns, local = _split(elem.tag)
+                if depth == 1 and elem.tag == _clark(XSD, 'schema'):
+                    target_namespace = elem.get('targetNamespace')
+                    for prefix, uri in namespaces:
+                        if prefix and uri == target_namespace:
+                            namespace_bindings.setdefault(target_namespace, prefix)
+                            break
+                elif ns == XSD and local in ('import', 'include'):
+                    if elem.get('schemaLocation'):
+                        discover(elem.get('schemaLocation'))
+                elif ns == LINK and local in ('linkbaseRef', 'loc', 'roleRef', 'arcroleRef'):
+                    discover(elem.get(_clark(XLINK, 'href'), ''))
+                elif depth == 2 and ns == XSD and local not in ('annotation', 'redefine'):
+                    # First definition of a schema
+                    break
+    return filing_indicators, namespace_bindings
+
+# Compact per-context and per-unit records
+
+# The equivalence class of a context or unit is the id of the first context or unit with the same aspect values
+ContextInfo = collections.namedtuple('ContextInfo', 'id has_segment has_scenario denomination currency context_class')
+UnitInfo = collections.namedtuple('UnitInfo', 'id is_monetary is_pure currency unit_class')
+
+class StreamingValidator:
+    """Checks the EBA filing rules on an instance document while it is being parsed.
+
+    Findings are passed to the report callable as soon as they are known. Rules which can only be decided at the
+    end of the document (unused contexts, units, fact ids and namespace prefixes) are reported last.
+
+    Taxonomy packages are given as paths or as opened TaxonomyPackage objects. Validators which share the packages
+    can share package_tables as well, the taxonomy tables derived from the packages per entry point.
+    """
+
+    def __init__(self, params=None, taxonomy_tables=None, taxonomy_packages=None, package_tables=None):
+        params = params or {}
+        self.max_id_length = int(params.get('max-id-length', 50))
+        self.max_string_length = int(params.get('max-string-length', 100))
+        self.filing_indicator_codes, self.namespace_bindings = taxonomy_tables or (None, None)
+        self.taxonomy_packages = [package if isinstance(package, TaxonomyPackage) else TaxonomyPackage(package) for package in taxonomy_packages or ()]
+        self.package_tables = {} if package_tables is None else package_tables
+
+    def taxonomy_tables(self, entry_point):
+        """Returns the filing indicator codes and canonical namespace prefixes for the given entry point."""
+        if not self.taxonomy_packages or not entry_point:
+            return self.filing_indicator_codes, self.namespace_bindings
+        tables = self.package_tables.get(entry_point)
+        if tables is None:
+            tables = self.package_tables[entry_point] = discover_taxonomy_tables(self.taxonomy_packages, entry_point)
+        return tables
+
+    def validate(self, source, report):
+        """Validates the instance read from source (a path, also inside a zip archive, or a binary file object)."""
+        state = _ValidationState(self, report)
+        state.run(source)
+
+    def validate_file(self, source):
+        """Validates the instance read from source and returns the list of findings."""
+        findings = []
+        self.validate(source, findings.append)
+        return findings
+
+class _ValidationState:
+    """The state of a single streaming validation."""
+
+    def __init__(self, validator, report):
+        self.validator = validator
+        self.report = report
+        self.root_prefixes = {}
+        self.used_prefixes = set()
+        self.used_namespaces = set()
+        self.scopes = [{'xml': XML_NS}]
+        self.schema_refs = 0
+        self.root_lang = None
+        self.contexts = {}
+        self.context_fingerprints = {}
+        self.context_usage = collections.Counter()
+        self.units = {}
+        self.unit_fingerprints = {}
+        self.unit_usage = collections.Counter()
+        self.single_identifier = None
+        self.single_period = None
+        self.fact_keys = {}
+        self.fact_ids = {}
+        self.footnote_ids = set()
+        self.filing_indicators = set()
+        self.single_currency_unit = None
+        self.pending_facts = []
+        self.pending_duplicates = []
+        self.pending_indicators = []
+        self.filing_indicator_codes = validator.filing_indicator_codes
+        self.namespace_bindings = validator.namespace_bindings
+
+    # Reporting
+
+    def finding(self, rule, message, detail, location, severity=ERROR, **ids):
+        self.report(Finding(rule, severity, message, detail, location, ids))
+
+    def name(self, ns, local):
+        """Returns a prefixed name using the prefixes declared on the document element."""
+        prefix = self.root_prefixes.get(ns)
+        return '%s:%s' % (prefix, local) if prefix else _clark(ns, local)
+
+    # Parsing
+
+    def run(self, source):
+        if isinstance(source, str):
+            with open_instance(source) as f:
+                completed = self.parse(self.select_taxonomy(f))
+        else:
+            completed = self.parse(self.select_taxonomy(source))
+        if completed:
+            self.end_document()
+
+    def select_taxonomy(self, f):
+        """Selects the taxonomy tables of the instance's entry point if they are derived from taxonomy packages."""
+        if not self.validator.taxonomy_packages:
+            return f
+        head, entry_point = read_entry_point(f)
+        self.use_taxonomy(entry_point)
+        return _Prepend(head, f)
+
+    def use_taxonomy(self, entry_point):
+        self.filing_indicator_codes, self.namespace_bindings = self.validator.taxonomy_tables(entry_point)
+
+    def parse(self, f):
+        """Parses the instance and runs all rules which are decided while parsing. Returns False if the instance is not well-formed."""
+        head = f.read(1024)
+        self.check_xml_declaration(head)
+
+        pending_ns = []
+        depth = 0
+        root = None
+        try:
+            for event, value in ElementTree.iterparse(_Prepend(head, f), events=('start-ns', 'start', 'end')):
+                if event == 'start-ns':
+                    pending_ns.append(value)
+                elif event == 'start':
+                    scope = self.scopes[-1]
+                    if pending_ns:
+                        scope = dict(scope)
+                        scope.update(pending_ns)
+                    self.scopes.append(scope)
+                    if depth == 0:
+                        root = value
+                        # Inherited by the facts (2.16)
+                        self.root_lang = value.get(_clark(XML_NS, 'lang'))
+                        self.start_document_element(value, pending_ns)
+                    elif depth == 1:
+                        self.start_top_level_element()
+                    if depth > 0 and pending_ns:
+                        for prefix, uri in pending_ns:
+                            self.finding('3.9', '[EBA.3.9] Namespace prefix declaration {prefix} restricted to the document element.'.format(prefix='xmlns:%s' % prefix if prefix else 'xmlns'), 'Namespace prefixes declarations SHOULD be restricted to the document element.', _clark(*_split(value.tag)), severity=WARNING, prefix=prefix)
+                    self.start_element(value)
+                    pending_ns = []
+                    depth += 1
+                else:
+                    depth -= 1
+                    self.end_element(value, scope=self.scopes[-1])
+                    self.scopes.pop()
+                    if depth == 1:
+                        self.end_top_level_element(value)
+                        root.clear()
+        except ElementTree.ParseError as e:
+            self.finding('1.9', '[EBA.1.9] Valid XML-XBRL.', 'Instance documents MUST be XBRL 2.1 and XBRL Dimensions 1.0 valid. [EFM11, p. 6-8]', 'line %d, column %d' % e.position, error=str(e))
+            return False
+        return True
+
+    def check_xml_declaration(self, head):
+        encoding, standalone = read_xml_declaration(head)
+        if (encoding or 'UTF-8').upper() != 'UTF-8':
+            self.finding('1.4', '[EBA.1.4] Character encoding of XBRL instance documents.', 'XBRL instance documents MUST use "UTF-8" encoding. [GFM11, p. 11]', 'document')
+        if standalone is not None:
+            self.finding('1.13', '[EBA.1.13] Standalone Document Declaration.', 'XBRL instance documents SHOULD NOT use the XML standalone declaration.', 'document', severity=WARNING)
+
+    def start_top_level_element(self):
+        """Called before the start of every child of the document element is processed."""
+
+    def start_document_element(self, root, namespaces):
+        declared = {}
+        for prefix, uri in namespaces:
+            if prefix:
+                self.root_prefixes.setdefault(uri, prefix)
+        for prefix, uri in namespaces:
+            if not prefix:
+                continue
+            # EBA 3.10 - Avoid multiple prefix declarations for the same namespace
+            if uri in declared:
+                self.finding('3.10', '[EBA.3.10] Avoid multiple prefix declarations {prefix} and {prefix2} for the same namespace {namespace}.'.format(prefix='xmlns:%s' % prefix, prefix2='xmlns:%s' % declared[uri], namespace=uri), 'Namespaces used in the document SHOULD be associated to a single namespace prefix.', 'xmlns:%s' % prefix, severity=WARNING, prefix=prefix, prefix2=declared[uri], namespace=uri)
+            else:
+                declared[uri] = prefix
+            # EBA 3.5 - Re-use of canonical namespace prefixes
+            bindings = self.namespace_bindings
+            if bindings is not None and prefix != bindings.get(uri, prefix):
+                self.finding('3.5', '[EBA.3.5] Re-use of canonical namespace prefix {prefix}.'.format(prefix='xmlns:%s' % prefix), 'Namespace prefixes, where used in instance documents, SHOULD mirror the namespace prefixes as defined by their schema author(s). [FRIS04]', 'xmlns:%s' % prefix, severity=WARNING, prefix=prefix, namespace=uri)
+        self.root_namespaces = namespaces
+
+        # EBA 1.14 - @xsd:schemaLocation and @xsd:noNamespaceSchemaLocation
+        for local in ('schemaLocation', 'noNamespaceSchemaLocation'):
+            if root.get(_clark(XSI, local)) is not None:
+                self.finding('1.14', '[EBA.1.14] @xsd:schemaLocation and @xsd:noNamespaceSchemaLocation.', '@xsd:schemaLocation or @xsd:noNamespaceSchemaLocation MUST NOT be used.', '@xsi:%s' % local)
+                break
+
+    def start_element(self, elem):
+        ns, local = _split(elem.tag)
+        self.used_namespaces.add(ns)
+        for name in elem.attrib:
+            if name[0] == '{':
+                self.used_namespaces.add(_split(name)[0])
+        # EBA 2.1 - The existence of xml:base is not permitted
+        if _clark(XML_NS, 'base') in elem.attrib:
+            self.finding('2.1', '[EBA.2.1] The existence of {xml_base} is not permitted.'.format(xml_base='@xml:base'), 'The attribute @xml:base MUST NOT appear in any instance document. [EFM13, p. 6-7].', self.name(ns, local), base=elem.attrib[_clark(XML_NS, 'base')])
+        # EBA 1.15 - XInclude
+        if ns == XINCLUDE:
+            self.finding('1.15', '[EBA.1.15] XInclude.', 'XBRL instance documents MUST NOT use the XInclude specification (xi:include element).', self.name(ns, local))
+
+    def end_element(self, elem, scope):
+        # Record the prefixes of QName typed values and resolve them while their namespace scope is still known
+        ns, local = _split(elem.tag)
+        if (ns == XBRLI and local == 'measure') or (ns == XBRLDI and local == 'explicitMember'):
+            elem.text = self.resolve_qname((elem.text or '').strip(), scope)
+        if ns == XBRLDI:
+            elem.set('dimension', self.resolve_qname(elem.get('dimension', ''), scope))
+
+    def resolve_qname(self, text, scope):
+        prefix, _, local = text.rpartition(':')
+        self.used_prefixes.add(prefix)
+        return _clark(scope.get(prefix), local)
+
+    def end_top_level_element(self, elem):
+        ns, local = _split(elem.tag)
+        if ns == XBRLI:
+            if local == 'context':
+                self.end_context(elem)
+            elif local == 'unit':
+                self.end_unit(elem)
+        elif ns == LINK:
+            if local == 'schemaRef':
+                self.end_schema_ref(elem)
+            elif local == 'linkbaseRef':
+                self.finding('2.4', '[EBA.2.4] The use of {linkbaseRef} element is not permitted.'.format(linkbaseRef='link:linkbaseRef'), 'Reference from an instance to the taxonomy MUST only be by means of the link:schemaRef element. The element link:linkbaseRef MUST NOT be used in any instance document.', 'link:linkbaseRef', href=elem.get(_clark(XLINK, 'href')))
+            elif local == 'footnoteLink':
+                self.end_footnote_link(elem)
+        else:
+            self.end_fact(elem, self.root_lang)
+
+    # Instance syntax rules
+
+    def end_schema_ref(self, elem):
+        href = elem.get(_clark(XLINK, 'href'), '')
+        self.schema_refs += 1
+        if self.schema_refs == 1:
+            # EBA 2.2 - The absolute URL has to be stated for the link:schemaRef element
+            if not href.startswith('http://'):
+                self.finding('2.2', '[EBA.2.2] The absolute URL has to be stated for the {schemaRef} element.'.format(schemaRef='link:schemaRef'), 'The link:schemaRef element in submitted instances MUST resolve to the full published entry point URL (absolute URL).', 'link:schemaRef', href=href)
+        else:
+            # EBA 2.3 - Only one link:schemaRef element is allowed per instance document
+            self.finding('2.3', '[EBA.2.3] Only one {schemaRef} element is allowed per instance document.'.format(schemaRef='link:schemaRef'), 'Any reported XBRL instance document MUST contain only one xbrli:xbrl/link:schemaRef element.', 'link:schemaRef', href=href)
+
+    def end_footnote_link(self, elem):
+        for child in elem:
+            ns, local = _split(child.tag)
+            if ns != LINK:
+                continue
+            if local == 'loc':
+                # Inside the instance facts can only be referenced by id from footnote locators
+                fragment = child.get(_clark(XLINK, 'href'), '').split('#')[-1]
+                # Check for short-hand xpointer notation
+                if '(' not in fragment:
+                    self.footnote_ids.add(fragment)
+            elif local == 'footnote':
+                # EBA 2.25 - XBRL footnotes are ignored by EBA
+                self.finding('2.25', '[EBA.2.25] XBRL {footnote} are ignored by EBA.'.format(footnote='link:footnote'), 'Relevant business data MUST only be contained in contexts, units, schemaRef and facts. A footnote MUST not have any impact on the regulatory content of a report.', 'link:footnote', severity=WARNING, footnote=child.get(_clark(XLINK, 'label')))
+
+    # Context related rules
+
+    def end_context(self, elem):
+        context_id = elem.get('id', '')
+        location = 'context %s' % context_id
+        entity = elem.find(_clark(XBRLI, 'entity'))
+        identifier = entity.find(_clark(XBRLI, 'identifier')) if entity is not None else None
+        scheme = identifier.get('scheme', '') if identifier is not None else ''
+        identifier_value = (scheme, (identifier.text or '').strip() if identifier is not None else '')
+        segment = entity.find(_clark(XBRLI, 'segment')) if entity is not None else None
+        scenario = elem.find(_clark(XBRLI, 'scenario'))
+        period = elem.find(_clark(XBRLI, 'period'))
+        period_kind, period_value = 'duration', ()
+        instant = forever = None
+        if period is not None:
+            instant = period.find(_clark(XBRLI, 'instant'))
+            forever = period.find(_clark(XBRLI, 'forever'))
+            if instant is not None:
+                period_kind, period_value = 'instant', ((instant.text or '').strip(),)
+            elif forever is not None:
+                period_kind = 'forever'
+            else:
+                period_value = tuple((child.text or '').strip() for child in period)
+
+        # EBA 2.6 - The length of the @id attribute should be limited to the necessary characters
+        if len(context_id) > self.validator.max_id_length:
+            self.finding('2.6', '[EBA.2.6] The length of the {id} attribute should be limited to the necessary characters.'.format(id='@id'), 'Semantics SHOULD NOT be expressed in the xbrli:context/@id attribute. The values of each @id attribute SHOULD be as short as possible.', location, severity=WARNING, context=context_id)
+
+        # EBA 2.9 - Single reporter per instance
+        if self.single_identifier is None:
+            self.single_identifier = identifier_value
+        elif identifier_value != self.single_identifier:
+            self.finding('2.9', '[EBA.2.9] Single reporter per instance.', 'All xbrli:identifier content and @scheme attributes in an instance MUST be identical. [EFM13, p. 6-8]', location, context=context_id)
+
+        # EBA 2.10 - The xbrli:period date elements reported must be valid
+        if period_kind == 'instant' and not _DATE_RE.match(period_value[0]):
+            self.finding('2.10', '[EBA.2.10] The {period} date elements reported must be valid.'.format(period='xbrli:period'), 'All xbrli:period date elements MUST be valid against the xs:date data type, and reported without a timezone. [GFM11, p. 16]', location, context=context_id)
+
+        # EBA 2.11 - The existence of xbrli:forever is not permitted
+        if period_kind == 'forever':
+            self.finding('2.11', '[EBA.2.11] The existence of {forever} is not permitted.'.format(forever='xbrli:forever'), 'The element ‘xbrli:forever’ MUST NOT be used. [GFM11, p. 19]', location, context=context_id)
+
+        # EBA 2.13 - XBRL period consistency
+        period_aspect = (period_kind,) + period_value
+        if self.single_period is None:
+            self.single_period = period_aspect
+        if period_kind != 'instant' or period_aspect != self.single_period:
+            self.finding('2.13', '[EBA.2.13] XBRL {period} consistency.'.format(period='xbrli:period'), 'All xbrl periods in a report instance MUST refer to the (same) reference date instant. All xbrl periods MUST be instants.', location, context=context_id)
+
+        # EBA 2.14 - The existence of xbrli:segment is not permitted
+        if segment is not None:
+            self.finding('2.14', '[EBA.2.14] The existence of {segment} is not permitted.'.format(segment='xbrli:segment'), 'xbrli:segment elements MUST NOT be used.', location, context=context_id)
+
+        # EBA 2.15 - Restrictions on the use of the xbrli:scenario element
+        if scenario is not None and any(_split(child.tag)[0] != XBRLDI for child in scenario):
+            self.finding('2.15', '[EBA.2.15] Restrictions on the use of the {scenario} element.'.format(scenario='xbrli:scenario'), 'If an xbrli:scenario element appears in a xbrli:context, then its children MUST only be one or more xbrldi:explicitMember and/or xbrldi:typedMember elements, and MUST NOT contain any other content. [EFM13, p. 6-8].', location, context=context_id)
+
+        # EBA 3.6 - LEI and other entity codes
+        if scheme == 'http://standard.iso.org/iso/17442':
+            self.finding('3.6', '[EBA.3.6] LEI and other entity codes.', 'Producers of instance documents are encouraged to switch as quickly as possible to producing the correct form “http://standards.iso.org/iso/17442”.', location, severity=WARNING, context=context_id)
+
+        members = []
+        for container in (segment, scenario):
+            if container is None:
+                continue
+            for member in container:
+                ns, local = _split(member.tag)
+                if ns == XBRLDI and local == 'explicitMember':
+                    members.append((member.get('dimension'), member.text))
+                elif ns == XBRLDI and local == 'typedMember':
+                    members.append((member.get('dimension'), ElementTree.tostring(member[0], encoding='unicode') if len(member) else ''))
+        members.sort()
+        dimensions = dict(members)
+        denomination = dimensions.get(_clark(EBA_DIM, 'CCA')) == _clark(EBA_CA, 'x1')
+        currency = dimensions.get(_clark(EBA_DIM, 'CUS'))
+        if currency:
+            currency = _split(currency)[1]
+
+        # EBA 2.7 - No unused or duplicated xbrli:context nodes
+        fingerprint = (identifier_value, period_aspect, tuple(members))
+        duplicate = self.context_fingerprints.setdefault(fingerprint, context_id)
+        if duplicate != context_id:
+            self.finding('2.7', '[EBA.2.7] No unused or duplicated {context} nodes.'.format(context='xbrli:context'), 'An instance document SHOULD NOT contain duplicated context, unless required for technical reasons, e.g. to support XBRL streaming.', location, severity=WARNING, context=context_id, context2=duplicate)
+
+        self.contexts[context_id] = ContextInfo(context_id, segment is not None, scenario is not None, denomination, currency, duplicate)
+
+    # Unit related rules
+
+    def end_unit(self, elem):
+        unit_id = elem.get('id', '')
+        divide = elem.find(_clark(XBRLI, 'divide'))
+        if divide is not None:
+            numerator = tuple(sorted(m.text for m in divide[0])) if len(divide) > 0 else ()
+            denominator = tuple(sorted(m.text for m in divide[1])) if len(divide) > 1 else ()
+        else:
+            numerator = tuple(sorted(m.text for m in elem.findall(_clark(XBRLI, 'measure'))))
+            denominator = ()
+        if not numerator:
+            numerator = ('',)
+        is_monetary = len(numerator) == 1 and not denominator and _split(numerator[0])[0] == ISO4217
+        is_pure = numerator == (_clark(XBRLI, 'pure'),) and not denominator
+
+        # EBA 2.21 - Duplicates of xbrli:xbrl/xbrli:unit
+        duplicate = self.unit_fingerprints.setdefault((numerator, denominator), unit_id)
+        if duplicate != unit_id:
+            self.finding('2.21', '[EBA.2.21] Duplicates of xbrli:xbrl/xbrli:unit.', 'An XBRL instance SHOULD NOT, in general, contain duplicated units, unless required for technical reasons, e.g. to support XBRL streaming.', 'unit %s' % unit_id, severity=WARNING, unit=unit_id, unit2=duplicate)
+
+        self.units[unit_id] = UnitInfo(unit_id, is_monetary, is_pure, _split(numerator[0])[1] if is_monetary else None, duplicate)
+
+    # Fact related rules
+
+    def end_fact(self, elem, lang):
+        ns, local = _split(elem.tag)
+        lang = elem.get(_clark(XML_NS, 'lang'), lang)
+        context_ref = elem.get('contextRef')
+        if context_ref is None:
+            # Tuple: check all nested facts
+            for child in elem:
+                self.end_fact(child, lang)
+            return
+
+        fact_id = elem.get('id')
+        unit_ref = elem.get('unitRef')
+        concept = self.name(ns, local)
+        location, ids = fact_location(concept, context_ref, unit_ref, fact_id)
+        self.context_usage[context_ref] += 1
+        if unit_ref:
+            self.unit_usage[unit_ref] += 1
+
+        is_nil = elem.get(_clark(XSI, 'nil')) in ('true', '1')
+        text = elem.text or ''
+
+        if ns == FIND and local == 'filingIndicator':
+            self.check_filing_indicator(text.strip(), location, ids)
+        else:
+            self.check_duplicate_fact((ns, local, context_ref, lang), unit_ref, fact_id, concept, location, ids)
+
+        # EBA 2.17 - The use of the @precision attribute is not permitted
+        if elem.get('precision') is not None:
+            self.finding('2.17', '[EBA.2.17] The use of the {precision} attribute is not permitted.'.format(precision='@precision'), '@decimals MUST be used as the only means for expressing precision on a fact. [FRIS 2.8.1.1, EFM13, p.6-12].', location, **ids)
+
+        # EBA 2.19 - Guidance on use of zeros and non-reported data
+        if is_nil:
+            self.finding('2.19', '[EBA.2.19] Guidance on use of zeros and non-reported data.', 'The @xsi:nil attribute MUST NOT be used in the instance.', location, **ids)
+
+        # EBA 3.7 - Unused @id attribute on facts (decided at the end, footnote links usually follow the facts)
+        if fact_id:
+            self.fact_ids[fact_id] = (concept, context_ref, unit_ref)
+
+        # EBA 3.8 - Length of strings in instance
+        if unit_ref is None and not is_nil and len(text) > self.validator.max_string_length:
+            self.finding('3.8', '[EBA.3.8] Length of strings in instance.', 'The values of each string SHOULD be as short as possible.', location, severity=WARNING, **ids)
+
+        if unit_ref is not None:
+            if context_ref in self.contexts and unit_ref in self.units:
+                self.check_fact_unit(self.contexts[context_ref], self.units[unit_ref], location, ids)
+            else:
+                # Contexts and units may follow the facts which reference them
+                self.pending_facts.append((context_ref, unit_ref, location, ids))
+
+    def check_duplicate_fact(self, key, unit_ref, fact_id, concept, location, ids):
+        """EBA 2.16 - Duplicate (Redundant/Inconsistent) facts, for a fact with the key (namespace, local name, contextRef, xml:lang)"""
+        if key[2] not in self.contexts or (unit_ref and unit_ref not in self.units):
+            # Contexts and units may follow the facts which reference them
+            self.pending_duplicates.append((key, unit_ref, fact_id, concept, location, ids))
+        else:
+            self.check_fact_key(self.fact_key(key), key[2], unit_ref, fact_id, concept, location, ids)
+
+    def fact_key(self, key):
+        """Returns the key of a fact with its contextRef replaced by the equivalence class of the context, as in eba_validation.py."""
+        ns, local, context_ref, lang = key
+        context = self.contexts.get(context_ref)
+        return (ns, local, context.context_class if context is not None else context_ref, lang)
+
+    def check_fact_key(self, key, context_ref, unit_ref, fact_id, concept, location, ids):
+        duplicate = self.fact_keys.get(key)
+        if duplicate is None:
+            self.fact_keys[key] = (unit_ref, fact_id)
+        else:
+            self.report_duplicate_fact(duplicate, unit_ref, concept, location, ids)
+
+    def unit_class(self, unit_ref):
+        unit = self.units.get(unit_ref) if unit_ref else None
+        return unit.unit_class if unit is not None else unit_ref
+
+    def report_duplicate_fact(self, duplicate, unit_ref, concept, location, ids):
+        """Reports a fact with the same key as the fact with the given (unit, id), which was found first. Units are compared by equivalence class."""
+        if self.unit_class(duplicate[0]) == self.unit_class(unit_ref):
+            self.finding('2.16', '[EBA.2.16] Duplicate (Redundant/Inconsistent) facts {fact} and {fact2}.'.format(fact=concept, fact2=concept), 'Instances MUST NOT contain duplicate business facts. [FRIS04],[EFM13, p. 6-10]', location, fact2=duplicate[1], **ids)
+        else:
+            self.finding('2.16.1', '[EBA.2.16.1] No multi-unit facts {fact} and {fact2}.'.format(fact=concept, fact2=concept), 'Instances MUST NOT contain business facts which would be duplicates were their units not different.', location, unit2=duplicate[0], fact2=duplicate[1], **ids)
+
+    def check_filing_indicator(self, code, location, ids):
+        """EBA 1.6 - Filing indicators"""
+        context = self.contexts.get(ids['context'])
+        if context is None:
+            self.pending_indicators.append((location, ids))
+        elif context.has_segment or context.has_scenario:
+            self.finding('1.6', '[EBA.1.6] Filing indicators.', 'The context referenced by the filing indicator elements MUST NOT contain xbrli:segment or xbrli:scenario elements.', location, **ids)
+        self.check_duplicate_indicator(code, location, ids)
+        codes = self.filing_indicator_codes
+        if codes is not None and code not in codes:
+            self.finding('1.6.3', '[EBA.1.6.3] Filing indicator codes.', 'The values of filing indicators MUST only be those given by the label resources with the role http://www.eurofiling.info/xbrl/role/filing-indicator-code applied to the relevant tables in the XBRL taxonomy4 for that reporting module (entry point). Filing indicator values must be formatted correctly (for example including any underscore characters).', location, code=code, **ids)
+
+    def check_duplicate_indicator(self, code, location, ids):
+        if code in self.filing_indicators:
+            self.report_duplicate_indicator(code, location, ids)
+        self.filing_indicators.add(code)
+
+    def report_duplicate_indicator(self, code, location, ids):
+        """EBA 1.6.1 - Multiple filing indicators for the same reporting unit"""
+        self.finding('1.6.1', '[EBA.1.6.1] Multiple filing indicators for the same reporting unit.', 'Reported XBRL instances MUST contain only one filing indicator element for a given reporting unit("template").', location, code=code, **ids)
+
+    def check_fact_unit(self, context, unit, location, ids):
+        if unit.is_monetary:
+            # EBA 3.1 - Choice of Currency for Monetary facts
+            if context.denomination:
+                if context.currency and context.currency != unit.currency:
+                    self.finding('3.1', '[EBA.3.1] Choice of Currency for Monetary fact {fact}.'.format(fact=ids['concept']), 'For facts falling under point (b), whose context also includes the dimension “Currency with significant liabilities” (CUS), the currency of the fact (i.e. unit) MUST be consistent with the value given for this dimension.', location, **ids)
+            elif self.single_currency_unit is None:
+                self.single_currency_unit = unit.id
+            elif unit.id != self.single_currency_unit:
+                self.finding('3.1', '[EBA.3.1] Choice of Currency for Monetary fact {fact}.'.format(fact=ids['concept']), 'An instance MUST express all monetary facts which do not fall under point (b) using a single currency.', location, **ids)
+        elif not unit.is_pure:
+            # EBA 3.2 - Non-monetary numeric units
+            self.finding('3.2', '[EBA.3.2] Non-monetary numeric units.', 'An instance MUST express its non-monetary numeric values using the “pure” unit, a unit element with a single measure element as its only child. The local part of the measure MUST be "pure" and the namespace prefix MUST resolve to the namespace: http://www.xbrl.org/2003/instance.', location, **ids)
+
+    # Rules decided at the end of the document
+
+    def end_document(self):
+        for key, unit_ref, fact_id, concept, location, ids in self.pending_duplicates:
+            self.check_fact_key(self.fact_key(key), key[2], unit_ref, fact_id, concept, location, ids)
+        self.pending_duplicates = []
+        for context_ref, unit_ref, location, ids in self.pending_facts:
+            if context_ref in self.contexts and unit_ref in self.units:
+                self.check_fact_unit(self.contexts[context_ref], self.units[unit_ref], location, ids)
+        self.pending_facts = []
+        for location, ids in self.pending_indicators:
+            context = self.contexts.get(ids['context'])
+            if context is not None and (context.has_segment or context.has_scenario):
+                self.finding('1.6', '[EBA.1.6] Filing indicators.', 'The context referenced by the filing indicator elements MUST NOT contain xbrli:segment or xbrli:scenario elements.', location, **ids)
+        self.pending_indicators = []
+
+        # EBA 2.7 - No unused or duplicated xbrli:context nodes
+        for context_id in self.contexts:
+            if context_id not in self.context_usage:
+                self.finding('2.7', '[EBA.2.7] No unused or duplicated {context} nodes.'.format(context='xbrli:context'), 'Unused xbrli:context nodes SHOULD NOT be present in the instance. [FRIS04]', 'context %s' % context_id, severity=WARNING, context=context_id)
+
+        # EBA 2.22 - Unused xbrli:xbrl/xbrli:unit
+        for unit_id in self.units:
+            if unit_id not in self.unit_usage:
+                self.finding('2.22', '[EBA.2.22] Unused xbrli:xbrl/xbrli:unit.', 'An XBRL instance SHOULD NOT contain unused xbrli:unit nodes. [FRIS04]', 'unit %s' % unit_id, severity=WARNING, unit=unit_id)
+
+        # EBA 3.7 - Unused @id attribute on facts
+        for fact_id, (concept, context_ref, unit_ref) in self.fact_ids.items():
+            if fact_id not in self.footnote_ids:
+                location, ids = fact_location(concept, context_ref, unit_ref, fact_id)
+                self.finding('3.7', '[EBA.3.7] Unused {id} attribute on fact.'.format(id='@id'), 'The instance SHOULD NOT include unused @id attributes on facts.', location, severity=WARNING, **ids)
+
+        # EBA 3.4 - Unused namespace prefixes
+        for prefix, uri in self.root_namespaces:
+            if prefix and prefix not in self.used_prefixes and uri not in self.used_namespaces:
+                self.finding('3.4', '[EBA.3.4] Unused namespace prefix {prefix}.'.format(prefix='xmlns:%s' % prefix), 'Namespace prefixes that are not used SHOULD not be declared in the instance document. [FRIS04]', 'xmlns:%s' % prefix, severity=WARNING, prefix=prefix, namespace=uri)
+
+class _Prepend:
+    """A binary file object which returns the given bytes before the rest of the wrapped file."""
+
+    def __init__(self, head, f):
+        self.head = head
+        self.f = f
+
+    def read(self, size=-1):
+        if self.head:
+            if size is None or size < 0:
+                data, self.head = self.head + self.f.read(), b''
+                return data
+            data, self.head = self.head[:size], self.head[size:]
+            return data
+        return self.f.read(size)
+
+def format_finding(finding):
+    """Formats a finding as a single line of text."""
+    return '%s: %s %s [%s]' % (finding.severity.upper(), finding.message, finding.detail, finding.location)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check the EBA XBRL Filing Rules without RaptorXML.')
+    parser.add_argument('instances', nargs='+', help='XBRL instance documents, zip archives or archive.zip|zip/instance.xbrl')
+    parser.add_argument('--script-param', action='append', default=[], metavar='NAME:VALUE', help='script parameter as accepted by eba_validation.py (may be repeated)')
+    parser.add_argument('--taxonomy-tables', metavar='PATH', help='taxonomy tables cached by eba_validation.py (enables rules 1.6.3 and 3.5)')
+    parser.add_argument('--taxonomy-package', action='append', default=[], metavar='PATH', help='taxonomy package to derive the taxonomy tables from (may be repeated, enables rules 1.6.3 and 3.5)')
+    args = parser.parse_args(argv)
+
+    params = dict(param.split(':', 1) for param in args.script_param)
+    taxonomy_tables = load_taxonomy_tables(args.taxonomy_tables) if args.taxonomy_tables else None
+    validator = StreamingValidator(params, taxonomy_tables, args.taxonomy_package)
+    has_errors = False
+    for path in expand_archives(args.instances):
+        for finding in validator.validate_file(path):
+            print('%s: %s' % (path, format_finding(finding)))
+            has_errors = has_errors or finding.severity == ERROR
+    return 1 if has_errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
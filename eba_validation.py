@@ -21,6 +21,23 @@ __version__ = '4.1'
 #
 #   max-id-length                   Issue warnings if length of id attribute values exceeds the given limit (default=50)
 #   max-string-length               Issue warnings if length of fact content exceeds the given limit (default=100)
+#   taxonomy-cache-dir              Cache the lookup tables derived from the taxonomy per entry point in the given directory
+#   profile                         Rules to run: full, errors-only (skip rules which only report warnings) or fast (skip rules which traverse the whole document or compare all facts for duplicates) (default=full)
+#   rules                           Only run the given comma separated rules of the profile, e.g. 2.16,3.1
+#   skip-rules                      Do not run the given comma separated rules, e.g. 3.4,3.9
+#   max-errors-per-rule             Report at most the given number of errors per rule, and stop the rule with a summary error instead of the remaining ones
+#   max-errors                      Stop validation after the given total number of errors
+#   fail-fast                       Stop validation after the first rule which reported an ERROR severity finding (true/false, default=false)
+#   result-cache-dir                Replay the findings of earlier validations of identical instances from the given directory, which can be shared by many processes
+#   result-cache-size               Maximum size of the result cache directory in MB, least recently used entries are removed first (default=1024)
+#   incremental-state               Revalidate amended filings: persist fingerprints and findings to the given file and only rerun the rules whose input changed since the run that wrote it
+#   findings-output                 Stream every finding to the given file as soon as it is reported
+#   findings-format                 Format of the findings-output file, jsonl (one JSON object per line) or sarif (default=sarif for *.sarif files, jsonl otherwise)
+#   findings-only                   Only write findings to the findings-output file and do not keep them in the RaptorXML error log (true/false, default=false)
+#   rule-stats                      Write wall time, visited objects and reported errors of each rule to the given file
+#   rule-stats-format               Format of the rule-stats file, json or prometheus (default=prometheus for *.prom files, json otherwise)
+#   fact-table-output               Write the normalized fact table with dictionary encoded columns to the given file
+#   fact-table-format               Format of the fact-table-output file, columns (no additional packages needed), arrow or parquet (both need pyarrow) (default=parquet for *.parquet files, arrow for *.arrow and *.feather files, columns otherwise)
 #
 # Example invocations:
 #
@@ -28,6 +45,12 @@ __version__ = '4.1'
 #   raptorxmlxbrl valxbrl --script=eba_validation.py instance.xbrl
 # Validate a single filing with additional options
 #   raptorxmlxbrl valxbrl --script=eba_validation.py --script-param=max-id-length:10 instance.xbrl
+# Only check the rules which report errors, e.g. as a submission gate
+#   raptorxmlxbrl valxbrl --script=eba_validation.py --script-param=profile:errors-only instance.xbrl
+# Validate a zipped submission against a taxonomy package, both read without extracting them
+#   raptorxmlxbrl valxbrl --script=eba_validation.py --taxonomy-package=taxonomy.zip "submission.zip|zip/instance.xbrl"
+# Validate a filing and export its facts for analysis
+#   raptorxmlxbrl valxbrl --script=eba_validation.py --script-param=fact-table-output:instance.parquet instance.xbrl
 #
 # Using Altova RaptorXML+XBRL Server with XMLSpy client:
 #
@@ -44,36 +67,1929 @@ __version__ = '4.1'
 # 8.    Validate instance with XML|Validate XML on Server (Ctrl+F8)
 
 
+import array
+import contextlib
+import datetime
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+import zipfile
+from xml.parsers import expat
+
+try:
+    import numpy
+except ImportError:
+    # The rules over fact columns fall back to plain loops
+    numpy = None
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    # The fact table can only be exported in the columns format
+    pyarrow = None
+
 import altova_api.v2.xml as xml
 import altova_api.v2.xsd as xsd
 import altova_api.v2.xbrl as xbrl
 
-def dfs(elem):
-    """Returns an iterator over all elements in the given XML subtree."""
-    stack = [elem]
-    while stack:
-        elem = stack.pop()
-        yield elem
-        stack.extend(elem.element_children())
+# Document traversal
+
+class DocumentWalker:
+    """Walks the instance document once and dispatches every element and attribute to the callbacks registered by the rules."""
+
+    def __init__(self):
+        self.element_callbacks = []
+        self.descendant_callbacks = []
+        self.attribute_callbacks = []
+        self.element_count = 0
+
+    def on_element(self, callback, include_document_element=True):
+        """Registers a callback which is called with every element (optionally excluding the document element)."""
+        if include_document_element:
+            self.element_callbacks.append(callback)
+        else:
+            self.descendant_callbacks.append(callback)
+
+    def on_attribute(self, callback):
+        """Registers a callback which is called with every attribute and its parent element."""
+        self.attribute_callbacks.append(callback)
+
+    def walk(self, document_element):
+        """Traverses the given XML subtree once. Attributes are only enumerated if at least one attribute callback is registered."""
+        element_callbacks = self.element_callbacks
+        descendant_callbacks = self.descendant_callbacks
+        attribute_callbacks = self.attribute_callbacks
+        if not (element_callbacks or descendant_callbacks or attribute_callbacks):
+            return
+
+        stack = [document_element]
+        is_document_element = True
+        while stack:
+            elem = stack.pop()
+            self.element_count += 1
+            for callback in element_callbacks:
+                callback(elem)
+            if not is_document_element:
+                for callback in descendant_callbacks:
+                    callback(elem)
+            if attribute_callbacks:
+                for attr in elem.attributes:
+                    for callback in attribute_callbacks:
+                        callback(elem, attr)
+            is_document_element = False
+            stack.extend(elem.element_children())
+
+class XmlBaseCollector:
+    """Collects all xml:base attributes in the instance document (EBA 2.1)."""
+
+    def __init__(self, walker):
+        self.attributes = []
+        walker.on_element(self.visit_element)
+
+    def visit_element(self, elem):
+        xml_base_attr = elem.find_attribute(xml.QName('base','http://www.w3.org/XML/1998/namespace'))
+        if xml_base_attr:
+            self.attributes.append(xml_base_attr)
+
+class PrefixUsageCollector:
+    """Collects all namespace prefixes used by element and attribute names and QName typed values (EBA 3.4)."""
+
+    def __init__(self, walker):
+        self.used_prefixes = set()
+        walker.on_element(self.visit_element)
+        walker.on_attribute(self.visit_attribute)
+
+    def visit_element(self, elem):
+        self.used_prefixes.add(elem.prefix)
+        val = elem.schema_actual_value
+        if isinstance(val,xsd.QName):
+            self.used_prefixes.add(val.prefix)
+
+    def visit_attribute(self, elem, attr):
+        self.used_prefixes.add(attr.prefix)
+        val = attr.schema_actual_value
+        if isinstance(val,xsd.QName):
+            self.used_prefixes.add(val.prefix)
+
+class NestedNamespaceCollector:
+    """Collects all namespace declarations below the document element (EBA 3.9)."""
+
+    def __init__(self, walker):
+        self.namespace_attributes = []
+        walker.on_element(self.visit_element, include_document_element=False)
+
+    def visit_element(self, elem):
+        self.namespace_attributes.extend(elem.namespace_attributes)
+
+# Lexical pre-scan
+
+XSI_NAMESPACE = 'http://www.w3.org/2001/XMLSchema-instance'
+
+XML_DECLARATION = re.compile(rb'<\?xml\s+version\s*=\s*["\'][^"\']*["\'](?:\s+encoding\s*=\s*["\']([^"\']*)["\'])?(?:\s+standalone\s*=\s*["\']([^"\']*)["\'])?\s*\?>')
+# Keywords of the markup a lexical rule is interested in, and of markup which cannot contain start tags
+LEXICAL_KEYWORDS = (b'<!', b'<?', b'schemaRef', b'linkbaseRef', b'xmlns', b'xml:base', b'chemaLocation')
+PROLOG_MARKUP = re.compile(rb"""\s*(?:<!--.*?-->|<\?.*?\?>|<!DOCTYPE(?:[^>\[]|\[[^\]]*\])*>)\s*""", re.S)
+START_TAG = re.compile(rb"""<([^\s!?/>]+)((?:[^>"']|"[^"]*"|'[^']*')*)>""")
+ATTRIBUTE = re.compile(rb"""([^\s=/>]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+def is_ascii_compatible(encoding):
+    """Returns True if the markup characters the pre-scan looks for have the same bytes in the given encoding as in ASCII."""
+    markup = '<?xml:="\'/>!-[] \n'
+    try:
+        return markup.encode(encoding) == markup.encode('ascii')
+    except (LookupError, UnicodeError):
+        return False
+
+class LexicalPrescan:
+    """Lexical facts about an instance document which the document level syntax rules check, found without parsing it.
+
+    The memory-mapped file is only searched for a few keywords, and just the start tags around their occurrences
+    are parsed, so the cost is that of a few substring searches rather than of parsing the whole document.
+    The findings are exact for well-formed documents in an ASCII compatible encoding. For documents in other
+    encodings, recognized by a byte order mark, NUL bytes or the declared encoding, at most the encoding is known
+    and complete is False.
+    """
+
+    # Rules whose findings are determined by the pre-scan
+    RULES = ('1.4', '1.13', '1.14', '2.1', '2.3', '2.4', '3.9', '3.10')
+
+    def __init__(self, document):
+        self.encoding = 'UTF-8'
+        self.standalone = None
+        self.complete = False
+        self.root_namespaces = []
+        self.schema_location_attributes = []
+        self.xml_base_attributes = []
+        self.nested_namespace_attributes = []
+        self.schema_refs = []
+        self.linkbase_refs = []
+        with document.data() as data:
+            if not data:
+                return
+            self.data, self.line_offset, self.line = data, 0, 1
+            try:
+                self.scan(data)
+            finally:
+                del self.data
+
+    def scan(self, data):
+        if data[:2] in (b'\xff\xfe', b'\xfe\xff'):
+            self.encoding = 'UTF-16'
+            return
+        if data[:4] in (b'\x00\x00\x00<', b'<\x00\x00\x00'):
+            self.encoding = 'UTF-32'
+            return
+        if data[:2] in (b'\x00<', b'<\x00'):
+            self.encoding = 'UTF-16'
+            return
+        # Well-formed documents in an ASCII compatible encoding contain no NUL bytes
+        if data.find(b'\x00') >= 0:
+            return
+        offset = 3 if data[:3] == b'\xef\xbb\xbf' else 0
+        declaration = XML_DECLARATION.match(data, offset)
+        if declaration:
+            if declaration.group(1):
+                self.encoding = declaration.group(1).decode('ascii', 'replace')
+            if declaration.group(2):
+                self.standalone = declaration.group(2).decode('ascii', 'replace')
+        if not is_ascii_compatible(self.encoding):
+            return
+        # Skip the prolog to find the document element, whose namespace declarations are not nested ones
+        prolog = PROLOG_MARKUP.match(data, offset)
+        while prolog:
+            offset = prolog.end()
+            prolog = PROLOG_MARKUP.match(data, offset)
+        root = START_TAG.match(data, offset)
+        if root is None:
+            return
+        self.scan_start_tag(root, is_root=True)
+        # Visit the start tags around all occurrences of a keyword in document order, skipping comments, CDATA sections and PIs
+        keywords = []
+        for keyword in LEXICAL_KEYWORDS:
+            position = data.find(keyword, root.end())
+            while position >= 0:
+                keywords.append((position, keyword))
+                position = data.find(keyword, position + 1)
+        keywords.sort()
+        scanned_until = root.end()
+        for position, keyword in keywords:
+            if position < scanned_until:
+                continue
+            if keyword in (b'<!', b'<?'):
+                end_marker = b'?>' if keyword == b'<?' else b'-->' if data[position:position + 4] == b'<!--' else b']]>' if data[position:position + 9] == b'<![CDATA[' else b'>'
+                end = data.find(end_marker, position + 2)
+                if end < 0:
+                    return
+                scanned_until = end + len(end_marker)
+                continue
+            start = data.rfind(b'<', scanned_until, position)
+            tag = START_TAG.match(data, start) if start >= 0 else None
+            # Keywords in text content follow the end of the preceding tag
+            if tag is not None and tag.end() > position:
+                self.scan_start_tag(tag, is_root=False)
+                scanned_until = tag.end()
+        self.complete = True
+
+    def line_of(self, position):
+        """Returns the line number of the given position, counting forward from the previously requested one."""
+        self.line += self.data[self.line_offset:position].count(b'\n')
+        self.line_offset = position
+        return self.line
+
+    def scan_start_tag(self, tag, is_root):
+        name = tag.group(1)
+        local_name = name.rpartition(b':')[2]
+        line = self.line_of(tag.start())
+        attributes = [(attr.group(1), attr.group(2) if attr.group(2) is not None else attr.group(3)) for attr in ATTRIBUTE.finditer(tag.group(2))]
+        if local_name == b'schemaRef':
+            self.schema_refs.append((next((value.decode('utf-8', 'replace') for attr_name, value in attributes if attr_name.rpartition(b':')[2] == b'href'), None), line))
+        elif local_name == b'linkbaseRef':
+            self.linkbase_refs.append(line)
+        for attr_name, value in attributes:
+            prefix, _, attr_local_name = attr_name.rpartition(b':')
+            if attr_name == b'xmlns' or prefix == b'xmlns':
+                declaration = (attr_local_name.decode('utf-8') if prefix else None, value.decode('utf-8', 'replace'), line)
+                (self.root_namespaces if is_root else self.nested_namespace_attributes).append(declaration)
+            elif attr_name == b'xml:base':
+                self.xml_base_attributes.append(line)
+        if is_root:
+            # Prefixed attributes can precede the declaration of their prefix
+            xsi_prefixes = {prefix.encode('utf-8') for prefix, uri, _ in self.root_namespaces if prefix and uri == XSI_NAMESPACE}
+            for attr_name, value in attributes:
+                prefix, _, attr_local_name = attr_name.rpartition(b':')
+                if prefix in xsi_prefixes and attr_local_name in (b'schemaLocation', b'noNamespaceSchemaLocation'):
+                    self.schema_location_attributes.append((attr_name.decode('utf-8'), line))
+
+    def clean_rules(self):
+        """Returns the rules which cannot report any finding for this instance document."""
+        if not self.complete:
+            return set()
+        findings = {
+            '1.4': self.encoding.upper() != 'UTF-8',
+            '1.13': self.standalone is not None,
+            '1.14': self.schema_location_attributes,
+            '2.1': self.xml_base_attributes,
+            '2.3': len(self.schema_refs) > 1,
+            '2.4': self.linkbase_refs,
+            '3.9': self.nested_namespace_attributes,
+            '3.10': len({uri for prefix, uri, line in self.root_namespaces}) < len(self.root_namespaces),
+        }
+        return {rule for rule, found in findings.items() if not found}
+
+    def errors(self, uri):
+        """Returns the findings of the document level syntax rules as errors located at the given document, with the line in a detail."""
+        errors = []
+        def report(rule, message, detail, line, severity=xml.ErrorSeverity.ERROR, **params):
+            children = [xbrl.Error.create(detail, severity=xml.ErrorSeverity.INFO)]
+            if line is not None:
+                children.append(xbrl.Error.create('Found at line {line}.', line=str(line), severity=xml.ErrorSeverity.OTHER))
+            errors.append((rule, xbrl.Error.create(message, location=uri, children=children, severity=severity, **params)))
+        if self.encoding.upper() != 'UTF-8':
+            report('1.4', '[EBA.1.4] Character encoding of XBRL instance documents.', 'XBRL instance documents MUST use "UTF-8" encoding. [GFM11, p. 11]', None)
+        if self.standalone is not None:
+            report('1.13', '[EBA.1.13] Standalone Document Declaration.', 'XBRL instance documents SHOULD NOT use the XML standalone declaration.', None, severity=xml.ErrorSeverity.WARNING)
+        if not self.complete:
+            return errors
+        for name, line in self.schema_location_attributes[:1]:
+            report('1.14', '[EBA.1.14] @xsd:schemaLocation and @xsd:noNamespaceSchemaLocation.', '@xsd:schemaLocation or @xsd:noNamespaceSchemaLocation MUST NOT be used.', line)
+        for line in self.xml_base_attributes:
+            report('2.1', '[EBA.2.1] The existence of {xml_base} is not permitted.', 'The attribute @xml:base MUST NOT appear in any instance document. [EFM13, p. 6-7].', line, xml_base='@xml:base')
+        for href, line in self.schema_refs[1:]:
+            report('2.3', '[EBA.2.3] Only one {schemaRef} element is allowed per instance document.', 'Any reported XBRL instance document MUST contain only one xbrli:xbrl/link:schemaRef element.', line, schemaRef='link:schemaRef')
+        for line in self.linkbase_refs:
+            report('2.4', '[EBA.2.4] The use of {linkbaseRef} element is not permitted.', 'Reference from an instance to the taxonomy MUST only be by means of the link:schemaRef element. The element link:linkbaseRef MUST NOT be used in any instance document.', line, linkbaseRef='link:linkbaseRef')
+        for prefix, uri, line in self.nested_namespace_attributes:
+            report('3.9', '[EBA.3.9] Namespace prefix declaration {prefix} restricted to the document element.', 'Namespace prefixes declarations SHOULD be restricted to the document element.', line, severity=xml.ErrorSeverity.WARNING, prefix='xmlns:%s' % prefix if prefix else 'xmlns')
+        declared = {}
+        for prefix, uri, line in self.root_namespaces:
+            first = declared.setdefault(uri, prefix)
+            if first != prefix:
+                report('3.10', '[EBA.3.10] Avoid multiple prefix declarations {prefix} and {prefix2} for the same namespace {namespace}.', 'Namespaces used in the document SHOULD be associated to a single namespace prefix.', line, severity=xml.ErrorSeverity.WARNING, prefix='xmlns:%s' % prefix if prefix else 'xmlns', prefix2='xmlns:%s' % first if first else 'xmlns', namespace=uri)
+        return errors
+
+# Instance indexes
+
+# Concept type flags stored in InstanceIndex.item_concept_flags
+CONCEPT_NUMERIC = 1
+CONCEPT_MONETARY = 2
+
+# Unit position stored in InstanceIndex.item_units for items without unit
+NO_UNIT = -1
+
+# Period kinds stored in InstanceIndex.context_period_kinds
+PERIOD_INSTANT = 'instant'
+PERIOD_DURATION = 'duration'
+PERIOD_FOREVER = 'forever'
+
+# Canonical aspect fingerprints
+
+XBRLI_NAMESPACE = 'http://www.xbrl.org/2003/instance'
+XBRLDI_NAMESPACE = 'http://xbrl.org/2006/xbrldi'
+
+def qname_key(qname):
+    return sys.intern('{%s}%s' % (qname.namespace_name or '', qname.local_name))
+
+def end_of_day(instant):
+    """Returns the point in time an instant or end date stands for, which is the end of the day for plain dates (XBRL 2.1, 4.7.2)."""
+    if instant.element.member_type_definition.name == 'date':
+        return instant.value + datetime.timedelta(days=1)
+    return instant.value
+
+def period_key(period):
+    if period.is_instant():
+        return (PERIOD_INSTANT, end_of_day(period.instant))
+    if period.is_forever():
+        return (PERIOD_FOREVER,)
+    return (PERIOD_DURATION, period.start_date.value, end_of_day(period.end_date))
+
+def context_dimension_values(context):
+    """Yields (dimension, member, is_typed) for each child of the segment and scenario of a context.
+
+    dimension is the Clark name of the dimension, member the QName of an explicit member or the value element of a
+    typed member (None if it is empty). Non-XDT content is yielded as (None, element, False).
+    """
+    for child in context.element.element_children():
+        if child.local_name == 'period':
+            continue
+        containers = [child] if child.local_name == 'scenario' else [elem for elem in child.element_children() if elem.local_name == 'segment']
+        for container in containers:
+            for member in container.element_children():
+                if member.namespace_name == XBRLDI_NAMESPACE and member.local_name == 'explicitMember':
+                    yield qname_key(member.find_attribute('dimension').schema_actual_value.value), member.schema_actual_value.value, False
+                elif member.namespace_name == XBRLDI_NAMESPACE and member.local_name == 'typedMember':
+                    yield qname_key(member.find_attribute('dimension').schema_actual_value.value), next(member.element_children(), None), True
+                else:
+                    yield None, member, False
+
+def context_fingerprint(context):
+    """Returns a hashable canonical fingerprint of the aspect values of a context.
+
+    The fingerprint consists of the entity identifier, the period and the sorted explicit dimension members of
+    segment and scenario, as plain strings and datetimes, so that comparing contexts does not go through the
+    object model. Contexts with typed dimension members or non-XDT content fall back to their xbrl.ConstraintSet.
+    """
+    identifier = context.entity_identifier_aspect_value
+    members = []
+    for dimension, member, is_typed in context_dimension_values(context):
+        if dimension is None or is_typed:
+            return (xbrl.ConstraintSet(context),)
+        members.append((dimension, qname_key(member)))
+    members.sort()
+    return (sys.intern(identifier.scheme), sys.intern(identifier.value), period_key(context.period), tuple(members))
+
+# Dimension and member of EBA denomination contexts (3.1)
+EBA_DIM_CCA = '{http://www.eba.europa.eu/xbrl/crr/dict/dim}CCA'
+EBA_DIM_CUS = '{http://www.eba.europa.eu/xbrl/crr/dict/dim}CUS'
+EBA_CA_X1 = '{http://www.eba.europa.eu/xbrl/crr/dict/dom/CA}x1'
+
+def context_denomination(context):
+    """Returns whether a context is a denomination context (CCA=x1) and the local name of its CUS member, or None if it has none."""
+    members = {dimension: member for dimension, member, is_typed in context_dimension_values(context) if dimension is not None and not is_typed}
+    cca = members.get(EBA_DIM_CCA)
+    cus = members.get(EBA_DIM_CUS)
+    return cca is not None and qname_key(cca) == EBA_CA_X1, cus.local_name if cus is not None else None
+
+def context_dimension_members(context):
+    """Returns the (dimension, member) pairs of the segment and scenario of a context as strings, with explicit members as Clark names."""
+    members = []
+    for dimension, member, is_typed in context_dimension_values(context):
+        if dimension is None:
+            continue
+        if is_typed:
+            members.append((dimension, member.schema_normalized_value if member is not None else ''))
+        else:
+            members.append((dimension, qname_key(member)))
+    return members
+
+def period_text(period):
+    """Returns the period of a context as ISO 8601 date or date time, start/end interval or 'forever'."""
+    def date_text(instant):
+        return instant.value.date().isoformat() if instant.element.member_type_definition.name == 'date' else instant.value.isoformat()
+    if period.is_instant():
+        return date_text(period.instant)
+    if period.is_forever():
+        return PERIOD_FOREVER
+    return '%s/%s' % (date_text(period.start_date), date_text(period.end_date))
+
+def unit_fingerprint(unit):
+    """Returns a hashable canonical fingerprint of the measures of a unit, as sorted numerator and denominator measure names."""
+    numerator = []
+    denominator = []
+    for child in unit.element.element_children():
+        if child.local_name == 'measure':
+            numerator.append(qname_key(child.schema_actual_value.value))
+        elif child.local_name == 'divide':
+            for part in child.element_children():
+                measures = numerator if part.local_name == 'unitNumerator' else denominator
+                measures.extend(qname_key(measure.schema_actual_value.value) for measure in part.element_children())
+    return (tuple(sorted(numerator)), tuple(sorted(denominator)))
+
+# Parts of an InstanceIndex, each of which is only built if a rule in the execution plan needs it
+INDEX_CONTEXTS = 'contexts'
+INDEX_CONTEXT_CLASSES = 'context-classes'
+INDEX_UNITS = 'units'
+INDEX_ITEMS = 'items'
+INDEX_STRING_LENGTHS = 'string-lengths'
+INDEX_USAGE = 'usage'
+INDEX_DENOMINATIONS = 'denominations'
+INDEX_FACT_TABLE = 'fact-table'
+INDEX_ALL = frozenset((INDEX_CONTEXTS, INDEX_CONTEXT_CLASSES, INDEX_UNITS, INDEX_ITEMS, INDEX_STRING_LENGTHS, INDEX_USAGE, INDEX_DENOMINATIONS, INDEX_FACT_TABLE))
+
+class InstanceIndex:
+    """Compact per-instance tables of everything the context, unit and fact rules need.
+
+    Contexts, units and top-level items are each swept once through the RaptorXML object model and the
+    properties the rules check are stored in parallel lists, so that the rules only go back to the object
+    model to obtain the location of a reported error. Only the given parts are built, the lists of all other
+    parts stay empty. Items are indexed by unit position, so indexing items always indexes the units as well.
+
+    Contexts and units with the same aspect values form an equivalence class, which is identified by the position
+    of its first member. Classes are formed by comparing canonical aspect fingerprints, which are kept for use by
+    other rules. Building the context classes needs the contexts to be indexed.
+
+    Item concept flags, units and contexts are kept in typed arrays, which NumPy can use as columns without copying.
+    Item contexts are numbered in order of first use, with the denomination of each context (3.1) by number.
+
+    The fact table part additionally keeps everything the FactTableWriter exports: the period and dimension members
+    of each context and the concept (as position in concept_names), context position, decimals and value of each
+    item. It needs the contexts and items, which are indexed along with it.
+    """
+
+    def __init__(self, instance, parts=INDEX_ALL):
+        self.parts = parts
+        fact_table = INDEX_FACT_TABLE in parts
+        self.index_contexts(instance.contexts if INDEX_CONTEXTS in parts or fact_table else (), context_classes=INDEX_CONTEXT_CLASSES in parts, fact_table=fact_table)
+        self.index_units(instance.units if INDEX_UNITS in parts or INDEX_ITEMS in parts or fact_table else ())
+        self.index_items(instance.child_items if INDEX_ITEMS in parts or fact_table else (), string_lengths=INDEX_STRING_LENGTHS in parts, denominations=INDEX_DENOMINATIONS in parts, fact_table=fact_table)
+        self.index_usage(instance.facts if INDEX_USAGE in parts else ())
+
+    def index_contexts(self, contexts, context_classes=True, fact_table=False):
+        self.contexts = []
+        self.context_positions = {}
+        self.context_ids = []
+        self.context_identifiers = []
+        self.context_schemes = []
+        self.context_period_kinds = []
+        self.context_period_values = []
+        self.context_invalid_dates = []
+        self.context_has_segment = []
+        self.context_has_scenario = []
+        self.context_has_non_xdt_scenario = []
+        self.context_periods = []
+        self.context_dimensions = []
+        for context in contexts:
+            self.context_positions[context.id] = len(self.contexts)
+            self.contexts.append(context)
+            self.context_ids.append(context.id)
+            identifier = context.entity_identifier_aspect_value
+            self.context_identifiers.append(identifier)
+            self.context_schemes.append(identifier.scheme)
+            period = context.period
+            if period.is_instant():
+                self.context_period_kinds.append(PERIOD_INSTANT)
+                instant = period.instant
+                self.context_invalid_dates.append(bool(instant.value.tzinfo or instant.element.member_type_definition.name != "date"))
+            else:
+                self.context_period_kinds.append(PERIOD_FOREVER if period.is_forever() else PERIOD_DURATION)
+                self.context_invalid_dates.append(False)
+            self.context_period_values.append(context.period_aspect_value)
+            self.context_has_segment.append(bool(context.entity.segment))
+            scenario = context.scenario
+            self.context_has_scenario.append(bool(scenario))
+            self.context_has_non_xdt_scenario.append(bool(scenario) and next(scenario.non_xdt_child_elements,None) is not None)
+            if fact_table:
+                self.context_periods.append(period_text(period))
+                self.context_dimensions.append(context_dimension_members(context))
+
+        self.context_fingerprints = []
+        self.context_classes = []
+        if context_classes:
+            first_positions = {}
+            for i, context in enumerate(self.contexts):
+                fingerprint = context_fingerprint(context)
+                self.context_fingerprints.append(fingerprint)
+                self.context_classes.append(first_positions.setdefault(fingerprint,i))
+
+    def index_units(self, units):
+        self.units = []
+        self.unit_ids = []
+        self.unit_is_monetary = []
+        self.unit_is_pure = []
+        self.unit_currencies = []
+        self.unit_fingerprints = []
+        self.unit_classes = []
+        self.unit_positions = {}
+        first_positions = {}
+        for unit in units:
+            self.unit_positions[unit.id] = len(self.units)
+            self.units.append(unit)
+            self.unit_ids.append(unit.id)
+            aspect_value = unit.aspect_value
+            self.unit_is_monetary.append(aspect_value.is_monetary())
+            self.unit_is_pure.append(aspect_value.is_pure())
+            self.unit_currencies.append(aspect_value.iso4217_currency)
+            fingerprint = unit_fingerprint(unit)
+            self.unit_fingerprints.append(fingerprint)
+            self.unit_classes.append(first_positions.setdefault(fingerprint,len(self.unit_classes)))
+
+    def index_items(self, items, string_lengths=True, denominations=True, fact_table=False):
+        self.items = []
+        self.item_concept_flags = array.array('B')
+        self.item_units = array.array('i')
+        self.item_contexts = array.array('i')
+        self.context_is_denomination = []
+        self.context_currencies = []
+        context_numbers = {}
+        self.item_has_precision = []
+        self.item_is_nil = []
+        self.item_ids = []
+        self.item_string_lengths = []
+        self.concept_names = []
+        self.item_concepts = array.array('i')
+        self.item_context_positions = array.array('i')
+        self.item_decimals = []
+        self.item_values = []
+        concept_flags = {}
+        concept_numbers = {}
+        for fact in items:
+            self.items.append(fact)
+            concept = fact.concept
+            flags = concept_flags.get(concept)
+            if flags is None:
+                flags = 0
+                if concept.is_numeric():
+                    flags |= CONCEPT_NUMERIC
+                if concept.is_monetary():
+                    flags |= CONCEPT_MONETARY
+                concept_flags[concept] = flags
+            self.item_concept_flags.append(flags)
+            unit = fact.unit
+            self.item_units.append(self.unit_positions[unit.id] if unit else NO_UNIT)
+            if denominations:
+                context = fact.context
+                number = context_numbers.get(context.id)
+                if number is None:
+                    number = context_numbers[context.id] = len(self.context_is_denomination)
+                    is_denomination, currency = context_denomination(context)
+                    self.context_is_denomination.append(is_denomination)
+                    self.context_currencies.append(currency)
+                self.item_contexts.append(number)
+            self.item_has_precision.append(bool(fact.precision))
+            self.item_is_nil.append(bool(fact.xsi_nil))
+            self.item_ids.append(fact.id)
+            if string_lengths:
+                val = fact.element.schema_actual_value
+                self.item_string_lengths.append(len(val.value) if isinstance(val,xsd.string) else 0)
+            if fact_table:
+                number = concept_numbers.get(concept)
+                if number is None:
+                    number = concept_numbers[concept] = len(self.concept_names)
+                    self.concept_names.append('{%s}%s' % (concept.target_namespace, concept.name))
+                self.item_concepts.append(number)
+                self.item_context_positions.append(self.context_positions[fact.context.id])
+                self.item_decimals.append(fact.decimals)
+                self.item_values.append(None if fact.xsi_nil else fact.normalized_value)
+
+    def index_usage(self, facts):
+        # Count context and unit references of all items, including those nested inside tuples (e.g. filing indicators)
+        self.context_usage = {}
+        self.unit_usage = {}
+        self.fact_count = 0
+        context_usage = self.context_usage
+        unit_usage = self.unit_usage
+        for fact in facts:
+            self.fact_count += 1
+            if isinstance(fact,xbrl.Item):
+                context_id = fact.context.id
+                context_usage[context_id] = context_usage.get(context_id,0) + 1
+                unit = fact.unit
+                if unit:
+                    unit_usage[unit.id] = unit_usage.get(unit.id,0) + 1
+
+    def is_context_used(self, context_id):
+        return context_id in self.context_usage
+
+    def is_unit_used(self, unit_id):
+        return unit_id in self.unit_usage
+
+    def unit_class(self, unit):
+        """Returns the equivalence class of the given unit, or None for facts without unit."""
+        return self.unit_classes[self.unit_positions[unit.id]] if unit else None
+
+# Columnar fact checks
+
+def unit_column(values, no_unit):
+    """Returns a per-unit property as NumPy array, with the value for items without unit last so that NO_UNIT selects it."""
+    return numpy.array(list(values) + [no_unit])
+
+def denomination_mismatches(index):
+    """Returns the positions of monetary items in denomination contexts whose unit is not the currency of the CUS dimension."""
+    # Currencies of units and contexts as integer codes, units without currency never match a context's currency
+    codes = {}
+    unit_currencies = [codes.setdefault(currency, len(codes)) if currency else -1 for currency in index.unit_currencies]
+    context_currencies = [codes.setdefault(currency, len(codes)) if currency else -2 for currency in index.context_currencies]
+    if numpy is None:
+        return [i for i, flags in enumerate(index.item_concept_flags)
+                if flags & CONCEPT_MONETARY and index.context_is_denomination[index.item_contexts[i]]
+                and context_currencies[index.item_contexts[i]] >= 0
+                and context_currencies[index.item_contexts[i]] != (unit_currencies[index.item_units[i]] if index.item_units[i] != NO_UNIT else -1)]
+    flags = numpy.frombuffer(index.item_concept_flags, dtype=numpy.uint8)
+    contexts = numpy.frombuffer(index.item_contexts, dtype=numpy.intc)
+    units = numpy.frombuffer(index.item_units, dtype=numpy.intc)
+    context_currency = numpy.array(context_currencies, dtype=numpy.intc)[contexts]
+    mask = (flags & CONCEPT_MONETARY).astype(bool)
+    mask &= numpy.array(index.context_is_denomination, dtype=bool)[contexts]
+    mask &= context_currency >= 0
+    mask &= context_currency != unit_column(unit_currencies, -1)[units]
+    return numpy.flatnonzero(mask).tolist()
+
+def mixed_currency_items(index):
+    """Returns the positions of monetary items outside denomination contexts whose unit differs from that of the first such item."""
+    if numpy is None:
+        positions = [i for i, flags in enumerate(index.item_concept_flags) if flags & CONCEPT_MONETARY and not index.context_is_denomination[index.item_contexts[i]]]
+        return [i for i in positions if index.item_units[i] != index.item_units[positions[0]]]
+    flags = numpy.frombuffer(index.item_concept_flags, dtype=numpy.uint8)
+    contexts = numpy.frombuffer(index.item_contexts, dtype=numpy.intc)
+    units = numpy.frombuffer(index.item_units, dtype=numpy.intc)
+    mask = (flags & CONCEPT_MONETARY).astype(bool)
+    mask &= ~numpy.array(index.context_is_denomination, dtype=bool)[contexts]
+    positions = numpy.flatnonzero(mask)
+    if not len(positions):
+        return []
+    return positions[units[positions] != units[positions[0]]].tolist()
+
+def non_pure_items(index):
+    """Returns the positions of non-monetary numeric items whose unit is not pure."""
+    if numpy is None:
+        return [i for i, flags in enumerate(index.item_concept_flags)
+                if flags & CONCEPT_NUMERIC and not flags & CONCEPT_MONETARY and not (index.item_units[i] != NO_UNIT and index.unit_is_pure[index.item_units[i]])]
+    flags = numpy.frombuffer(index.item_concept_flags, dtype=numpy.uint8)
+    units = numpy.frombuffer(index.item_units, dtype=numpy.intc)
+    mask = (flags & (CONCEPT_NUMERIC | CONCEPT_MONETARY)) == CONCEPT_NUMERIC
+    mask &= ~unit_column(index.unit_is_pure, False).astype(bool)[units]
+    return numpy.flatnonzero(mask).tolist()
+
+# Fact table export
+
+# Magic number at the start of fact tables in the columns format
+FACT_TABLE_MAGIC = b'EBAFACTS'
+FACT_TABLE_FORMATS = ('columns', 'arrow', 'parquet')
+
+def dictionary_encode(values):
+    """Returns the codes of the given strings as int32 array, with -1 for None, and the dictionary of distinct strings in order of first occurrence."""
+    codes = array.array('i')
+    dictionary = []
+    positions = {}
+    for value in values:
+        if value is None:
+            codes.append(-1)
+            continue
+        code = positions.get(value)
+        if code is None:
+            code = positions[value] = len(dictionary)
+            dictionary.append(value)
+        codes.append(code)
+    return codes, dictionary
+
+def unit_text(fingerprint):
+    """Returns a unit fingerprint as measure names joined by '*', with the denominator after a '/'."""
+    numerator, denominator = fingerprint
+    text = '*'.join(numerator)
+    return text + '/' + '*'.join(denominator) if denominator else text
+
+class FactTableWriter:
+    """Writes the normalized fact table of an instance, one row per top-level item, to a columnar file.
+
+    The table is filled from the fact table part of the InstanceIndex. All columns are dictionary encoded: each
+    row holds an int32 code (-1 for no value) into a dictionary of the distinct strings of the column. Besides the
+    context, concept, entity, period, unit, decimals, value and id columns, the table has a column per dimension
+    named by its Clark name, with the explicit member's Clark name or the typed member's value.
+
+    The columns format needs no additional packages: the magic number EBAFACTS, the length of a JSON header as
+    8 byte little endian integer and the header itself are followed by the 8 byte aligned buffers of each column,
+    i.e. the codes, the dictionary offsets (int64, one more than the dictionary size) and the UTF-8 dictionary data.
+    Buffer offsets in the header are relative to the end of the header, so that the buffers can be memory mapped.
+    The arrow (Arrow IPC file) and parquet formats need pyarrow.
+    """
+
+    def __init__(self, path, output_format):
+        if output_format not in FACT_TABLE_FORMATS:
+            raise ValueError('Unknown format %s in script parameter fact-table-format, expected one of %s' % (output_format, ', '.join(FACT_TABLE_FORMATS)))
+        if output_format != 'columns' and pyarrow is None:
+            raise ValueError('The %s format in script parameter fact-table-format needs pyarrow' % output_format)
+        self.path = path
+        self.output_format = output_format
+
+    @classmethod
+    def from_params(cls, params):
+        path = params.get('fact-table-output')
+        if not path:
+            return None
+        default_format = 'parquet' if path.endswith('.parquet') else 'arrow' if path.endswith(('.arrow', '.feather')) else 'columns'
+        return cls(path, params.get('fact-table-format', default_format))
+
+    def columns(self, index):
+        """Returns the name, codes and dictionary of each column of the fact table of the given index."""
+        def per_context(name, values):
+            # Encode the values of each context once and look up the codes of each item by its context position
+            codes, dictionary = dictionary_encode(values)
+            return name, array.array('i', (codes[position] for position in index.item_context_positions)), dictionary
+        def per_unit(name, values):
+            codes, dictionary = dictionary_encode(values)
+            return name, array.array('i', (codes[position] if position != NO_UNIT else -1 for position in index.item_units)), dictionary
+        dimensions = sorted({dimension for members in index.context_dimensions for dimension, member in members})
+        context_members = [dict(members) for members in index.context_dimensions]
+        columns = [
+            per_context('context', index.context_ids),
+            ('concept', index.item_concepts, index.concept_names),
+            per_context('entity_scheme', index.context_schemes),
+            per_context('entity_identifier', [identifier.value for identifier in index.context_identifiers]),
+            per_context('period', index.context_periods),
+            per_unit('unit', [unit_text(fingerprint) for fingerprint in index.unit_fingerprints]),
+            ('decimals',) + dictionary_encode(None if decimals is None else str(decimals) for decimals in index.item_decimals),
+            ('value',) + dictionary_encode(index.item_values),
+            ('id',) + dictionary_encode(index.item_ids),
+        ]
+        columns.extend(per_context(dimension, [members.get(dimension) for members in context_members]) for dimension in dimensions)
+        return columns
+
+    def write(self, index, instance_uri):
+        """Writes the fact table of the given index and returns the number of rows written."""
+        columns = self.columns(index)
+        if self.output_format == 'columns':
+            self.write_columns(columns, len(index.items), instance_uri)
+        else:
+            arrays = [pyarrow.DictionaryArray.from_arrays(pyarrow.array([code if code >= 0 else None for code in codes], type=pyarrow.int32()), pyarrow.array(dictionary, type=pyarrow.string()))
+                      for name, codes, dictionary in columns]
+            table = pyarrow.Table.from_arrays(arrays, names=[name for name, codes, dictionary in columns], metadata={'instance': instance_uri or ''})
+            if self.output_format == 'parquet':
+                pyarrow.parquet.write_table(table, self.path)
+            else:
+                with pyarrow.ipc.new_file(self.path, table.schema) as writer:
+                    writer.write_table(table)
+        return len(index.items)
+
+    def write_columns(self, columns, rows, instance_uri):
+        buffers = []
+        offset = 0
+        header = {'version': 1, 'instance': instance_uri, 'rows': rows, 'byteorder': sys.byteorder, 'columns': []}
+        for name, codes, dictionary in columns:
+            data = [value.encode('utf-8') for value in dictionary]
+            offsets = array.array('q', [0])
+            for value in data:
+                offsets.append(offsets[-1] + len(value))
+            column = {'name': name, 'size': len(dictionary)}
+            for key, buffer in (('codes', codes.tobytes()), ('offsets', offsets.tobytes()), ('data', b''.join(data))):
+                column[key] = [offset, len(buffer)]
+                buffers.append(buffer)
+                padding = -len(buffer) % 8
+                if padding:
+                    buffers.append(bytes(padding))
+                offset += len(buffer) + padding
+            header['columns'].append(column)
+        header = json.dumps(header).encode('utf-8')
+        header += b' ' * (-len(header) % 8)
+        with open(self.path, 'wb') as f:
+            f.write(FACT_TABLE_MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for buffer in buffers:
+                f.write(buffer)
+
+class TaxonomyTables:
+    """Lookup tables derived from the DTS which only depend on the taxonomy entry point (EBA 1.6 and 3.5)."""
+
+    def __init__(self, filing_indicators, namespace_bindings):
+        self.filing_indicators = filing_indicators
+        self.namespace_bindings = namespace_bindings
+
+    @classmethod
+    def from_dts(cls, dts):
+        # Get all filing indicators which are present in the taxonomy
+        filing_indicators = set()
+        for table in dts.tables:
+            for label in table.labels(label_role='http://www.eurofiling.info/xbrl/role/filing-indicator-code'):
+                filing_indicators.add(label.text)
+
+        # Get the canonical prefix of each taxonomy schema target namespace
+        namespace_bindings = {}
+        for schema in dts.taxonomy_schemas:
+            for nsattr in schema.element.namespace_attributes:
+                if nsattr.local_name != 'xmlns' and nsattr.normalized_value == schema.target_namespace:
+                    namespace_bindings[schema.target_namespace] = nsattr.local_name
+                    break
+        return cls(filing_indicators, namespace_bindings)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(set(data['filing_indicators']), data['namespace_bindings'])
+
+    def save(self, path):
+        write_json(path, {'filing_indicators': sorted(self.filing_indicators), 'namespace_bindings': self.namespace_bindings})
+
+def write_json(path, data):
+    """Writes data as JSON to a temporary file first, so that concurrent validations never see a partially written file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+def taxonomy_fingerprint(options):
+    """Returns a fingerprint of the taxonomy packages used by the job, based on their paths, sizes and modification times."""
+    packages = options.get('taxonomy-package') or []
+    if isinstance(packages, str):
+        packages = [packages]
+    config_file = options.get('taxonomy-packages-config-file')
+    if config_file:
+        packages = list(packages) + [config_file]
+
+    fingerprint = hashlib.sha1(__version__.encode('utf-8'))
+    for package in sorted(packages):
+        try:
+            stat = os.stat(package)
+            fingerprint.update(('%s|%d|%d\n' % (os.path.abspath(package), stat.st_size, stat.st_mtime_ns)).encode('utf-8'))
+        except OSError:
+            fingerprint.update(('%s|missing\n' % package).encode('utf-8'))
+    return fingerprint.hexdigest()
+
+# Taxonomy tables already loaded by this process, keyed by entry point and taxonomy fingerprint
+_taxonomy_tables = {}
+
+def get_taxonomy_tables(instance,options,params):
+    """Returns the taxonomy lookup tables for the instance's entry point.
+
+    The tables are looked up in the per-process cache, then in the on-disk cache in the directory given by the
+    taxonomy-cache-dir script parameter, and are only derived from the DTS if neither contains them.
+    """
+    schema_ref = next(instance.schema_refs,None)
+    if schema_ref is None:
+        return TaxonomyTables.from_dts(instance.dts)
+    key = (schema_ref.xlink_href, taxonomy_fingerprint(options))
+    tables = _taxonomy_tables.get(key)
+    if tables is not None:
+        return tables
+
+    cache_dir = params.get('taxonomy-cache-dir')
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, hashlib.sha1('\n'.join(key).encode('utf-8')).hexdigest() + '.json')
+        try:
+            tables = TaxonomyTables.load(cache_path)
+        except (OSError, ValueError, KeyError):
+            tables = None
+
+    if tables is None:
+        tables = TaxonomyTables.from_dts(instance.dts)
+        if cache_path:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                tables.save(cache_path)
+            except OSError:
+                # The cache is only an optimization, validation must not fail because it cannot be written
+                pass
+
+    _taxonomy_tables[key] = tables
+    return tables
+
+# Execution plans
+
+# Preparation steps other than the InstanceIndex parts, each of which is only run if a rule in the execution plan needs it
+COLLECT_XML_BASE = 'xml-base'
+COLLECT_PREFIX_USAGE = 'prefix-usage'
+COLLECT_NESTED_NAMESPACES = 'nested-namespaces'
+LOAD_TAXONOMY_TABLES = 'taxonomy-tables'
+
+# All implemented rules in execution order, with the severity of the errors they report and the preparation steps they need
+RULES = [
+    ('1.4', xml.ErrorSeverity.ERROR, ()),
+    ('1.6', xml.ErrorSeverity.ERROR, (LOAD_TAXONOMY_TABLES,)),
+    ('1.13', xml.ErrorSeverity.WARNING, ()),
+    ('1.14', xml.ErrorSeverity.ERROR, ()),
+    ('1.15', xml.ErrorSeverity.ERROR, ()),
+    ('2.1', xml.ErrorSeverity.ERROR, (COLLECT_XML_BASE,)),
+    ('2.2', xml.ErrorSeverity.ERROR, ()),
+    ('2.3', xml.ErrorSeverity.ERROR, ()),
+    ('2.4', xml.ErrorSeverity.ERROR, ()),
+    ('2.25', xml.ErrorSeverity.WARNING, ()),
+    ('2.6', xml.ErrorSeverity.WARNING, (INDEX_CONTEXTS,)),
+    ('2.7', xml.ErrorSeverity.WARNING, (INDEX_CONTEXTS, INDEX_CONTEXT_CLASSES, INDEX_USAGE)),
+    ('2.9', xml.ErrorSeverity.ERROR, (INDEX_CONTEXTS,)),
+    ('2.10', xml.ErrorSeverity.ERROR, (INDEX_CONTEXTS,)),
+    ('2.11', xml.ErrorSeverity.ERROR, (INDEX_CONTEXTS,)),
+    ('2.13', xml.ErrorSeverity.ERROR, (INDEX_CONTEXTS,)),
+    ('2.14', xml.ErrorSeverity.ERROR, (INDEX_CONTEXTS,)),
+    ('2.15', xml.ErrorSeverity.ERROR, (INDEX_CONTEXTS,)),
+    ('2.16', xml.ErrorSeverity.ERROR, (INDEX_CONTEXTS, INDEX_CONTEXT_CLASSES, INDEX_UNITS)),
+    ('2.17', xml.ErrorSeverity.ERROR, (INDEX_ITEMS,)),
+    ('2.19', xml.ErrorSeverity.ERROR, (INDEX_ITEMS,)),
+    ('2.21', xml.ErrorSeverity.WARNING, (INDEX_UNITS,)),
+    ('2.22', xml.ErrorSeverity.WARNING, (INDEX_UNITS, INDEX_USAGE)),
+    ('3.1', xml.ErrorSeverity.ERROR, (INDEX_ITEMS, INDEX_DENOMINATIONS)),
+    ('3.2', xml.ErrorSeverity.ERROR, (INDEX_ITEMS,)),
+    ('3.4', xml.ErrorSeverity.WARNING, (COLLECT_PREFIX_USAGE,)),
+    ('3.5', xml.ErrorSeverity.WARNING, (LOAD_TAXONOMY_TABLES,)),
+    ('3.6', xml.ErrorSeverity.WARNING, (INDEX_CONTEXTS,)),
+    ('3.7', xml.ErrorSeverity.WARNING, (INDEX_ITEMS,)),
+    ('3.8', xml.ErrorSeverity.WARNING, (INDEX_ITEMS, INDEX_STRING_LENGTHS)),
+    ('3.9', xml.ErrorSeverity.WARNING, (COLLECT_NESTED_NAMESPACES,)),
+    ('3.10', xml.ErrorSeverity.WARNING, ()),
+]
+
+# Rules which need a traversal of the whole instance document or a duplicate check over all facts
+EXPENSIVE_RULES = {'2.1', '2.16', '3.4', '3.9'}
+
+RULE_SEVERITIES = {rule: severity for rule, severity, needs in RULES}
+
+PROFILES = {
+    'full': [rule for rule, severity, needs in RULES],
+    'errors-only': [rule for rule, severity, needs in RULES if severity == xml.ErrorSeverity.ERROR],
+    'fast': [rule for rule, severity, needs in RULES if rule not in EXPENSIVE_RULES],
+}
+
+def parse_rule_list(value, param):
+    """Parses a comma separated list of rule numbers (e.g. '2.16,3.1') given in the named script parameter."""
+    rules = {rule.strip() for rule in value.split(',') if rule.strip()}
+    unknown = rules - set(PROFILES['full'])
+    if unknown:
+        raise ValueError('Unknown EBA rules %s in script parameter %s' % (', '.join(sorted(unknown)), param))
+    return rules
+
+class ExecutionPlan:
+    """The rules selected for execution and the preparation steps these rules need.
+
+    Replayed rules report the findings of an earlier run and need no preparation. The needs of individual rules
+    can be overridden, e.g. if a rule is only rechecked for some objects.
+    """
+
+    def __init__(self, rules, replayed=(), needs=None):
+        self.rules = set(rules)
+        self.replayed = set(replayed)
+        self.needs = set()
+        for rule, severity, rule_needs in RULES:
+            if rule in self.rules and rule not in self.replayed:
+                self.needs.update(needs.get(rule, rule_needs) if needs else rule_needs)
+
+    @classmethod
+    def from_params(cls, params):
+        """Selects the rules of the given profile, restricted to the rules script parameter and without the skip-rules script parameter."""
+        profile = params.get('profile','full')
+        if profile not in PROFILES:
+            raise ValueError('Unknown profile %s in script parameter profile, expected one of %s' % (profile, ', '.join(sorted(PROFILES))))
+        rules = set(PROFILES[profile])
+        if params.get('rules'):
+            rules &= parse_rule_list(params['rules'], 'rules')
+        if params.get('skip-rules'):
+            rules -= parse_rule_list(params['skip-rules'], 'skip-rules')
+        return cls(rules)
+
+    def __contains__(self, rule):
+        return rule in self.rules
+
+    @property
+    def index_parts(self):
+        return frozenset(self.needs & INDEX_ALL)
+
+# Rule execution and instrumentation
+
+class _RuleLimitReached(Exception):
+    """Raised by CountingErrorLog to stop the rule which reports an error beyond its limit."""
+
+class CountingErrorLog:
+    """Forwards errors to the wrapped error log and counts them, up to an optional limit.
+
+    Reporting an error beyond the limit stops the rule by raising _RuleLimitReached, so that its remaining
+    findings are neither searched for nor built.
+    """
+
+    def __init__(self, error_log, limit=None):
+        self.error_log = error_log
+        self.limit = limit
+        self.count = 0
+        self.full = False
+
+    def report(self, error):
+        if self.limit is not None and self.count >= self.limit:
+            self.full = True
+            raise _RuleLimitReached()
+        self.count += 1
+        self.error_log.report(error)
+
+class RuleRunner:
+    """Runs the rule functions in the execution plan and, if instrumentation is enabled, records wall time, visited objects and reported errors per rule.
+
+    The number of errors can be limited per rule and in total. A rule which reports an error beyond its limit is
+    stopped and a summary error is reported instead of its remaining errors, which are not checked. If the total
+    limit is exceeded or, in fail-fast mode, a rule has reported an ERROR severity finding, all remaining rules are
+    skipped. Summary errors have the severity of the rule they are about.
+
+    Rules run one after another in the order they are passed to run(), which is the order of their findings. They
+    are not run concurrently: threads are serialized by the GIL, and the RaptorXML objects the rules report errors
+    on cannot be passed to other processes. Passing the index columns alone to another process costs more than all
+    context, unit and fact rules except 2.16 take together, and 2.16 reads the facts of the instance.
+    """
+
+    def __init__(self, error_log, instrument=False, plan=None, max_errors_per_rule=None, max_errors=None, fail_fast=False):
+        self.error_log = error_log
+        self.instrument = instrument
+        self.plan = plan
+        self.max_errors_per_rule = max_errors_per_rule
+        self.max_errors = max_errors
+        self.fail_fast = fail_fast
+        self.error_count = 0
+        self.stopped = False
+        self.limited = False
+        # Functions which replay the findings of an earlier run instead of running a rule, keyed by rule
+        self.replays = {}
+        # Errors reported by each rule which was run, if recording is enabled
+        self.recorded = None
+        self.stats = []
+
+    @classmethod
+    def from_params(cls, error_log, params, plan=None):
+        max_errors_per_rule = int(params['max-errors-per-rule']) if params.get('max-errors-per-rule') else None
+        max_errors = int(params['max-errors']) if params.get('max-errors') else None
+        fail_fast = params.get('fail-fast','false').lower() in ('true','yes','1')
+        return cls(error_log, instrument='rule-stats' in params, plan=plan, max_errors_per_rule=max_errors_per_rule, max_errors=max_errors, fail_fast=fail_fast)
+
+    def prepare(self, step, func, *args, visited=None):
+        """Runs a preparation step shared by several rules (e.g. building an index) and returns its result."""
+        if not self.instrument:
+            return func(*args)
+        start = time.perf_counter()
+        result = func(*args)
+        self.stats.append({'rule': step, 'seconds': time.perf_counter() - start, 'visited': visited(result) if visited else None, 'errors': 0})
+        return result
+
+    def run(self, rule, func, *args, visited=None):
+        """Runs a rule function, passing the error log as last argument. Rules which are not in the execution plan are skipped.
+
+        visited is the number of objects the rule examines, or a function returning it if counting them is not free.
+        """
+        if self.stopped or (self.plan is not None and rule not in self.plan):
+            return
+        self.run_rule(rule, func, args, visited)
+
+    def run_rule(self, rule, func, args, visited):
+        replay = self.replays.get(rule)
+        if replay is not None:
+            func, args = replay, ()
+        remaining_errors = self.max_errors - self.error_count if self.max_errors is not None else None
+        is_error_rule = RULE_SEVERITIES.get(rule) == xml.ErrorSeverity.ERROR
+        limits = [limit for limit in (self.max_errors_per_rule, remaining_errors, 1 if self.fail_fast and is_error_rule else None) if limit is not None]
+        if not self.instrument and not limits and self.recorded is None:
+            func(*args, self.error_log)
+            return
+
+        error_log = self.error_log
+        if self.recorded is not None and replay is None:
+            error_log = RecordingErrorLog(error_log)
+            self.recorded[rule] = error_log.errors
+        error_log = CountingErrorLog(error_log, min(limits) if limits else None)
+        start = time.perf_counter()
+        try:
+            func(*args, error_log)
+        except _RuleLimitReached:
+            pass
+        if error_log.full:
+            self.limited = True
+            if remaining_errors is not None and error_log.count >= remaining_errors:
+                self.stop(rule, '[EBA] Validation stopped after %d errors, the further errors of rule %s were not checked.' % (self.max_errors, rule), 'The remaining findings and rules were not checked because the limit given by the max-errors script parameter was reached.')
+            elif self.max_errors_per_rule is not None and error_log.count >= self.max_errors_per_rule:
+                self.report_rule_limit(rule, error_log.count)
+        self.error_count += error_log.count
+        if self.instrument:
+            self.stats.append({'rule': rule, 'seconds': time.perf_counter() - start, 'visited': visited() if callable(visited) else visited, 'errors': error_log.count})
+        if self.fail_fast and is_error_rule and error_log.count and not self.stopped:
+            not_checked = ', the further errors of rule %s were not checked' % rule if error_log.full else ''
+            self.stop(rule, '[EBA] Validation stopped after the first error%s.' % not_checked, 'The remaining rules were not checked because the fail-fast script parameter is set.')
+
+    def summary_severity(self, rule):
+        """Returns the severity of summary errors about the given rule: ERROR for rules which report errors, WARNING otherwise."""
+        return xml.ErrorSeverity.ERROR if RULE_SEVERITIES.get(rule, xml.ErrorSeverity.ERROR) == xml.ErrorSeverity.ERROR else xml.ErrorSeverity.WARNING
+
+    def report_rule_limit(self, rule, count):
+        detail_error = xbrl.Error.create('The remaining findings of this rule were not checked because the limit given by the max-errors-per-rule script parameter was reached.', severity=xml.ErrorSeverity.INFO)
+        main_error = xbrl.Error.create('[EBA.%s] Reporting stopped after %d errors, the further errors were not checked.' % (rule, count), children=[detail_error], severity=self.summary_severity(rule))
+        self.error_log.report(main_error)
+
+    def stop(self, rule, message, detail):
+        """Skips all remaining rules and reports why, with the severity of the rule which triggered the stop."""
+        self.stopped = True
+        detail_error = xbrl.Error.create(detail, severity=xml.ErrorSeverity.INFO)
+        main_error = xbrl.Error.create(message, children=[detail_error], severity=self.summary_severity(rule))
+        self.error_log.report(main_error)
+
+def format_rule_stats_json(instance, stats):
+    report = {'instance': instance.uri, 'version': __version__, 'seconds': sum(entry['seconds'] for entry in stats), 'rules': stats}
+    return json.dumps(report, indent=2)
+
+def format_rule_stats_prometheus(instance, stats):
+    lines = []
+    metrics = [
+        ('eba_rule_duration_seconds', 'seconds', 'Wall time spent in each EBA rule or preparation step.'),
+        ('eba_rule_objects_visited', 'visited', 'Number of objects examined by each EBA rule or preparation step.'),
+        ('eba_rule_errors_reported', 'errors', 'Number of errors reported by each EBA rule.'),
+    ]
+    for name, key, help_text in metrics:
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s gauge' % name)
+        for entry in stats:
+            if entry[key] is not None:
+                lines.append('%s{rule="%s"} %s' % (name, entry['rule'], repr(entry[key]) if isinstance(entry[key], float) else entry[key]))
+    return '\n'.join(lines) + '\n'
+
+def write_rule_stats(instance,params,stats):
+    """Writes the per-rule statistics to the file given by the rule-stats script parameter."""
+    path = params['rule-stats']
+    output_format = params.get('rule-stats-format', 'prometheus' if path.endswith('.prom') else 'json')
+    if output_format == 'prometheus':
+        text = format_rule_stats_prometheus(instance, stats)
+    else:
+        text = format_rule_stats_json(instance, stats)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+# Validation result cache
+
+# Script parameters which do not influence the findings and are therefore not part of the result cache key
+RESULT_CACHE_IGNORED_PARAMS = {'result-cache-dir', 'result-cache-size', 'taxonomy-cache-dir', 'incremental-state', 'rule-stats', 'rule-stats-format', 'findings-output', 'findings-format', 'findings-only', 'fact-table-output', 'fact-table-format'}
+
+# Severities in the order in which they are stored in the result cache
+SEVERITIES = [xml.ErrorSeverity.OTHER, xml.ErrorSeverity.INFO, xml.ErrorSeverity.WARNING, xml.ErrorSeverity.ERROR]
+
+class RecordingErrorLog:
+    """Forwards errors to the wrapped error log and keeps them, so that they can be stored in the result cache."""
+
+    def __init__(self, error_log):
+        self.error_log = error_log
+        self.errors = []
+
+    def report(self, error):
+        self.errors.append(error)
+        self.error_log.report(error)
+
+def validation_settings(instance, options, params, ignored_params):
+    """Returns everything besides the instance document the findings depend on as a string."""
+    schema_ref = next(instance.schema_refs,None)
+    settings = {name: value for name, value in params.items() if name not in ignored_params}
+    # The entry point and taxonomy packages determine the taxonomy tables, the xinclude option is checked by 1.15
+    environment = [__version__, schema_ref.xlink_href if schema_ref else None, taxonomy_fingerprint(options), options.get('xinclude') == True, settings]
+    return json.dumps(environment, sort_keys=True)
+
+# Separates the path of a zip archive from the name of a file inside it
+ARCHIVE_SEPARATOR = '|zip/'
+
+def instance_path(uri):
+    """Returns the local file path of the instance with the given URI, or None if it is not a local file.
+
+    Instances inside zip archives have paths of the form archive.zip|zip/instance.xbrl, as used by RaptorXML.
+    """
+    url = urllib.parse.urlparse(uri)
+    if url.scheme == 'file':
+        return urllib.request.url2pathname(url.path)
+    if not url.scheme or len(url.scheme) == 1:
+        # Plain path, possibly starting with a Windows drive letter
+        return uri
+    return None
+
+@contextlib.contextmanager
+def instance_data(path):
+    """Provides the bytes of the instance document at path without copying it to disk.
+
+    Local files are memory-mapped, members of zip archives are decompressed into memory straight from the archive.
+    Readers which go through the document once use InstanceDocument.chunks instead.
+    """
+    archive, separator, member = path.partition(ARCHIVE_SEPARATOR)
+    if separator:
+        try:
+            with zipfile.ZipFile(archive) as z:
+                data = z.read(member)
+        except (zipfile.BadZipFile, KeyError) as e:
+            raise OSError('cannot read %s: %s' % (path, e))
+        yield data
+        return
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+# Size of the chunks in which the instance document is hashed and parsed
+CHUNK_SIZE = 1024 * 1024
+
+class InstanceDocument:
+    """The instance document at path as read by the script itself, shared by all readers of one validation.
+
+    Readers which go through the document once, the result cache key and the incremental fingerprints, get it in
+    chunks, so that members of zip archives are streamed from the archive instead of being held in memory. If a
+    reader needs random access to a member (the lexical pre-scan), the member is decompressed once and all
+    readers use that buffer instead of decompressing it again.
+    """
+
+    def __init__(self, path, random_access=False):
+        self.path = path
+        archive, separator, member = path.partition(ARCHIVE_SEPARATOR)
+        self.archive = archive
+        self.member = member if separator else None
+        self.keep_member = self.member is not None and random_access
+        self.buffer = None
+
+    @contextlib.contextmanager
+    def data(self):
+        """Provides the bytes of the document for readers which need random access."""
+        if self.buffer is not None:
+            yield self.buffer
+            return
+        with instance_data(self.path) as data:
+            if self.keep_member:
+                self.buffer = data
+            yield data
+
+    def chunks(self, size=CHUNK_SIZE):
+        """Yields the bytes of the document in chunks."""
+        if self.member is not None and not self.keep_member:
+            try:
+                with zipfile.ZipFile(self.archive) as z, z.open(self.member) as f:
+                    for chunk in iter(lambda: f.read(size), b''):
+                        yield chunk
+            except (zipfile.BadZipFile, KeyError) as e:
+                raise OSError('cannot read %s: %s' % (self.path, e))
+            return
+        with self.data() as data:
+            for offset in range(0, len(data), size):
+                yield data[offset:offset + size]
+
+def document_elements(instance):
+    """Returns all elements of the instance document in the order of the DocumentWalker traversal."""
+    elements = []
+    walker = DocumentWalker()
+    walker.on_element(elements.append)
+    walker.walk(instance.document_element)
+    return elements
+
+# XBRL objects which are restored from their element when findings are replayed
+XBRL_OBJECT_KINDS = [('fact', xbrl.Item), ('fact', xbrl.Tuple), ('context', xbrl.Context), ('unit', xbrl.Unit)]
+
+def xbrl_objects_by_element(instance, kind):
+    objects = {'fact': instance.facts, 'context': instance.contexts, 'unit': instance.units}[kind]
+    return {obj.element: obj for obj in objects}
+
+def serialize_error(error, instance, position_of):
+    location = error.location
+    if location is None:
+        serialized_location = None
+    elif isinstance(location, str):
+        serialized_location = {'uri': None if location == instance.uri else location}
+    elif hasattr(location, 'element_children'):
+        serialized_location = {'element': position_of(location)}
+    elif hasattr(location, 'element'):
+        # Facts, contexts, units and other XBRL objects are located at their element
+        serialized_location = {'element': position_of(location.element)}
+        for kind, cls in XBRL_OBJECT_KINDS:
+            if isinstance(location, cls):
+                serialized_location['object'] = kind
+                break
+    else:
+        serialized_location = {'element': position_of(location.parent), 'attribute': [location.local_name, location.namespace_name]}
+    return {
+        'text': str(error),
+        'severity': SEVERITIES.index(error.severity),
+        'location': serialized_location,
+        'children': [serialize_error(child, instance, position_of) for child in error.children],
+    }
+
+def deserialize_error(data, instance, element_at, objects):
+    location = data['location']
+    if location is None:
+        resolved_location = None
+    elif 'uri' in location:
+        resolved_location = location['uri'] or instance.uri
+    elif 'attribute' in location:
+        resolved_location = element_at(location['element']).find_attribute(tuple(location['attribute']))
+    elif 'object' in location:
+        kind = location['object']
+        if kind not in objects:
+            objects[kind] = xbrl_objects_by_element(instance, kind)
+        resolved_location = objects[kind][element_at(location['element'])]
+    else:
+        resolved_location = element_at(location['element'])
+    children = [deserialize_error(child, instance, element_at, objects) for child in data['children']]
+    # The stored text is passed as parameter, so that braces in it are not taken for parameter references
+    return xbrl.Error.create('{text}', text=data['text'], severity=SEVERITIES[data['severity']], location=resolved_location, children=children)
+
+def error_locations(errors):
+    for error in errors:
+        if error.location is not None and not isinstance(error.location, str):
+            return True
+        if error_locations(error.children):
+            return True
+    return False
+
+class ResultCache:
+    """Findings of earlier validations, stored as JSON files in a directory which may be shared between processes.
+
+    Entries are keyed by a hash of the instance document and everything else the findings depend on. Hits refresh
+    the modification time of an entry, and the least recently used entries are removed once the total size of the
+    directory exceeds the limit. Locations of findings are stored as positions of elements in the document, so that
+    replayed findings point into the current instance document.
+
+    Listing a large shared directory costs more than many validations, so the total size is estimated instead: every
+    write appends the size of its entry to a sizes file, which starts with the total found by the last full scan.
+    The directory is only scanned once the estimate exceeds the limit or after SCAN_INTERVAL writes, which corrects
+    for entries that were overwritten or removed by other processes.
+    """
+
+    # File in the cache directory with the total size of the last full scan followed by the sizes of all entries written since
+    SIZES_FILE = 'sizes.log'
+    SCAN_INTERVAL = 1000
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+
+    @classmethod
+    def from_params(cls, params):
+        directory = params.get('result-cache-dir')
+        if not directory:
+            return None
+        return cls(directory, int(params.get('result-cache-size',1024)) * 1024 * 1024)
+
+    def key(self, document, instance, options, params):
+        """Returns the cache key of the instance, or None if the instance document cannot be read."""
+        key = hashlib.sha256()
+        try:
+            for chunk in document.chunks():
+                key.update(chunk)
+        except OSError:
+            return None
+        key.update(validation_settings(instance, options, params, RESULT_CACHE_IGNORED_PARAMS).encode('utf-8'))
+        return key.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def replay(self, key, instance, error_log):
+        """Reports the cached findings to the error log and returns True, or returns False if the cache has no entry for the key."""
+        path = self.path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return False
+        elements = document_elements(instance) if entry['element_locations'] else None
+        objects = {}
+        for data in entry['findings']:
+            error_log.report(deserialize_error(data, instance, elements.__getitem__ if elements else None, objects))
+        return True
+
+    def store(self, key, instance, errors):
+        element_locations = error_locations(errors)
+        positions = {element: i for i, element in enumerate(document_elements(instance))} if element_locations else None
+        entry = {'version': __version__, 'element_locations': element_locations, 'findings': [serialize_error(error, instance, positions.__getitem__ if positions else None) for error in errors]}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self.path(key)
+            write_json(path, entry)
+            total_size, writes = self.record_size(os.path.getsize(path))
+            # A sizes file without the total of a full scan was just created, e.g. for a directory of an older version
+            if total_size > self.max_size or writes > self.SCAN_INTERVAL or writes == 1:
+                self.evict()
+        except OSError:
+            # The cache is only an optimization, validation must not fail because it cannot be written
+            pass
+
+    def record_size(self, size):
+        """Appends the size of a new entry to the sizes file and returns the estimated total size and the number of lines of the file."""
+        # Appends of a single short line are atomic, so concurrent writers do not lose each other's sizes
+        with open(os.path.join(self.directory, self.SIZES_FILE), 'a+', encoding='ascii') as f:
+            f.write('%d\n' % size)
+            f.flush()
+            f.seek(0)
+            sizes = [int(line) for line in f if line.strip().isdigit()]
+        return sum(sizes), len(sizes)
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits into its maximum size and restarts the sizes file with the remaining total."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total_size = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                # Already removed by another process
+                pass
+            total_size -= size
+        # Sizes appended by other processes during the scan are lost, the next full scan corrects the estimate
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='ascii') as f:
+                f.write('%d\n' % total_size)
+            os.replace(tmp_path, os.path.join(self.directory, self.SIZES_FILE))
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+# Streaming findings output
+
+# Severity names used by the findings output, the same as those of eba_streaming.py
+SEVERITY_NAMES = {xml.ErrorSeverity.ERROR: 'error', xml.ErrorSeverity.WARNING: 'warning', xml.ErrorSeverity.INFO: 'info', xml.ErrorSeverity.OTHER: 'other'}
+SARIF_LEVELS = {'error': 'error', 'warning': 'warning', 'info': 'note', 'other': 'none'}
+
+def error_rule(text):
+    """Returns the rule number of a finding text starting with e.g. [EBA.2.16.1], or None."""
+    if text.startswith('[EBA.'):
+        return text[5:text.find(']')]
+    return None
+
+def located_element(obj):
+    """Returns the element an error location or parameter refers to, or None for URIs and plain values."""
+    if hasattr(obj, 'element_children'):
+        return obj
+    if hasattr(obj, 'element'):
+        return obj.element
+    if hasattr(obj, 'parent') and hasattr(obj, 'local_name'):
+        return obj.parent
+    return None
+
+def element_ids(element, root):
+    """Returns the ids of the context, unit or fact containing the given element."""
+    while element is not None and element != root:
+        if element.namespace_name == XBRLI_NAMESPACE and element.local_name in ('context', 'unit'):
+            id_attr = element.find_attribute('id')
+            return {element.local_name: id_attr.normalized_value} if id_attr else {}
+        context_ref = element.find_attribute('contextRef')
+        if context_ref is not None:
+            ids = {'concept': qname_text(element), 'context': context_ref.normalized_value}
+            for name, attr in (('unit', 'unitRef'), ('fact', 'id')):
+                value = element.find_attribute(attr)
+                if value is not None:
+                    ids[name] = value.normalized_value
+            return ids
+        element = element.parent
+    return {}
+
+def qname_text(node):
+    return '%s:%s' % (node.prefix, node.local_name) if node.prefix else node.local_name
+
+def describe_location(location):
+    if location is None or isinstance(location, str):
+        return 'document'
+    if hasattr(location, 'parent') and hasattr(location, 'local_name') and not hasattr(location, 'element_children'):
+        return '@' + qname_text(location)
+    element = located_element(location)
+    return qname_text(element) if element is not None else str(location)
+
+class FindingsWriter:
+    """Writes findings to a file as soon as they are reported, either as JSON lines or as a SARIF 2.1.0 log.
+
+    Each finding is a flat record with the fields of eba_streaming.Finding: the rule number, the severity name,
+    the message and detail texts, a description of the location and the ids of the contexts, units, facts and
+    concepts involved. The SARIF log is written incrementally as well, its results array is closed by close().
+    """
+
+    def __init__(self, path, output_format, instance_uri):
+        self.output_format = output_format
+        self.instance_uri = instance_uri
+        self.count = 0
+        self.f = open(path, 'w', encoding='utf-8')
+        if output_format == 'sarif':
+            driver = {'name': 'eba_validation.py', 'version': __version__}
+            header = json.dumps({'version': '2.1.0', '$schema': 'https://json.schemastore.org/sarif-2.1.0.json', 'runs': [{'tool': {'driver': driver}, 'results': []}]})
+            # Everything up to and including the opening bracket of the results array
+            self.f.write(header[:-len(']}]}')])
+
+    @classmethod
+    def from_params(cls, params, instance_uri):
+        path = params.get('findings-output')
+        if not path:
+            return None
+        return cls(path, params.get('findings-format', 'sarif' if path.endswith('.sarif') else 'jsonl'), instance_uri)
+
+    def record(self, error, root):
+        """Returns the flat record of an error, with the ids taken from its location and parameters and those of its details."""
+        ids = {}
+        for err in [error] + list(error.children):
+            objects = [err.location] + list(getattr(err, 'params', {}).values())
+            for obj in objects:
+                element = located_element(obj)
+                if element is None:
+                    continue
+                for kind, value in element_ids(element, root).items():
+                    # The second object of a kind is reported as fact2, context2, ..., as by eba_streaming.py
+                    key = kind if ids.get(kind, value) == value else kind + '2'
+                    ids.setdefault(key, value)
+        location = error.location
+        if location is None:
+            location = next((obj for obj in getattr(error, 'params', {}).values() if located_element(obj) is not None), None)
+        return {
+            'rule': error_rule(str(error)),
+            'severity': SEVERITY_NAMES.get(error.severity, 'error'),
+            'message': str(error),
+            'detail': ' '.join(str(child) for child in error.children),
+            'location': describe_location(location),
+            'ids': ids,
+        }
+
+    def write(self, record):
+        if self.output_format == 'sarif':
+            result = {
+                'ruleId': 'EBA.%s' % record['rule'] if record['rule'] else 'EBA',
+                'level': SARIF_LEVELS[record['severity']],
+                'message': {'text': '%s %s' % (record['message'], record['detail']) if record['detail'] else record['message']},
+                'locations': [{'logicalLocations': [{'fullyQualifiedName': record['location']}]}],
+                'properties': {'ids': record['ids']},
+            }
+            if self.instance_uri:
+                result['locations'][0]['physicalLocation'] = {'artifactLocation': {'uri': self.instance_uri}}
+            self.f.write((',' if self.count else '') + json.dumps(result, ensure_ascii=False))
+        else:
+            self.f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+
+    def close(self):
+        if self.output_format == 'sarif':
+            self.f.write(']}]}\n')
+        self.f.close()
+
+class FindingsErrorLog:
+    """Writes errors to the findings output and, unless findings-only is set, forwards them to the wrapped error log."""
+
+    def __init__(self, error_log, writer, root, forward=True):
+        self.error_log = error_log
+        self.writer = writer
+        self.root = root
+        self.forward = forward
+
+    def report(self, error):
+        self.writer.write(self.writer.record(error, self.root))
+        if self.forward:
+            self.error_log.report(error)
+
+# Incremental revalidation
+
+# Script parameters which do not influence the findings of the individual rules and are therefore not part of the incremental state key
+INCREMENTAL_IGNORED_PARAMS = RESULT_CACHE_IGNORED_PARAMS | {'profile', 'rules', 'skip-rules', 'max-errors-per-rule', 'max-errors', 'fail-fast'}
+
+# Parts of the instance document which are fingerprinted separately
+PART_PROLOG = 'prolog'
+PART_ROOT = 'root'
+PART_OTHER = 'other'
+PART_CONTEXTS = 'contexts'
+PART_UNITS = 'units'
+PART_FACTS = 'facts'
+PART_CONTEXT_USAGE = 'context-usage'
+PART_UNIT_USAGE = 'unit-usage'
+ALL_PARTS = frozenset((PART_PROLOG, PART_ROOT, PART_OTHER, PART_CONTEXTS, PART_UNITS, PART_FACTS, PART_CONTEXT_USAGE, PART_UNIT_USAGE))
+
+# Parts of the instance document the findings of each rule depend on, in addition to the document element's start tag
+RULE_PARTS = {
+    '1.4': {PART_PROLOG}, '1.6': {PART_CONTEXTS, PART_FACTS}, '1.13': {PART_PROLOG}, '1.14': set(), '1.15': set(),
+    '2.1': ALL_PARTS, '2.2': {PART_OTHER}, '2.3': {PART_OTHER}, '2.4': {PART_OTHER}, '2.25': {PART_OTHER},
+    '2.6': {PART_CONTEXTS}, '2.7': {PART_CONTEXTS, PART_CONTEXT_USAGE}, '2.9': {PART_CONTEXTS}, '2.10': {PART_CONTEXTS},
+    '2.11': {PART_CONTEXTS}, '2.13': {PART_CONTEXTS}, '2.14': {PART_CONTEXTS}, '2.15': {PART_CONTEXTS},
+    '2.16': {PART_CONTEXTS, PART_UNITS, PART_FACTS}, '2.17': {PART_FACTS}, '2.19': {PART_FACTS},
+    '2.21': {PART_UNITS}, '2.22': {PART_UNITS, PART_UNIT_USAGE}, '3.1': {PART_CONTEXTS, PART_UNITS, PART_FACTS},
+    '3.2': {PART_UNITS, PART_FACTS}, '3.4': ALL_PARTS, '3.5': set(), '3.6': {PART_CONTEXTS}, '3.7': {PART_FACTS, PART_OTHER},
+    '3.8': {PART_FACTS}, '3.9': ALL_PARTS, '3.10': set(),
+}
+
+LINK_NAMESPACE = 'http://www.xbrl.org/2003/linkbase'
+XML_LANG = 'http://www.w3.org/XML/1998/namespace lang'
+
+def top_level_kind(namespace_name, local_name):
+    """Returns the part of the instance document a child element of the document element belongs to."""
+    if namespace_name == XBRLI_NAMESPACE and local_name == 'context':
+        return PART_CONTEXTS
+    if namespace_name == XBRLI_NAMESPACE and local_name == 'unit':
+        return PART_UNITS
+    if namespace_name in (XBRLI_NAMESPACE, LINK_NAMESPACE):
+        return PART_OTHER
+    return PART_FACTS
+
+def combined_digest(digests):
+    return hashlib.sha1('\n'.join(digests).encode('utf-8')).hexdigest()
+
+class InstanceFingerprints:
+    """Fingerprints of the parts of an instance document, computed from its bytes in a single expat pass without building a tree.
+
+    Each child element of the document element and each item, including items nested in tuples, is fingerprinted
+    by hashing its bytes, up to the start of the next sibling or the end of its parent. Items are additionally
+    grouped by concept, together with their position among all items in document order. The document is parsed in
+    chunks, and only the bytes of the elements which are still open are kept.
+    """
+
+    def __init__(self, document):
+        self.contexts = {}
+        self.units = {}
+        self.facts = []
+        self.other = []
+        self.used_contexts = set()
+        self.used_units = set()
+        self.concepts = {}
+        self.concept_positions = {}
+        self.root = None
+        self.prolog = None
+        self.depth = 0
+        self.item_count = 0
+        self.open_slices = []
+        self.langs = [(-1, None)]
+        self.namespace_declarations = []
+        # Bytes of the document from buffer_offset on, back to the start of the oldest open element
+        self.buffer = b''
+        self.buffer_offset = 0
+        self.last_offset = 0
+        self.parser = expat.ParserCreate(namespace_separator=' ')
+        self.parser.StartElementHandler = self.start_element
+        self.parser.EndElementHandler = self.end_element
+        self.parser.StartNamespaceDeclHandler = self.start_namespace_declaration
+        for chunk in document.chunks():
+            self.buffer += chunk
+            self.parser.Parse(chunk, False)
+            if self.root is not None:
+                # Later elements start after the last reported one
+                keep = min([start for depth, start, kind, key, lang in self.open_slices] + [self.last_offset])
+                self.buffer = self.buffer[keep - self.buffer_offset:]
+                self.buffer_offset = keep
+        self.parser.Parse(b'', True)
+        del self.buffer, self.parser
+        self.concepts = {concept: digest.hexdigest() for concept, digest in self.concepts.items()}
+
+    def start_namespace_declaration(self, prefix, uri):
+        if self.depth == 0:
+            self.namespace_declarations.append((prefix, uri))
+
+    def document_bytes(self, start, end):
+        return self.buffer[start - self.buffer_offset:end - self.buffer_offset]
+
+    def start_element(self, name, attrs):
+        offset = self.last_offset = self.parser.CurrentByteIndex
+        if self.open_slices and self.open_slices[-1][0] >= self.depth:
+            self.close_slices(self.depth, offset)
+        if XML_LANG in attrs:
+            self.langs.append((self.depth, attrs[XML_LANG]))
+        if self.depth == 0:
+            self.prolog = hashlib.sha1(self.document_bytes(0, offset)).hexdigest()
+            self.root = hashlib.sha1(repr((name, sorted(attrs.items()), self.namespace_declarations)).encode('utf-8')).hexdigest()
+        else:
+            namespace_name, _, local_name = name.rpartition(' ')
+            if self.depth == 1:
+                kind = top_level_kind(namespace_name, local_name)
+                self.open_slices.append((self.depth, offset, kind, attrs.get('id'), None))
+            if 'contextRef' in attrs:
+                # Items are the only elements with a contextRef attribute
+                self.used_contexts.add(attrs['contextRef'])
+                if 'unitRef' in attrs:
+                    self.used_units.add(attrs['unitRef'])
+                concept = '{%s}%s' % (namespace_name, local_name)
+                self.concept_positions.setdefault(concept, []).append(self.item_count)
+                self.item_count += 1
+                self.open_slices.append((self.depth, offset, 'item', concept, self.langs[-1][1]))
+        self.depth += 1
+
+    def end_element(self, name):
+        self.depth -= 1
+        if self.langs[-1][0] == self.depth:
+            self.langs.pop()
+        self.last_offset = self.parser.CurrentByteIndex
+        if self.open_slices and self.open_slices[-1][0] > self.depth:
+            self.close_slices(self.depth + 1, self.last_offset)
+
+    def close_slices(self, depth, offset):
+        """Fingerprints all open elements at the given or a deeper level, which end at the given offset."""
+        while self.open_slices and self.open_slices[-1][0] >= depth:
+            slice_depth, start, kind, key, lang = self.open_slices.pop()
+            digest = hashlib.sha1(self.document_bytes(start, offset))
+            if kind == 'item':
+                # The inherited xml:lang is part of the item's identity for 2.16
+                digest.update(repr(lang).encode('utf-8'))
+                self.concepts.setdefault(key, hashlib.sha1()).update(digest.digest())
+            elif kind == PART_CONTEXTS:
+                self.contexts[key] = digest.hexdigest()
+            elif kind == PART_UNITS:
+                self.units[key] = digest.hexdigest()
+            elif kind == PART_FACTS:
+                self.facts.append(digest.hexdigest())
+            else:
+                self.other.append(digest.hexdigest())
+
+    def parts(self):
+        return {
+            PART_PROLOG: self.prolog,
+            PART_ROOT: self.root,
+            PART_OTHER: combined_digest(self.other),
+            PART_CONTEXTS: combined_digest('%s=%s' % item for item in self.contexts.items()),
+            PART_UNITS: combined_digest('%s=%s' % item for item in self.units.items()),
+            PART_FACTS: combined_digest(self.facts),
+            PART_CONTEXT_USAGE: combined_digest(sorted(self.used_contexts)),
+            PART_UNIT_USAGE: combined_digest(sorted(self.used_units)),
+        }
+
+class ElementPositions:
+    """Positions of elements which stay valid as long as the part of the instance document containing them is unchanged.
+
+    A position consists of the part, the index of the enclosing child element of the document element among all
+    children in the same part, and the path of child indexes from there to the element.
+    """
+
+    def __init__(self, instance):
+        self.root = instance.document_element
+        self.top_level = None
+        self.by_part = None
+
+    def index_top_level(self):
+        self.top_level = {}
+        self.by_part = {}
+        for elem in self.root.element_children():
+            part = top_level_kind(elem.namespace_name, elem.local_name)
+            elements = self.by_part.setdefault(part, [])
+            self.top_level[elem] = (part, len(elements))
+            elements.append(elem)
+
+    def position_of(self, element):
+        if self.top_level is None:
+            self.index_top_level()
+        path = []
+        while element != self.root:
+            if element in self.top_level:
+                part, index = self.top_level[element]
+                return [part, index, path[::-1]]
+            parent = element.parent
+            path.append(list(parent.element_children()).index(element))
+            element = parent
+        return [PART_ROOT, 0, path[::-1]]
+
+    def element_at(self, position):
+        if self.by_part is None:
+            self.index_top_level()
+        part, index, path = position
+        element = self.root if part == PART_ROOT else self.by_part[part][index]
+        for i in path:
+            element = list(element.element_children())[i]
+        return element
+
+class IncrementalValidation:
+    """Revalidates an amended filing against the fingerprints and findings persisted by an earlier validation.
+
+    Rules whose input parts of the instance document are unchanged replay their earlier findings, and the
+    preparation steps only they need are skipped. 2.16 is only rechecked for concepts whose facts changed, as long
+    as contexts and units are unchanged. Any change of the document element's start tag, e.g. of the namespace
+    declarations, invalidates all earlier findings.
+    """
+
+    def __init__(self, path, settings, fingerprints, previous):
+        self.path = path
+        self.settings = settings
+        self.fingerprints = fingerprints
+        self.previous = previous
+        self.parts = fingerprints.parts()
+        if previous is None or previous['parts'][PART_ROOT] != self.parts[PART_ROOT]:
+            self.changed_parts = set(ALL_PARTS)
+        else:
+            self.changed_parts = {part for part in ALL_PARTS if previous['parts'][part] != self.parts[part]}
+        # 2.16 can be rechecked per concept if contexts and units are unchanged, using the persisted context classes
+        self.recheck_concepts = (previous is not None and previous.get('duplicate_facts') is not None and previous.get('context_classes') is not None
+                                 and not self.changed_parts & {PART_ROOT, PART_CONTEXTS, PART_UNITS})
+        self.replayed = set()
+        self.duplicate_facts = None
+
+    @classmethod
+    def from_params(cls, document, instance, options, params):
+        """Fingerprints the instance and loads the earlier state, or returns None if the instance document is not a local file."""
+        if document is None:
+            return None
+        try:
+            fingerprints = InstanceFingerprints(document)
+        except (OSError, ValueError, expat.ExpatError):
+            return None
+        settings = validation_settings(instance, options, params, INCREMENTAL_IGNORED_PARAMS)
+        state_path = params['incremental-state']
+        try:
+            with open(state_path, encoding='utf-8') as f:
+                previous = json.load(f)
+            if previous.get('settings') != settings:
+                previous = None
+        except (OSError, ValueError):
+            previous = None
+        return cls(state_path, settings, fingerprints, previous)
+
+    def plan(self, plan):
+        """Returns the execution plan of the selected rules in which all rules with unchanged inputs are replayed."""
+        if self.previous is not None:
+            findings = self.previous['findings']
+            self.replayed = {rule for rule in plan.rules if rule in findings and not self.changed_parts & RULE_PARTS[rule]}
+        needs = {'2.16': (INDEX_UNITS,)} if self.recheck_concepts else None
+        return ExecutionPlan(plan.rules, self.replayed, needs)
+
+    def replays(self, instance):
+        positions = ElementPositions(instance)
+        objects = {}
+        def replay(findings):
+            def replay_findings(error_log):
+                for data in findings:
+                    error_log.report(deserialize_error(data, instance, positions.element_at, objects))
+            return replay_findings
+        return {rule: replay(self.previous['findings'][rule]) for rule in self.replayed}
+
+    def eba_2_16(self,instance,index,error_log):
+        """EBA 2.16 - Duplicate (Redundant/Inconsistent) facts, only rechecked for concepts whose facts changed"""
+        if not self.recheck_concepts:
+            context_classes = dict(zip(index.context_ids,index.context_classes))
+            self.duplicate_facts = []
+            for fact, duplicate_fact, k, duplicate_k in find_duplicate_facts(instance.facts, context_classes):
+                self.duplicate_facts.append(['{%s}%s' % (fact.concept.target_namespace, fact.concept.name), k, duplicate_k])
+                report_duplicate_facts(index, fact, duplicate_fact, error_log)
+            return
+
+        previous_concepts = self.previous['concepts']
+        concepts = self.fingerprints.concepts
+        changed_concepts = {concept for concept in set(previous_concepts) | set(concepts) if previous_concepts.get(concept) != concepts.get(concept)}
+        context_classes = self.previous['context_classes']
+        concept_facts = {}
+        self.duplicate_facts = [entry for entry in self.previous['duplicate_facts'] if entry[0] not in changed_concepts]
+        for concept in changed_concepts:
+            if concept in concepts:
+                namespace_name, local_name = concept[1:].split('}')
+                concept_facts[concept] = list(instance.facts.filter(xml.QName(local_name,namespace_name)))
+                for fact, duplicate_fact, k, duplicate_k in find_duplicate_facts(concept_facts[concept], context_classes):
+                    self.duplicate_facts.append([concept, k, duplicate_k])
+        # Report in document order, as a full check would
+        concept_positions = self.fingerprints.concept_positions
+        self.duplicate_facts.sort(key=lambda entry: concept_positions[entry[0]][entry[1]])
+        for concept, k, duplicate_k in self.duplicate_facts:
+            if concept not in concept_facts:
+                namespace_name, local_name = concept[1:].split('}')
+                concept_facts[concept] = list(instance.facts.filter(xml.QName(local_name,namespace_name)))
+            facts = concept_facts[concept]
+            report_duplicate_facts(index, facts[k], facts[duplicate_k], error_log)
+
+    def save(self, instance, index, recorded):
+        """Persists the fingerprints and the findings of all replayed and run rules for the next revalidation."""
+        findings = {rule: self.previous['findings'][rule] for rule in self.replayed}
+        positions = ElementPositions(instance)
+        for rule, errors in recorded.items():
+            if rule != '2.16':
+                findings[rule] = [serialize_error(error, instance, positions.position_of) for error in errors]
+
+        if index.context_classes:
+            context_classes = {context_id: index.context_ids[first] for context_id, first in zip(index.context_ids, index.context_classes)}
+        elif self.previous is not None and PART_CONTEXTS not in self.changed_parts:
+            context_classes = self.previous.get('context_classes')
+        else:
+            context_classes = None
+
+        state = {
+            'settings': self.settings,
+            'parts': self.parts,
+            'contexts': self.fingerprints.contexts,
+            'units': self.fingerprints.units,
+            'concepts': self.fingerprints.concepts,
+            'context_classes': context_classes,
+            'duplicate_facts': self.duplicate_facts,
+            'findings': findings,
+        }
+        try:
+            write_json(self.path, state)
+        except OSError:
+            # Incremental state is only an optimization, validation must not fail because it cannot be written
+            pass
 
 # Filing syntax rules
 
 def eba_1_4(instance,error_log):
     """EBA 1.4 - Character encoding of XBRL instance documents"""
     if instance.document.character_encoding_scheme.upper() != 'UTF-8':
-        detail_error = xbrl.Error.create('XBRL instance documents SHOULD NOT use the XML standalone declaration.', severity=xml.ErrorSeverity.INFO)
+        detail_error = xbrl.Error.create('XBRL instance documents MUST use "UTF-8" encoding. [GFM11, p. 11]', severity=xml.ErrorSeverity.INFO)
         main_error = xbrl.Error.create('[EBA.1.4] Character encoding of XBRL instance documents.', location=instance.uri, children=[detail_error])
         error_log.report(main_error)
 
-def eba_1_6(instance,error_log):
+def eba_1_6(instance,taxonomy_tables,error_log):
     """EBA 1.6 - Filing indicators"""
-
-    # Get all filing indicators which are present in the taxonomy
-    available_indicators = set()
-    for table in instance.dts.tables:
-        for label in table.labels(label_role='http://www.eurofiling.info/xbrl/role/filing-indicator-code'):
-            available_indicators.add(label.text)
-
+    available_indicators = taxonomy_tables.filing_indicators
     used_indictors = {}
     indicator_facts = instance.facts.filter(xml.QName('filingIndicator','http://www.eurofiling.info/xbrl/ext/filing-indicators'))
     for indicator in indicator_facts:
@@ -95,7 +2011,7 @@ def eba_1_6(instance,error_log):
 def eba_1_13(instance,error_log):
     """EBA 1.13 - Standalone Document Declaration"""
     if instance.document.standalone is not None:
-        detail_error = xbrl.Error.create('XBRL instance documents MUST use "UTF-8" encoding. [GFM11, p. 11]', severity=xml.ErrorSeverity.INFO)
+        detail_error = xbrl.Error.create('XBRL instance documents SHOULD NOT use the XML standalone declaration.', severity=xml.ErrorSeverity.INFO)
         main_error = xbrl.Error.create('[EBA.1.13] Standalone Document Declaration.', location=instance.uri, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
         error_log.report(main_error)
 
@@ -120,14 +2036,12 @@ def eba_1_15(instance,options,error_log):
 
 # Instance syntax rules
 
-def eba_2_1(instance,error_log):
+def eba_2_1(xml_base_collector,error_log):
     """EBA 2.1 - The existence of xml:base is not permitted"""
-    for elem in dfs(instance.document_element):
-        xml_base_attr = elem.find_attribute(xml.QName('base','http://www.w3.org/XML/1998/namespace'))
-        if xml_base_attr:
-            detail_error = xbrl.Error.create('The attribute @xml:base MUST NOT appear in any instance document. [EFM13, p. 6-7].', severity=xml.ErrorSeverity.INFO)
-            main_error = xbrl.Error.create('[EBA.2.1] The existence of {xml_base} is not permitted.', xml_base=xml_base_attr, children=[detail_error])
-            error_log.report(main_error)
+    for xml_base_attr in xml_base_collector.attributes:
+        detail_error = xbrl.Error.create('The attribute @xml:base MUST NOT appear in any instance document. [EFM13, p. 6-7].', severity=xml.ErrorSeverity.INFO)
+        main_error = xbrl.Error.create('[EBA.2.1] The existence of {xml_base} is not permitted.', xml_base=xml_base_attr, children=[detail_error])
+        error_log.report(main_error)
 
 def eba_2_2(instance,error_log):
     """EBA 2.2 - The absolute URL has to be stated for the link:schemaRef element"""
@@ -160,121 +2074,146 @@ def eba_2_25(instance,error_log):
 
 # Context related rules
 
-def eba_2_6(instance,params,error_log):
+def eba_2_6(index,params,error_log):
     """EBA 2.6 - The length of the @id attribute should be limited to the necessary characters"""
     max_id_length = int(params.get('max-id-length',50))
-    for context in instance.contexts:
-        if len(context.id) > max_id_length:
-            id_attr = context.element.find_attribute('id')
+    for i, context_id in enumerate(index.context_ids):
+        if len(context_id) > max_id_length:
+            id_attr = index.contexts[i].element.find_attribute('id')
             detail_error = xbrl.Error.create('Semantics SHOULD NOT be expressed in the xbrli:context/@id attribute. The values of each @id attribute SHOULD be as short as possible.', severity=xml.ErrorSeverity.INFO)
             main_error = xbrl.Error.create('[EBA.2.6] The length of the {id} attribute should be limited to the necessary characters.', id=id_attr, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
             error_log.report(main_error)
 
-def eba_2_7(instance,error_log):
+def eba_2_7(index,error_log):
     """EBA 2.7 - No unused or duplicated xbrli:context nodes"""
-    aspects_map = {}
-    for context in instance.contexts:
+    for i, context in enumerate(index.contexts):
         # Check for unused contexts
-        if not instance.facts.filter(context):
+        if not index.is_context_used(index.context_ids[i]):
             detail_error = xbrl.Error.create('Unused xbrli:context nodes SHOULD NOT be present in the instance. [FRIS04]', severity=xml.ErrorSeverity.INFO)
             main_error = xbrl.Error.create('[EBA.2.7] No unused or duplicated {context} nodes.', context=context.element, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
             error_log.report(main_error)
 
         # Check for duplicated contexts
-        duplicates = aspects_map.setdefault(xbrl.ConstraintSet(context),[])
-        if duplicates:
+        first = index.context_classes[i]
+        if first != i:
             detail_error1 = xbrl.Error.create('An instance document SHOULD NOT contain duplicated context, unless required for technical reasons, e.g. to support XBRL streaming.', severity=xml.ErrorSeverity.INFO)
-            detail_error2 = xbrl.Error.create('Context {context} is a duplicate of context {context2}', context=context, context2=duplicates[0], severity=xml.ErrorSeverity.OTHER)
+            detail_error2 = xbrl.Error.create('Context {context} is a duplicate of context {context2}', context=context, context2=index.contexts[first], severity=xml.ErrorSeverity.OTHER)
             main_error = xbrl.Error.create('[EBA.2.7] No unused or duplicated {context} nodes.', context=context.element, children=[detail_error1,detail_error2], severity=xml.ErrorSeverity.WARNING)
             error_log.report(main_error)
-        else:
-            duplicates.append(context)
 
-def eba_2_9(instance,error_log):
+def eba_2_9(index,error_log):
     """EBA 2.9 - Single reporter per instance"""
-    single_identifier = next(instance.contexts).entity_identifier_aspect_value
-    for context in instance.contexts:
-        if context.entity_identifier_aspect_value != single_identifier:
+    if not index.contexts:
+        return
+    single_identifier = index.context_identifiers[0]
+    for i, identifier in enumerate(index.context_identifiers):
+        if identifier != single_identifier:
             detail_error = xbrl.Error.create('All xbrli:identifier content and @scheme attributes in an instance MUST be identical. [EFM13, p. 6-8]', severity=xml.ErrorSeverity.INFO)
-            main_error = xbrl.Error.create('[EBA.2.9] Single reporter per instance.', location=context.entity.identifier, children=[detail_error])
+            main_error = xbrl.Error.create('[EBA.2.9] Single reporter per instance.', location=index.contexts[i].entity.identifier, children=[detail_error])
             error_log.report(main_error)
 
-def eba_2_10(instance,error_log):
+def eba_2_10(index,error_log):
     """EBA 2.10 - The xbrli:period date elements reported must be valid"""
-    for context in instance.contexts:
-        period = context.period
-        if period.instant and (period.instant.value.tzinfo or period.instant.element.member_type_definition.name != "date"):
+    for i, invalid_date in enumerate(index.context_invalid_dates):
+        if invalid_date:
             detail_error = xbrl.Error.create('All xbrli:period date elements MUST be valid against the xs:date data type, and reported without a timezone. [GFM11, p. 16]', severity=xml.ErrorSeverity.INFO)
-            main_error = xbrl.Error.create('[EBA.2.10] The {period} date elements reported must be valid.', period=context.period, children=[detail_error])
+            main_error = xbrl.Error.create('[EBA.2.10] The {period} date elements reported must be valid.', period=index.contexts[i].period, children=[detail_error])
             error_log.report(main_error)
 
-def eba_2_11(instance,error_log):
+def eba_2_11(index,error_log):
     """EBA 2.11 - The existence of xbrli:forever is not permitted"""
-    for context in instance.contexts:
-        if context.period.is_forever():
+    for i, period_kind in enumerate(index.context_period_kinds):
+        if period_kind == PERIOD_FOREVER:
             detail_error = xbrl.Error.create('The element ‘xbrli:forever’ MUST NOT be used. [GFM11, p. 19]', severity=xml.ErrorSeverity.INFO)
-            main_error = xbrl.Error.create('[EBA.2.11] The existence of {forever} is not permitted.', forever=context.period.forever, children=[detail_error])
+            main_error = xbrl.Error.create('[EBA.2.11] The existence of {forever} is not permitted.', forever=index.contexts[i].period.forever, children=[detail_error])
             error_log.report(main_error)
 
-def eba_2_13(instance,error_log):
+def eba_2_13(index,error_log):
     """EBA 2.13 - XBRL period consistency"""
-    single_period = next(instance.contexts).period_aspect_value
-    for context in instance.contexts:
-        if not context.period.is_instant() or context.period_aspect_value != single_period:
+    if not index.contexts:
+        return
+    single_period = index.context_period_values[0]
+    for i, period_kind in enumerate(index.context_period_kinds):
+        if period_kind != PERIOD_INSTANT or index.context_period_values[i] != single_period:
             detail_error = xbrl.Error.create('All xbrl periods in a report instance MUST refer to the (same) reference date instant. All xbrl periods MUST be instants.', severity=xml.ErrorSeverity.INFO)
-            main_error = xbrl.Error.create('[EBA.2.13] XBRL {period} consistency.', period=context.period, children=[detail_error])
+            main_error = xbrl.Error.create('[EBA.2.13] XBRL {period} consistency.', period=index.contexts[i].period, children=[detail_error])
             error_log.report(main_error)
 
-def eba_2_14(instance,error_log):
+def eba_2_14(index,error_log):
     """EBA 2.14 - The existence of xbrli:segment is not permitted"""
-    for context in instance.contexts:
-        if context.entity.segment:
+    for i, has_segment in enumerate(index.context_has_segment):
+        if has_segment:
             detail_error = xbrl.Error.create('xbrli:segment elements MUST NOT be used.', severity=xml.ErrorSeverity.INFO)
-            main_error = xbrl.Error.create('[EBA.2.14] The existence of {segment} is not permitted.', segment=context.entity.segment, children=[detail_error])
+            main_error = xbrl.Error.create('[EBA.2.14] The existence of {segment} is not permitted.', segment=index.contexts[i].entity.segment, children=[detail_error])
             error_log.report(main_error)
 
-def eba_2_15(instance,error_log):
+def eba_2_15(index,error_log):
     """EBA 2.15 - Restrictions on the use of the xbrli:scenario element"""
-    for context in instance.contexts:
-        if context.scenario and next(context.scenario.non_xdt_child_elements,None):
+    for i, has_non_xdt_scenario in enumerate(index.context_has_non_xdt_scenario):
+        if has_non_xdt_scenario:
             detail_error = xbrl.Error.create('If an xbrli:scenario element appears in a xbrli:context, then its children MUST only be one or more xbrldi:explicitMember and/or xbrldi:typedMember elements, and MUST NOT contain any other content. [EFM13, p. 6-8].', severity=xml.ErrorSeverity.INFO)
-            main_error = xbrl.Error.create('[EBA.2.15] Restrictions on the use of the {scenario} element.', scenario=context.scenario, children=[detail_error])
+            main_error = xbrl.Error.create('[EBA.2.15] Restrictions on the use of the {scenario} element.', scenario=index.contexts[i].scenario, children=[detail_error])
             error_log.report(main_error)
 
 # Fact related rules
 
-def eba_2_16(instance,error_log):
+def find_duplicate_facts(facts, context_classes):
+    """Yields (fact, first_fact, k, first_k) for every business fact with the same concept, context class and xml:lang as an earlier fact.
+
+    k and first_k are the positions of the facts among all facts of their concept. Only the first fact of each key
+    is kept, so memory is bounded by the number of distinct keys.
+    """
+    is_business_concept = {}
+    concept_counts = {}
+    first_facts = {}
+    for fact in facts:
+        if not isinstance(fact,xbrl.Item):
+            continue
+        concept = fact.concept
+        is_business = is_business_concept.get(concept)
+        if is_business is None:
+            is_business = concept.target_namespace != "http://www.eurofiling.info/xbrl/ext/filing-indicators" or concept.name != "filingIndicator"
+            is_business_concept[concept] = is_business
+        k = concept_counts.get(concept,0)
+        concept_counts[concept] = k + 1
+        if is_business:
+            key = (concept,context_classes[fact.context.id],fact.xml_lang)
+            first = first_facts.setdefault(key,(fact,k))
+            if first[0] is not fact:
+                yield fact, first[0], k, first[1]
+
+def report_duplicate_facts(index,fact,duplicate_fact,error_log):
+    if index.unit_class(fact.unit) == index.unit_class(duplicate_fact.unit):
+        detail_error = xbrl.Error.create('Instances MUST NOT contain duplicate business facts. [FRIS04],[EFM13, p. 6-10]', severity=xml.ErrorSeverity.INFO)
+        main_error = xbrl.Error.create('[EBA.2.16] Duplicate (Redundant/Inconsistent) facts {fact} and {fact2}.', fact=fact, fact2=duplicate_fact, children=[detail_error])
+        error_log.report(main_error)
+    else:
+        detail_error = xbrl.Error.create('Instances MUST NOT contain business facts which would be duplicates were their units not different.', severity=xml.ErrorSeverity.INFO)
+        main_error = xbrl.Error.create('[EBA.2.16.1] No multi-unit facts {fact} and {fact2}.', fact=fact, fact2=duplicate_fact, children=[detail_error])
+        error_log.report(main_error)
+
+def eba_2_16(instance,index,error_log):
     """EBA 2.16 - Duplicate (Redundant/Inconsistent) facts"""
-    # Taking advantage of disallowed duplicate contexts and units. Otherwise one would need to hash by the aspect values.
-    for aspect in instance.facts.concept_aspect_values():
-        if isinstance(aspect.concept,xbrl.taxonomy.Item) and (aspect.concept.target_namespace != "http://www.eurofiling.info/xbrl/ext/filing-indicators" or aspect.concept.name != "filingIndicator"):
-            duplicate_facts = {}
-            for fact in instance.facts.filter(aspect.concept):
-                key = (fact.context,fact.xml_lang)
-                if duplicate_facts.setdefault(key,fact) != fact:
-                    duplicate_fact = duplicate_facts[key]
-                    if fact.unit == duplicate_fact.unit:
-                        detail_error = xbrl.Error.create('Instances MUST NOT contain duplicate business facts. [FRIS04],[EFM13, p. 6-10]', severity=xml.ErrorSeverity.INFO)
-                        main_error = xbrl.Error.create('[EBA.2.16] Duplicate (Redundant/Inconsistent) facts {fact} and {fact2}.', fact=fact, fact2=duplicate_fact, children=[detail_error])
-                        error_log.report(main_error)
-                    else:
-                        detail_error = xbrl.Error.create('Instances MUST NOT contain business facts which would be duplicates were their units not different.', severity=xml.ErrorSeverity.INFO)
-                        main_error = xbrl.Error.create('[EBA.2.16.1] No multi-unit facts {fact} and {fact2}.', fact=fact, fact2=duplicate_fact, children=[detail_error])
-                        error_log.report(main_error)
-
-def eba_2_17(instance,error_log):
+    # Single pass over all facts, keyed by concept, context equivalence class and xml:lang, so that facts in duplicated
+    # contexts are detected as well. Units are only compared on a collision.
+    context_classes = dict(zip(index.context_ids,index.context_classes))
+    for fact, duplicate_fact, k, duplicate_k in find_duplicate_facts(instance.facts, context_classes):
+        report_duplicate_facts(index, fact, duplicate_fact, error_log)
+
+def eba_2_17(index,error_log):
     """EBA 2.17 - The use of the @precision attribute is not permitted"""
-    for fact in instance.child_items:
-        if fact.precision:
-            precision_attr = fact.element.find_attribute('precision')
+    for i, has_precision in enumerate(index.item_has_precision):
+        if has_precision:
+            precision_attr = index.items[i].element.find_attribute('precision')
             detail_error = xbrl.Error.create('@decimals MUST be used as the only means for expressing precision on a fact. [FRIS 2.8.1.1, EFM13, p.6-12].', severity=xml.ErrorSeverity.INFO)
             main_error = xbrl.Error.create('[EBA.2.17] The use of the {precision} attribute is not permitted.', precision=precision_attr, children=[detail_error])
             error_log.report(main_error)
 
-def eba_2_19(instance,error_log):
+def eba_2_19(index,error_log):
     """EBA 2.19 - Guidance on use of zeros and non-reported data"""
-    for fact in instance.child_items:
-        if fact.xsi_nil:
+    for i, is_nil in enumerate(index.item_is_nil):
+        if is_nil:
+            fact = index.items[i]
             xsi_nil_attr = fact.element.find_attribute(('nil','http://www.w3.org/2001/XMLSchema-instance'))
             detail_error = xbrl.Error.create('The {xsi_nil} attribute MUST NOT be used in the instance.', xsi_nil=xsi_nil_attr, severity=xml.ErrorSeverity.INFO)
             main_error = xbrl.Error.create('[EBA.2.19] Guidance on use of zeros and non-reported data.', location=fact, children=[detail_error])
@@ -282,114 +2221,73 @@ def eba_2_19(instance,error_log):
 
 # Unit related rules
 
-def eba_2_21(instance,error_log):
+def eba_2_21(index,error_log):
     """EBA 2.21 - Duplicates of xbrli:xbrl/xbrli:unit"""
-    aspects_map = {}
-    for unit in instance.units:
-        duplicates = aspects_map.setdefault(xbrl.ConstraintSet(unit),[])
-        if duplicates:
+    for i, unit in enumerate(index.units):
+        first = index.unit_classes[i]
+        if first != i:
             detail_error1 = xbrl.Error.create('An XBRL instance SHOULD NOT, in general, contain duplicated units, unless required for technical reasons, e.g. to support XBRL streaming.', severity=xml.ErrorSeverity.INFO)
-            detail_error2 = xbrl.Error.create('Unit {unit} is a duplicate of unit {unit2}', unit=unit, unit2=duplicates[0], severity=xml.ErrorSeverity.OTHER)
+            detail_error2 = xbrl.Error.create('Unit {unit} is a duplicate of unit {unit2}', unit=unit, unit2=index.units[first], severity=xml.ErrorSeverity.OTHER)
             main_error = xbrl.Error.create('[EBA.2.21] Duplicates of xbrli:xbrl/xbrli:unit.', location=unit.element, children=[detail_error1,detail_error2], severity=xml.ErrorSeverity.WARNING)
             error_log.report(main_error)
-        else:
-            duplicates.append(unit)
 
-def eba_2_22(instance,error_log):
+def eba_2_22(index,error_log):
     """EBA 2.22 - Unused xbrli:xbrl/xbrli:unit"""
-    for unit in instance.units:
-        if not instance.facts.filter(unit):
+    for i, unit_id in enumerate(index.unit_ids):
+        if not index.is_unit_used(unit_id):
+            unit = index.units[i]
             detail_error = xbrl.Error.create('An XBRL instance SHOULD NOT contain unused xbrli:unit nodes. [FRIS04]', severity=xml.ErrorSeverity.INFO)
             main_error = xbrl.Error.create('[EBA.2.22] Unused xbrli:xbrl/xbrli:unit.', location=unit, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
             error_log.report(main_error)
 
-def eba_3_1(instance,error_log):
+def eba_3_1(index,error_log):
     """EBA 3.1 - Choice of Currency for Monetary facts"""
-    eba_dim_CCA = instance.dts.resolve_concept(xml.QName('CCA','http://www.eba.europa.eu/xbrl/crr/dict/dim'))
-    eba_dim_CUS = instance.dts.resolve_concept(xml.QName('CUS','http://www.eba.europa.eu/xbrl/crr/dict/dim'))
-    eba_CA_x1 = instance.dts.resolve_concept(xml.QName('x1','http://www.eba.europa.eu/xbrl/crr/dict/dom/CA'))
-
-    constraints = xbrl.ConstraintSet()
-    constraints[eba_dim_CCA] = eba_CA_x1
-    denomination_facts = instance.facts.filter(constraints)
-    for fact in denomination_facts:
-        if fact.concept.is_monetary():
-            aspect_values = fact.aspect_values
-            currency = aspect_values.get(eba_dim_CUS,None)
-            if currency and currency.value.name != aspect_values[xbrl.Aspect.UNIT].iso4217_currency:
-                detail_error = xbrl.Error.create('For facts falling under point (b), whose context also includes the dimension “Currency with significant liabilities” (CUS), the currency of the fact (i.e. unit) MUST be consistent with the value given for this dimension.', severity=xml.ErrorSeverity.INFO)
-                main_error = xbrl.Error.create('[EBA.3.1] Choice of Currency for Monetary fact {fact}.', fact=fact, children=[detail_error])
-                error_log.report(main_error)
+    for i in denomination_mismatches(index):
+        detail_error = xbrl.Error.create('For facts falling under point (b), whose context also includes the dimension “Currency with significant liabilities” (CUS), the currency of the fact (i.e. unit) MUST be consistent with the value given for this dimension.', severity=xml.ErrorSeverity.INFO)
+        main_error = xbrl.Error.create('[EBA.3.1] Choice of Currency for Monetary fact {fact}.', fact=index.items[i], children=[detail_error])
+        error_log.report(main_error)
 
-    monetary_units = []
-    for unit in instance.units:
-        if unit.aspect_value.is_monetary():
-            monetary_units.append(unit)
     # Optimization: Only do the single currency check if more than one monetary unit is present
-    if len(monetary_units) > 1:
-        single_unit = None
-        for fact in instance.child_items - denomination_facts:
-            if fact.concept.is_monetary():
-                if single_unit is None:
-                    single_unit = fact.unit
-                elif fact.unit != single_unit:
-                    detail_error = xbrl.Error.create('An instance MUST express all monetary facts which do not fall under point (b) using a single currency.', severity=xml.ErrorSeverity.INFO)
-                    main_error = xbrl.Error.create('[EBA.3.1] Choice of Currency for Monetary fact {fact}.', fact=fact, children=[detail_error])
-                    error_log.report(main_error)
-
-def eba_3_2(instance,error_log):
+    if index.unit_is_monetary.count(True) > 1:
+        for i in mixed_currency_items(index):
+            detail_error = xbrl.Error.create('An instance MUST express all monetary facts which do not fall under point (b) using a single currency.', severity=xml.ErrorSeverity.INFO)
+            main_error = xbrl.Error.create('[EBA.3.1] Choice of Currency for Monetary fact {fact}.', fact=index.items[i], children=[detail_error])
+            error_log.report(main_error)
+
+def eba_3_2(index,error_log):
     """EBA 3.2 - Non-monetary numeric units"""
-    for fact in instance.child_items:
-        if fact.concept.is_numeric() and not fact.concept.is_monetary():
-            if not fact.unit.aspect_value.is_pure():
-                detail_error = xbrl.Error.create('An instance MUST express its non-monetary numeric values using the “pure” unit, a unit element with a single measure element as its only child. The local part of the measure MUST be "pure" and the namespace prefix MUST resolve to the namespace: http://www.xbrl.org/2003/instance.', severity=xml.ErrorSeverity.INFO)
-                main_error = xbrl.Error.create('[EBA.3.2] Non-monetary numeric units.', location=fact, children=[detail_error])
-                error_log.report(main_error)
+    for i in non_pure_items(index):
+        detail_error = xbrl.Error.create('An instance MUST express its non-monetary numeric values using the “pure” unit, a unit element with a single measure element as its only child. The local part of the measure MUST be "pure" and the namespace prefix MUST resolve to the namespace: http://www.xbrl.org/2003/instance.', severity=xml.ErrorSeverity.INFO)
+        main_error = xbrl.Error.create('[EBA.3.2] Non-monetary numeric units.', location=index.items[i], children=[detail_error])
+        error_log.report(main_error)
 
-def eba_3_4(instance,error_log):
+def eba_3_4(instance,prefix_usage_collector,error_log):
     """EBA 3.4 - Unused namespace prefixes"""
-    used_prefixes = set()
-    for elem in dfs(instance.document_element):
-        used_prefixes.add(elem.prefix)
-        val = elem.schema_actual_value
-        if isinstance(val,xsd.QName):
-            used_prefixes.add(val.prefix)
-        for attr in elem.attributes:
-            used_prefixes.add(attr.prefix)
-            val = attr.schema_actual_value
-            if isinstance(val,xsd.QName):
-                used_prefixes.add(val.prefix)
-
+    used_prefixes = prefix_usage_collector.used_prefixes
     for nsattr in instance.document_element.namespace_attributes:
         if nsattr.local_name != 'xmlns' and nsattr.local_name not in used_prefixes:
             detail_error = xbrl.Error.create('Namespace prefixes that are not used SHOULD not be declared in the instance document. [FRIS04]', severity=xml.ErrorSeverity.INFO)
             main_error = xbrl.Error.create('[EBA.3.4] Unused namespace prefix {prefix}.', prefix=nsattr, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
             error_log.report(main_error)
 
-def eba_3_5(instance,error_log):
+def eba_3_5(instance,taxonomy_tables,error_log):
     """EBA 3.5 - Re-use of canonical namespace prefixes"""
-    namespace_bindings = {}
-    for schema in instance.dts.taxonomy_schemas:
-        for nsattr in schema.element.namespace_attributes:
-            if nsattr.local_name != 'xmlns' and nsattr.normalized_value == schema.target_namespace:
-                namespace_bindings[schema.target_namespace] = nsattr.local_name
-                break
-
+    namespace_bindings = taxonomy_tables.namespace_bindings
     for nsattr in instance.document_element.namespace_attributes:
         if nsattr.local_name != 'xmlns' and nsattr.local_name != namespace_bindings.get(nsattr.normalized_value,nsattr.local_name):
                 detail_error = xbrl.Error.create('Namespace prefixes, where used in instance documents, SHOULD mirror the namespace prefixes as defined by their schema author(s). [FRIS04]', severity=xml.ErrorSeverity.INFO)
                 main_error = xbrl.Error.create('[EBA.3.5] Re-use of canonical namespace prefix {prefix}.', prefix=nsattr, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
                 error_log.report(main_error)
 
-def eba_3_6(instance,error_log):
+def eba_3_6(index,error_log):
     """EBA 3.6 - LEI and other entity codes"""
-    for context in instance.contexts:
-        if context.entity_identifier_aspect_value.scheme == 'http://standard.iso.org/iso/17442':
+    for i, scheme in enumerate(index.context_schemes):
+        if scheme == 'http://standard.iso.org/iso/17442':
             detail_error = xbrl.Error.create('Producers of instance documents are encouraged to switch as quickly as possible to producing the correct form “http://standards.iso.org/iso/17442”.', severity=xml.ErrorSeverity.INFO)
-            main_error = xbrl.Error.create('[EBA.3.6] LEI and other entity codes.', location=context.entity.identifier, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
+            main_error = xbrl.Error.create('[EBA.3.6] LEI and other entity codes.', location=index.contexts[i].entity.identifier, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
             error_log.report(main_error)
 
-def eba_3_7(instance,error_log):
+def eba_3_7(instance,index,error_log):
     """EBA 3.7 - Unused @id attribute on facts"""
     # Inside the instance facts can only be referenced by id from footnote locators
     used_ids = set()
@@ -400,32 +2298,28 @@ def eba_3_7(instance,error_log):
             if '(' not in fragment:
                 used_ids.add(fragment)
 
-    for fact in instance.child_items:
-        if fact.id and fact.id not in used_ids:
-            id_attr = fact.element.find_attribute('id')
+    for i, fact_id in enumerate(index.item_ids):
+        if fact_id and fact_id not in used_ids:
+            id_attr = index.items[i].element.find_attribute('id')
             detail_error = xbrl.Error.create('The instance SHOULD NOT include unused @id attributes on facts.', severity=xml.ErrorSeverity.INFO)
             main_error = xbrl.Error.create('[EBA.3.7] Unused {id} attribute on fact.', id=id_attr, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
             error_log.report(main_error)
 
-def eba_3_8(instance,params,error_log):
+def eba_3_8(index,params,error_log):
     """EBA 3.8 - Length of strings in instance"""
     max_string_length = int(params.get('max-string-length',100))
-    for fact in instance.child_items:
-        val = fact.element.schema_actual_value
-        if isinstance(val,xsd.string) and len(val.value) > max_string_length:
+    for i, string_length in enumerate(index.item_string_lengths):
+        if string_length > max_string_length:
             detail_error = xbrl.Error.create('The values of each string SHOULD be as short as possible.', severity=xml.ErrorSeverity.INFO)
-            main_error = xbrl.Error.create('[EBA.3.8] Length of strings in instance.', location=fact, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
+            main_error = xbrl.Error.create('[EBA.3.8] Length of strings in instance.', location=index.items[i], children=[detail_error], severity=xml.ErrorSeverity.WARNING)
             error_log.report(main_error)
 
-def eba_3_9(instance,error_log):
+def eba_3_9(nested_namespace_collector,error_log):
     """EBA 3.9 - Namespace prefix declarations restricted to the document element"""
-    elements = dfs(instance.document_element)
-    next(elements)  # skip document element
-    for elem in elements:
-        for nsattr in elem.namespace_attributes:
-            detail_error = xbrl.Error.create('Namespace prefixes declarations SHOULD be restricted to the document element.', severity=xml.ErrorSeverity.INFO)
-            main_error = xbrl.Error.create('[EBA.3.9] Namespace prefix declaration {prefix} restricted to the document element.', prefix=nsattr, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
-            error_log.report(main_error)
+    for nsattr in nested_namespace_collector.namespace_attributes:
+        detail_error = xbrl.Error.create('Namespace prefixes declarations SHOULD be restricted to the document element.', severity=xml.ErrorSeverity.INFO)
+        main_error = xbrl.Error.create('[EBA.3.9] Namespace prefix declaration {prefix} restricted to the document element.', prefix=nsattr, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
+        error_log.report(main_error)
 
 def eba_3_10(instance,error_log):
     """EBA 3.10 - Avoid multiple prefix declarations for the same namespace"""
@@ -436,21 +2330,77 @@ def eba_3_10(instance,error_log):
             main_error = xbrl.Error.create('[EBA.3.10] Avoid multiple prefix declarations {prefix} and {prefix2} for the same namespace {namespace}.', prefix=nsattr, prefix2=used_namespaces[nsattr.normalized_value], namespace=nsattr.normalized_value, children=[detail_error], severity=xml.ErrorSeverity.WARNING)
             error_log.report(main_error)
 
-def check_eba_filing_rules(job, instance):
+def check_eba_filing_rules(job, instance, error_log=None):
     """Check additional EBA filing rules"""
     catalog = job.catalog
     params = job.script_params
-    error_log = job.error_log
+    error_log = error_log or job.error_log
+    # Select the rules to run and only prepare what these rules need
+    plan = ExecutionPlan.from_params(params)
+    rules = RuleRunner.from_params(error_log, params, plan=plan)
+    fact_table = FactTableWriter.from_params(params)
+
+    # The instance document as read by the result cache, the lexical pre-scan and the incremental fingerprints
+    path = instance_path(instance.uri) if instance.uri else None
+    document = InstanceDocument(path, random_access=bool(plan.rules & set(LexicalPrescan.RULES))) if path else None
+
+    # Replay the findings of an earlier validation of the same instance with the same settings
+    result_cache = ResultCache.from_params(params)
+    cache_key = result_cache.key(document, instance, job.options, params) if result_cache and document else None
+    if cache_key:
+        if rules.prepare('result-cache', result_cache.replay, cache_key, instance, error_log):
+            if fact_table:
+                # Replayed findings need no index, so the fact table is indexed on its own
+                index = rules.prepare('instance-index', InstanceIndex, instance, frozenset((INDEX_FACT_TABLE,)), visited=lambda index: len(index.contexts) + len(index.units) + len(index.items))
+                rules.prepare('fact-table', fact_table.write, index, instance.uri, visited=lambda rows: rows)
+            if rules.instrument:
+                write_rule_stats(instance,params,rules.stats)
+            return
+        rules.error_log = RecordingErrorLog(error_log)
+
+    # Skip the document level syntax rules which a lexical scan of the instance document proves to have no findings.
+    # RaptorXML only calls the script once it has loaded and validated the instance, so the scan cannot reject a
+    # filing before XBRL validation, it only saves the work of these rules.
+    if document and plan.rules & set(LexicalPrescan.RULES):
+        try:
+            prescan = rules.prepare('lexical-prescan', LexicalPrescan, document)
+            plan = rules.plan = ExecutionPlan(plan.rules - prescan.clean_rules(), plan.replayed)
+        except (OSError, ValueError):
+            pass
+
+    # Only rerun the rules whose input changed since the previous validation of this filing
+    incremental = None
+    if params.get('incremental-state'):
+        incremental = rules.prepare('instance-fingerprints', IncrementalValidation.from_params, document, instance, job.options, params)
+    if incremental:
+        plan = rules.plan = incremental.plan(plan)
+        rules.replays = incremental.replays(instance)
+        rules.recorded = {}
+
+    # Collect everything the document level rules (2.1, 3.4 and 3.9) need in a single traversal of the instance document
+    walker = DocumentWalker()
+    xml_base_collector = XmlBaseCollector(walker) if COLLECT_XML_BASE in plan.needs else None
+    prefix_usage_collector = PrefixUsageCollector(walker) if COLLECT_PREFIX_USAGE in plan.needs else None
+    nested_namespace_collector = NestedNamespaceCollector(walker) if COLLECT_NESTED_NAMESPACES in plan.needs else None
+    if xml_base_collector or prefix_usage_collector or nested_namespace_collector:
+        rules.prepare('document-walk', walker.walk, instance.document_element, visited=lambda result: walker.element_count)
+    # Sweep contexts, units and facts once and share the resulting tables between all context, unit and fact rules
+    index_parts = (plan.index_parts | {INDEX_FACT_TABLE}) if fact_table else plan.index_parts
+    index = rules.prepare('instance-index', InstanceIndex, instance, index_parts, visited=lambda index: len(index.contexts) + len(index.units) + index.fact_count)
+    # Lookup tables derived from the taxonomy (1.6 and 3.5), cached per entry point
+    taxonomy_tables = None
+    if LOAD_TAXONOMY_TABLES in plan.needs:
+        taxonomy_tables = rules.prepare('taxonomy-tables', get_taxonomy_tables, instance, job.options, params)
 
     # 1. Filing syntax rules
     # 1.1 - Filing naming
     # Needs to be implemented on a per authority basis!
     # 1.4 - Character encoding of XBRL instance documents
-    eba_1_4(instance,error_log)
+    rules.run('1.4', eba_1_4, instance)
     # 1.5 - Taxonomy entry point selection
     # Needs to be implemented on a per authority basis!
     # 1.6 - Filing indicators
-    eba_1_6(instance,error_log)
+    rules.run('1.6', eba_1_6, instance, taxonomy_tables)
     # 1.7 - Implication of no facts for an indicated template
     # Cannot be checked automatically!
 
@@ -461,103 +2411,141 @@ def check_eba_filing_rules(job, instance):
     # 1.12 - Completeness of the instance
     # Cannot be checked automatically!
     # 1.13 - Standalone Document Declaration
-    eba_1_13(instance,error_log)
+    rules.run('1.13', eba_1_13, instance)
     # 1.14 - @xsd:schemaLocation and @xsd:noNamespaceSchemaLocation
-    eba_1_14(instance,error_log)
+    rules.run('1.14', eba_1_14, instance)
     # 1.15 - XInclude
-    eba_1_15(instance,job.options,error_log)
+    rules.run('1.15', eba_1_15, instance, job.options)
 
     # 2. Instance syntax rules
     # 2.1 — The existence of xml:base is not permitted
-    eba_2_1(instance,error_log)
+    rules.run('2.1', eba_2_1, xml_base_collector, visited=walker.element_count)
     # 2.2 - The absolute URL has to be stated for the link:schemaRef element
-    eba_2_2(instance,error_log)
+    rules.run('2.2', eba_2_2, instance)
     # 2.3 - Only one link:schemaRef element is allowed per instance document
-    eba_2_3(instance,error_log)
+    rules.run('2.3', eba_2_3, instance)
     # 2.4 - The use of link:linkbaseRef elements is not permitted
-    eba_2_4(instance,error_log)
+    rules.run('2.4', eba_2_4, instance)
     # 2.5 - XML comments and documentation are ignored by EBA
     # Cannot be checked automatically!
     # 2.25 - XBRL footnotes are ignored by EBA
-    eba_2_25(instance,error_log)
+    rules.run('2.25', eba_2_25, instance)
 
     # Context related rules
 
     # 2.6 - The length of the @id attribute should be limited to the necessary characters
-    eba_2_6(instance,params,error_log)
+    rules.run('2.6', eba_2_6, index, params, visited=len(index.contexts))
     # 2.7 - No unused or duplicated xbrli:context nodes
-    eba_2_7(instance,error_log)
+    rules.run('2.7', eba_2_7, index, visited=len(index.contexts))
     # 2.8 — Identification of the reporting entity
     # Cannot be checked automatically!
     # 2.9 - Single reporter per instance
-    eba_2_9(instance,error_log)
+    rules.run('2.9', eba_2_9, index, visited=len(index.contexts))
     # 2.10 - The xbrli:period date elements reported must be valid
-    eba_2_10(instance,error_log)
+    rules.run('2.10', eba_2_10, index, visited=len(index.contexts))
     # 2.11 - The existence of xbrli:forever is not permitted
-    eba_2_11(instance,error_log)
+    rules.run('2.11', eba_2_11, index, visited=len(index.contexts))
     # 2.13 - XBRL period consistency
-    eba_2_13(instance,error_log)
+    rules.run('2.13', eba_2_13, index, visited=len(index.contexts))
     # 2.14 - The existence of xbrli:segment is not permitted
-    eba_2_14(instance,error_log)
+    rules.run('2.14', eba_2_14, index, visited=len(index.contexts))
     # 2.15 - Restrictions on the use of the xbrli:scenario element
-    eba_2_15(instance,error_log)
+    rules.run('2.15', eba_2_15, index, visited=len(index.contexts))
 
     # Fact related rules
 
     # 2.16 - Duplicate (Redundant/Inconsistent) facts
-    eba_2_16(instance,error_log)
+    rules.run('2.16', incremental.eba_2_16 if incremental else eba_2_16, instance, index, visited=lambda: len(instance.facts))
     # 2.17 - The use of the @precision attribute is not permitted
-    eba_2_17(instance,error_log)
+    rules.run('2.17', eba_2_17, index, visited=len(index.items))
     # 2.18 - Interpretation of the @decimals attribute
     # Cannot be checked automatically!
     # 2.19 - Guidance on use of zeros and non-reported data
-    eba_2_19(instance,error_log)
+    rules.run('2.19', eba_2_19, index, visited=len(index.items))
     # 2.20 - Information on the use of the xml:lang attribute
     # Cannot be checked automatically!
 
     # Unit related rules
 
     # 2.21 - Duplicates of xbrli:xbrl/xbrli:unit
-    eba_2_21(instance,error_log)
+    rules.run('2.21', eba_2_21, index, visited=len(index.units))
     # 2.22 - Unused xbrli:xbrl/xbrli:unit
-    eba_2_22(instance,error_log)
+    rules.run('2.22', eba_2_22, index, visited=len(index.units))
     # 2.23 - Reference xbrli:unit to XBRL International Unit Type Registry (UTR)
     # Already checked by the XBRL validator
     # 2.24 - Report of the actual physical value of monetary items (see also 3.3)
     # This should be already checked by XBRL 2.1 validation as monetary fact items must only reference units with a single ISO 4217 currency measure.
     # 3.1 - Choice of Currency for Monetary facts
-    eba_3_1(instance,error_log)
+    rules.run('3.1', eba_3_1, index, visited=len(index.items))
     # 3.2 - Non-monetary numeric units
-    eba_3_2(instance,error_log)
+    rules.run('3.2', eba_3_2, index, visited=len(index.items))
     # 3.3 - Decimal representation
     # Cannot be checked automatically!
 
     # 3. Additional Guidance
 
     # 3.4 Unused namespace prefixes
-    eba_3_4(instance,error_log)
+    rules.run('3.4', eba_3_4, instance, prefix_usage_collector, visited=walker.element_count)
     # 3.5 Re-use of canonical namespace prefixes
-    eba_3_5(instance,error_log)
+    rules.run('3.5', eba_3_5, instance, taxonomy_tables)
     # 3.6 - LEI and other entity codes
-    eba_3_6(instance,error_log)
+    rules.run('3.6', eba_3_6, index, visited=len(index.contexts))
     # 3.7 - Unused @id attribute on facts
-    eba_3_7(instance,error_log)
+    rules.run('3.7', eba_3_7, instance, index, visited=len(index.items))
     # 3.8 - Length of strings in instance
-    eba_3_8(instance,params,error_log)
+    rules.run('3.8', eba_3_8, index, params, visited=len(index.items))
     # 3.9 - Namespace prefix declarations restricted to the document element
-    eba_3_9(instance,error_log)
+    rules.run('3.9', eba_3_9, nested_namespace_collector, visited=walker.element_count)
     # 3.10 - Avoid multiple prefix declarations for the same namespace
-    eba_3_10(instance,error_log)
+    rules.run('3.10', eba_3_10, instance)
+
+    # Export the normalized fact table from the same index the rules used
+    if fact_table:
+        rules.prepare('fact-table', fact_table.write, index, instance.uri, visited=lambda rows: rows)
+
+    if cache_key:
+        result_cache.store(cache_key, instance, rules.error_log.errors)
+    if incremental and not rules.limited and not rules.stopped:
+        incremental.save(instance, index, rules.recorded)
+    if rules.instrument:
+        write_rule_stats(instance,params,rules.stats)
 
 def on_xbrl_finished_dts(job, dts):
     # EBA 2.23 - Reference xbrli:unit to XBRL International Unit Type Registry (UTR)
     job.options['utr'] = True   # Enable UTR validation
 
+def check_lexical_rules(job):
+    """Returns the findings of the selected document level syntax rules for the input documents of a job whose instance could not be loaded."""
+    try:
+        plan = ExecutionPlan.from_params(job.script_params)
+    except ValueError:
+        return []
+    errors = []
+    for uri in getattr(job, 'input_filenames', None) or []:
+        path = instance_path(uri)
+        if not path:
+            continue
+        try:
+            prescan = LexicalPrescan(InstanceDocument(path))
+        except (OSError, ValueError):
+            continue
+        errors.extend(error for rule, error in prescan.errors(uri) if rule in plan)
+    return errors
+
 # Main entry point, will be called by RaptorXML after the XBRL instance validation job has finished
 def on_xbrl_finished(job, instance):
     # instance object will be None if XBRL 2.1 validation was not successful
+    findings = FindingsWriter.from_params(job.script_params, instance.uri if instance is not None else None)
     if instance is not None:
-        check_eba_filing_rules(job, instance)
+        if findings:
+            # Stream the findings as they are reported instead of only collecting them in the job's error log
+            forward = job.script_params.get('findings-only','false').lower() not in ('true','yes','1')
+            try:
+                check_eba_filing_rules(job, instance, FindingsErrorLog(job.error_log, findings, instance.document_element, forward))
+            finally:
+                findings.close()
+        else:
+            check_eba_filing_rules(job, instance)
     else:
         # EBA 1.9 - Valid XML-XBRL.
         xbrl_errors = [xbrl.Error.create('Instance documents MUST be XBRL 2.1 and XBRL Dimensions 1.0 valid. [EFM11, p. 6-8]', severity=xml.ErrorSeverity.INFO)]
@@ -565,3 +2553,12 @@ def on_xbrl_finished(job, instance):
         main_error = xbrl.Error.create('[EBA.1.9] Valid XML-XBRL.', children=xbrl_errors)
         job.error_log.clear()
         job.error_log.report(main_error)
+        if findings:
+            findings.write(findings.record(main_error, None))
+        # The document level syntax rules only need the instance document's text, so they are still checked
+        for error in check_lexical_rules(job):
+            job.error_log.report(error)
+            if findings:
+                findings.write(findings.record(error, None))
+        if findings:
+            findings.close()
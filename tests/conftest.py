@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.join(ROOT_DIR, 'benchmarks')
+
+# The scripts are not installed as a package, and eba_validation.py runs on the stand-in for the RaptorXML Python API
+for path in (ROOT_DIR, BENCHMARKS_DIR, os.path.join(BENCHMARKS_DIR, 'altova_stub')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,47 @@
+"""Checks that eba_batch.py reports the findings of both engines."""
+
+import os
+import stat
+import sys
+
+import eba_batch
+import eba_streaming
+from generate_instance import InstanceGenerator
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Stand-in for the RaptorXML+XBRL executable, which runs eba_validation.py on the RaptorXML Python API stand-in
+RAPTORXML = '''#!{python}
+import sys
+sys.path[:0] = {path!r}
+import altova_api.v2.xml as xml
+import altova_api.v2.xbrl as xbrl
+import eba_validation
+
+class Job:
+    def __init__(self, script_params):
+        self.catalog = None
+        self.script_params = script_params
+        self.options = {{}}
+        self.error_log = xml.ErrorLog()
+
+params = dict(arg[len('--script-param='):].split(':', 1) for arg in sys.argv if arg.startswith('--script-param='))
+job = Job(params)
+instance, _ = xbrl.Instance.create_from_url(sys.argv[-1])
+eba_validation.on_xbrl_finished(job, instance)
+for error in job.error_log.errors:
+    print(error)
+'''
+
+def test_raptorxml_findings(tmp_path):
+    path = str(tmp_path / 'instance.xbrl')
+    InstanceGenerator(contexts=20, facts=200, units=2, violations={'2.16': 0.05, '2.19': 0.05, '3.6': 0.05}, seed=1).write(path)
+    raptorxml = tmp_path / 'raptorxmlxbrl'
+    raptorxml.write_text(RAPTORXML.format(python=sys.executable, path=[ROOT_DIR, os.path.join(ROOT_DIR, 'benchmarks', 'altova_stub')]))
+    raptorxml.chmod(raptorxml.stat().st_mode | stat.S_IXUSR)
+    [result] = eba_batch.run_batch([path], engine='raptorxml', workers=1, raptorxml=str(raptorxml))
+    assert result.failure is None and result.has_errors
+    streaming = eba_streaming.StreamingValidator().validate_file(path)
+    assert {(finding.rule, finding.severity) for finding in result.findings} == {(finding.rule, finding.severity) for finding in streaming}
+    # The findings are only reported once
+    assert result.output == ''
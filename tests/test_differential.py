@@ -0,0 +1,155 @@
+"""Checks that eba_validation.py, eba_streaming.py and eba_sharded.py report the same findings on synthetic instances."""
+
+import collections
+import json
+
+import pytest
+
+import altova_api.v2.xml as xml
+import altova_api.v2.xbrl as xbrl
+
+import eba_sharded
+import eba_streaming
+import eba_validation
+from generate_instance import VIOLATIONS, InstanceGenerator
+
+# Rules which eba_streaming.py only approximates or only checks with taxonomy tables (see its header)
+APPROXIMATED_RULES = {'1.6.3', '3.1', '3.2', '3.4', '3.5', '3.8'}
+# Rules about the instance document as a whole, for which the engines report different location ids
+DOCUMENT_RULES = {'1.4', '1.13', '1.14', '1.15', '2.1', '2.2', '2.3', '2.4', '2.25', '3.9', '3.10'}
+
+INSTANCES = {
+    'clean': {},
+    'all-violations': {rule: 0.01 for rule in VIOLATIONS},
+    'duplicate-contexts': {'2.7-duplicate': 0.05, '2.16': 0.01, '2.16.1': 0.01, '2.16-context': 0.02},
+    'inherited-language': {'2.16': 0.01, '2.16-lang': 0.1},
+}
+
+class Job:
+    """Stand-in for the RaptorXML job object passed to the script entry points."""
+
+    def __init__(self, script_params=None):
+        self.catalog = None
+        self.script_params = dict(script_params or {})
+        self.options = {}
+        self.error_log = xml.ErrorLog()
+
+def finding_key(rule, severity, ids):
+    if rule in DOCUMENT_RULES:
+        return (rule, severity)
+    return (rule, severity, ids.get('concept'), ids.get('context'), ids.get('unit'))
+
+def shared_findings(records):
+    return collections.Counter(finding_key(rule, severity, ids) for rule, severity, ids in records if rule not in APPROXIMATED_RULES)
+
+def validation_findings(path):
+    """Returns the findings of eba_validation.py as the flat records of its findings output, which have the same ids as those of eba_streaming.py."""
+    instance, _ = xbrl.Instance.create_from_url(path)
+    findings_path = path + '.findings.jsonl'
+    eba_validation.on_xbrl_finished(Job({'findings-output': findings_path}), instance)
+    with open(findings_path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    return [(record['rule'], record['severity'], record['ids']) for record in records]
+
+@pytest.fixture(scope='module', params=sorted(INSTANCES))
+def instance_path(request, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('instances') / ('%s.xbrl' % request.param))
+    InstanceGenerator(contexts=100, facts=1000, units=4, namespaces=2, footnotes=10, violations=INSTANCES[request.param], seed=1).write(path)
+    return path
+
+def test_streaming_matches_validation(instance_path):
+    streaming = [(finding.rule, finding.severity, finding.ids) for finding in eba_streaming.StreamingValidator().validate_file(instance_path)]
+    assert shared_findings(streaming) == shared_findings(validation_findings(instance_path))
+
+def test_duplicate_facts_in_duplicate_contexts(tmp_path):
+    # Facts repeated in a duplicate of their context are duplicates of the facts in the original context
+    path = str(tmp_path / 'instance.xbrl')
+    InstanceGenerator(contexts=10, facts=100, units=2, violations={'2.16-context': 0.05}, seed=1).write(path)
+    validation = sorted(ids['context'] for rule, severity, ids in validation_findings(path) if rule == '2.16')
+    streaming = sorted(finding.ids['context'] for finding in eba_streaming.StreamingValidator().validate_file(path) if finding.rule == '2.16')
+    assert len(validation) == 5 and all(context.startswith('dupf') for context in validation)
+    assert streaming == validation
+    assert sorted(finding.ids['context'] for finding in eba_sharded.validate_sharded(path, 1, 3) if finding.rule == '2.16') == validation
+
+def test_duplicate_facts_with_inherited_language(tmp_path):
+    # Facts inherit the xml:lang of the document element, so a fact which repeats it explicitly is a duplicate
+    path = str(tmp_path / 'instance.xbrl')
+    InstanceGenerator(contexts=10, facts=100, units=2, violations={'2.16-lang': 0.2}, seed=1).write(path)
+    validation = sorted(ids['concept'] for rule, severity, ids in validation_findings(path) if rule == '2.16')
+    streaming = sorted(finding.ids['concept'] for finding in eba_streaming.StreamingValidator().validate_file(path) if finding.rule == '2.16')
+    assert validation and streaming == validation
+    assert sorted(finding.ids['concept'] for finding in eba_sharded.validate_sharded(path, 1, 3) if finding.rule == '2.16') == validation
+
+def test_document_rule_details(tmp_path):
+    # Both engines describe the encoding (1.4) and standalone declaration (1.13) findings with the same details
+    path = str(tmp_path / 'instance.xbrl')
+    InstanceGenerator(contexts=10, facts=100, units=2, seed=1).write(path)
+    with open(path, encoding='utf-8') as f:
+        text = f.read().replace('encoding="UTF-8"?>', 'encoding="ISO-8859-1" standalone="yes"?>', 1)
+    with open(path, 'w', encoding='iso-8859-1') as f:
+        f.write(text)
+    instance, _ = xbrl.Instance.create_from_url(path)
+    findings_path = path + '.findings.jsonl'
+    eba_validation.on_xbrl_finished(Job({'findings-output': findings_path}), instance)
+    with open(findings_path, encoding='utf-8') as f:
+        validation = {record['rule']: record['detail'] for record in map(json.loads, f) if record['rule'] in ('1.4', '1.13')}
+    streaming = {finding.rule: finding.detail for finding in eba_streaming.StreamingValidator().validate_file(path) if finding.rule in ('1.4', '1.13')}
+    assert 'UTF-8' in validation['1.4'] and 'standalone' in validation['1.13']
+    assert streaming == validation
+
+@pytest.mark.parametrize('workers, shards', [(1, 1), (1, 3), (1, 50), (2, 5)])
+def test_sharded_matches_streaming(instance_path, workers, shards):
+    expected = eba_streaming.StreamingValidator().validate_file(instance_path)
+    assert eba_sharded.validate_sharded(instance_path, workers, shards) == expected
+
+def test_columnar_unit_rules_match_loops(tmp_path, monkeypatch):
+    # The currency and unit rules (3.1, 3.2) report the same findings with and without NumPy
+    pytest.importorskip('numpy')
+    path = str(tmp_path / 'instance.xbrl')
+    InstanceGenerator(contexts=100, facts=1000, units=4, violations={'3.1': 0.02, '3.2': 0.02, '2.16.1': 0.02}, seed=1).write(path)
+    instance, _ = xbrl.Instance.create_from_url(path)
+    def unit_findings():
+        findings_path = str(tmp_path / 'findings.jsonl')
+        eba_validation.on_xbrl_finished(Job({'findings-output': findings_path, 'rules': '3.1,3.2'}), instance)
+        with open(findings_path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+    columnar = unit_findings()
+    monkeypatch.setattr(eba_validation, 'numpy', None)
+    loops = unit_findings()
+    assert {record['rule'] for record in columnar} == {'3.1', '3.2'}
+    assert len({record['detail'] for record in columnar if record['rule'] == '3.1'}) == 2
+    assert columnar == loops
+
+def test_sharded_layout(tmp_path):
+    # Shards start at items which are children of the document element, after the filing indicators
+    path = str(tmp_path / 'instance.xbrl')
+    InstanceGenerator(contexts=10, facts=100, units=2, seed=1).write(path)
+    layout = eba_sharded.DocumentLayout.scan(path, 4)
+    with open(path, 'rb') as f:
+        data = f.read()
+    assert data[layout.prolog_end - 1:layout.prolog_end] == b'>' and layout.root_name == b'xbrli:xbrl'
+    assert data.rfind(b'</find:fIndicators>', 0, layout.head_end) > 0
+    assert len(layout.shards) == 4 and layout.shards[0][0] == layout.head_end and layout.shards[-1][1] == data.rindex(b'</xbrli:xbrl>')
+    assert all(data[start:start + 9] == b'<eba_met:' for start, end in layout.shards)
+
+def rewrite_facts(path, rewrite):
+    """Rewrites the lines of the facts after the filing indicators with rewrite(lines)."""
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    first = lines.index('</find:fIndicators>\n') + 1
+    last = lines.index('</xbrli:xbrl>\n')
+    lines[first:last] = rewrite(lines[first:last])
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(lines)
+
+@pytest.mark.parametrize('layout', ['interleaved-context', 'tuple'])
+def test_sharded_falls_back_to_sequential(tmp_path, layout):
+    # Contexts after facts and items nested in tuples are checked sequentially, with the same findings
+    path = str(tmp_path / 'instance.xbrl')
+    InstanceGenerator(contexts=20, facts=400, units=2, violations={'2.16': 0.02, '3.1': 0.02}, seed=1).write(path)
+    if layout == 'interleaved-context':
+        rewrite_facts(path, lambda facts: facts[:200] + ['<xbrli:context id="late"><xbrli:entity><xbrli:identifier scheme="http://standards.iso.org/iso/17442">529900T8BM49AURSDO55</xbrli:identifier></xbrli:entity><xbrli:period><xbrli:instant>2016-12-31</xbrli:instant></xbrli:period></xbrli:context>\n'] + facts[200:])
+    else:
+        rewrite_facts(path, lambda facts: facts[:100] + ['<eba_met:tuple>\n'] + facts[100:300] + ['</eba_met:tuple>\n'] + facts[300:])
+    expected = eba_streaming.StreamingValidator().validate_file(path)
+    assert eba_sharded.validate_sharded(path, 1, 8) == expected
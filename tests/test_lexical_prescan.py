@@ -0,0 +1,38 @@
+"""Checks which document level syntax rules the lexical pre-scan of eba_validation.py proves clean."""
+
+import pytest
+
+import eba_validation
+
+DOCUMENT = '''<?xml version="1.0" encoding="{encoding}"?>
+<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:link="http://www.xbrl.org/2003/linkbase" xmlns:xlink="http://www.w3.org/1999/xlink">
+<link:schemaRef xlink:type="simple" xlink:href="http://www.eba.europa.eu/eu/fr/xbrl/crr/fws/corep/its-2014-05/2015-02-16/mod/corep_con.xsd"/>
+<xbrli:unit id="pure" xml:base="http://example.com/"><xbrli:measure>xbrli:pure</xbrli:measure></xbrli:unit>
+</xbrli:xbrl>
+'''
+
+def prescan(tmp_path, data):
+    path = tmp_path / 'instance.xbrl'
+    path.write_bytes(data)
+    return eba_validation.LexicalPrescan(eba_validation.InstanceDocument(str(path)))
+
+def test_utf8_document(tmp_path):
+    scan = prescan(tmp_path, DOCUMENT.format(encoding='UTF-8').encode('utf-8'))
+    assert scan.complete
+    assert scan.clean_rules() == set(eba_validation.LexicalPrescan.RULES) - {'2.1'}
+
+@pytest.mark.parametrize('encoding', ['utf-16-le', 'utf-16-be', 'utf-16', 'utf-32-le'])
+def test_utf16_and_utf32_documents_are_not_filtered(tmp_path, encoding):
+    # With or without byte order mark, the rules themselves must check these documents
+    scan = prescan(tmp_path, DOCUMENT.format(encoding='UTF-16').encode(encoding))
+    assert not scan.complete and scan.clean_rules() == set()
+    assert scan.encoding.upper() != 'UTF-8'
+
+def test_nul_bytes_stop_the_scan(tmp_path):
+    scan = prescan(tmp_path, DOCUMENT.format(encoding='UTF-8').encode('utf-8').replace(b'<xbrli:unit', b'<xbrli:unit\x00'))
+    assert not scan.complete and scan.clean_rules() == set()
+
+def test_declared_encoding_which_is_not_ascii_compatible(tmp_path):
+    scan = prescan(tmp_path, DOCUMENT.format(encoding='x-unknown').encode('utf-8'))
+    assert not scan.complete and scan.clean_rules() == set()
+    assert scan.encoding == 'x-unknown'
@@ -0,0 +1,66 @@
+"""Checks that the result cache of eba_validation.py only scans its directory when the size estimate requires it."""
+
+import os
+
+import pytest
+
+import eba_validation
+
+@pytest.fixture
+def listings(monkeypatch):
+    """Counts the listings of the cache directory."""
+    calls = []
+    listdir = os.listdir
+    def counting_listdir(path):
+        calls.append(path)
+        return listdir(path)
+    monkeypatch.setattr(eba_validation.os, 'listdir', counting_listdir)
+    return calls
+
+def entries(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+
+def sizes(directory):
+    with open(os.path.join(directory, eba_validation.ResultCache.SIZES_FILE), encoding='ascii') as f:
+        return [int(line) for line in f]
+
+def test_writes_below_the_limit_do_not_scan(tmp_path, listings):
+    cache = eba_validation.ResultCache(str(tmp_path), 1024 * 1024)
+    for i in range(10):
+        cache.store('%064x' % i, None, [])
+    # Only the first write scans, to find the total of entries written before the sizes file existed
+    assert len(listings) == 1
+    assert len(entries(str(tmp_path))) == 10
+    assert sum(sizes(str(tmp_path))) == sum(os.path.getsize(str(tmp_path / name)) for name in entries(str(tmp_path)))
+
+def test_scan_every_interval(tmp_path, listings):
+    cache = eba_validation.ResultCache(str(tmp_path), 1024 * 1024)
+    cache.SCAN_INTERVAL = 3
+    for i in range(10):
+        cache.store('%064x' % i, None, [])
+    # Writes 1, 4, 7 and 10 scan, the last one restarts the sizes file with the total
+    assert len(listings) == 4
+    assert len(sizes(str(tmp_path))) == 1
+
+def test_estimate_over_the_limit_evicts(tmp_path, listings):
+    cache = eba_validation.ResultCache(str(tmp_path), 1024 * 1024)
+    cache.store('%064x' % 0, None, [])
+    entry_size = os.path.getsize(cache.path('%064x' % 0))
+    cache.max_size = 3 * entry_size
+    for i in range(1, 10):
+        os.utime(cache.path('%064x' % (i - 1)), (i, i))
+        cache.store('%064x' % i, None, [])
+    # The least recently used entries are removed once the estimate exceeds the limit
+    assert entries(str(tmp_path)) == ['%064x.json' % i for i in (7, 8, 9)]
+    assert sum(sizes(str(tmp_path))) == 3 * entry_size
+
+def test_existing_entries_are_counted(tmp_path):
+    # A cache directory written before the sizes file existed
+    cache = eba_validation.ResultCache(str(tmp_path), 1024 * 1024)
+    for i in range(5):
+        cache.store('%064x' % i, None, [])
+        os.utime(cache.path('%064x' % i), (i, i))
+    os.remove(os.path.join(str(tmp_path), cache.SIZES_FILE))
+    cache.max_size = 3 * os.path.getsize(cache.path('%064x' % 0))
+    cache.store('%064x' % 5, None, [])
+    assert entries(str(tmp_path)) == ['%064x.json' % i for i in (3, 4, 5)]
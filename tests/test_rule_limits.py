@@ -0,0 +1,56 @@
+"""Checks that eba_validation.py stops a rule as soon as it reaches its error limit."""
+
+import altova_api.v2.xml as xml
+import altova_api.v2.xbrl as xbrl
+
+import eba_validation
+
+def rule(built, count):
+    """Returns a rule function which reports count errors and records how many it has built."""
+    def run(error_log):
+        for i in range(count):
+            built.append(i)
+            error_log.report(xbrl.Error.create('[EBA.2.19] Guidance on use of zeros and non-reported data.'))
+    return run
+
+def texts(error_log):
+    return [str(error) for error in error_log.errors]
+
+def test_rule_stops_at_its_limit():
+    error_log = xml.ErrorLog()
+    runner = eba_validation.RuleRunner(error_log, max_errors_per_rule=3)
+    built = []
+    runner.run('2.19', rule(built, 1000))
+    assert len(built) == 4
+    assert texts(error_log)[3:] == ['[EBA.2.19] Reporting stopped after 3 errors, the further errors were not checked.']
+    assert runner.limited and not runner.stopped
+    # The next rule is run with its own limit
+    runner.run('2.17', rule([], 2))
+    assert len(error_log.errors) == 6
+
+def test_rule_within_its_limit_runs_to_the_end():
+    error_log = xml.ErrorLog()
+    runner = eba_validation.RuleRunner(error_log, max_errors_per_rule=3)
+    runner.run('2.19', rule([], 3))
+    assert len(error_log.errors) == 3 and not runner.limited
+
+def test_max_errors_stops_validation():
+    error_log = xml.ErrorLog()
+    runner = eba_validation.RuleRunner(error_log, max_errors=5)
+    runner.run('2.17', rule([], 2))
+    built = []
+    runner.run('2.19', rule(built, 1000))
+    skipped = []
+    runner.run('3.8', rule(skipped, 10))
+    assert len(built) == 4 and not skipped
+    assert runner.stopped
+    assert texts(error_log)[-1] == '[EBA] Validation stopped after 5 errors, the further errors of rule 2.19 were not checked.'
+
+def test_fail_fast_stops_at_the_first_error():
+    error_log = xml.ErrorLog()
+    runner = eba_validation.RuleRunner(error_log, fail_fast=True)
+    built = []
+    runner.run('2.19', rule(built, 1000))
+    runner.run('2.17', rule([], 10))
+    assert len(built) == 2
+    assert texts(error_log)[1:] == ['[EBA] Validation stopped after the first error, the further errors of rule 2.19 were not checked.']
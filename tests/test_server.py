@@ -0,0 +1,270 @@
+"""Checks the HTTP front end and the worker pool of eba_server.py, with eba_streaming.py as validation engine."""
+
+import asyncio
+import http.client
+import json
+import os
+import socket
+import zipfile
+
+import pytest
+
+import eba_server
+import eba_streaming
+from generate_instance import ENTRY_POINT, METRICS_NAMESPACE, InstanceGenerator
+
+TIMEOUT = 60
+
+def run_server(test, workers=1, max_queue=4, taxonomy_packages=(), **kwargs):
+    """Runs test(pool, port) against a server listening on a free local port."""
+    async def main():
+        pool = eba_server.WorkerPool(workers, max_queue, taxonomy_packages)
+        server = eba_server.ValidationServer(pool, **kwargs)
+        listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+        try:
+            async with listener:
+                return await asyncio.wait_for(test(pool, listener.sockets[0].getsockname()[1]), TIMEOUT)
+        finally:
+            pool.close()
+    return asyncio.run(main())
+
+def http_request(port, method, target, body=None, headers=None, connection=None):
+    """Sends a request with http.client and returns the status, the headers and the body lines."""
+    connection = connection or http.client.HTTPConnection('127.0.0.1', port, timeout=TIMEOUT)
+    connection.request(method, target, body, headers or {})
+    response = connection.getresponse()
+    return response.status, dict(response.getheaders()), response.read().decode('utf-8').splitlines()
+
+async def request(port, method, target, body=None, headers=None, connection=None):
+    return await asyncio.to_thread(http_request, port, method, target, body, headers, connection)
+
+async def health(port):
+    status, _, lines = await request(port, 'GET', '/health')
+    assert status == 200
+    return json.loads(lines[0])
+
+async def wait_for_health(port, **expected):
+    while True:
+        state = await health(port)
+        if all(state[name] == value for name, value in expected.items()):
+            return state
+        await asyncio.sleep(0.01)
+
+async def raw_request(port, data):
+    """Sends raw bytes and returns everything the server sends until it closes the connection."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(data)
+    if not data.endswith(b'\r\n\r\n'):
+        # A truncated request, otherwise the connection is kept open and the server has to close it
+        writer.write_eof()
+    response = await reader.read()
+    writer.close()
+    return response
+
+def expected_findings(path, params=None):
+    return [json.loads(json.dumps(finding._asdict())) for finding in eba_streaming.StreamingValidator(params).validate_file(path)]
+
+@pytest.fixture(scope='module')
+def instance_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('instances') / 'instance.xbrl')
+    InstanceGenerator(contexts=20, facts=200, units=2, violations={'2.16': 0.05, '2.19': 0.05, '3.6': 0.05}, seed=1).write(path)
+    return path
+
+@pytest.fixture(scope='module')
+def large_instance_path(tmp_path_factory):
+    # Several megabytes of findings, more than the socket and pipe buffers hold
+    path = str(tmp_path_factory.mktemp('instances') / 'large.xbrl')
+    InstanceGenerator(contexts=100, facts=20000, units=2, violations={'2.16': 1.0}, seed=1).write(path)
+    return path
+
+def read_file(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_findings_are_streamed(instance_path):
+    expected = expected_findings(instance_path, {'max-id-length': '3'})
+
+    async def test(pool, port):
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=TIMEOUT)
+        status, headers, lines = await request(port, 'POST', '/validate?script-param=max-id-length:3', read_file(instance_path), connection=connection)
+        assert status == 200
+        assert headers['Content-Type'] == 'application/x-ndjson'
+        assert headers['Transfer-Encoding'] == 'chunked'
+        assert [json.loads(line) for line in lines[:-1]] == expected
+        summary = json.loads(lines[-1])
+        assert summary['findings'] == len(expected)
+        assert summary['errors'] == sum(finding['severity'] == eba_streaming.ERROR for finding in expected)
+        # The connection is kept alive for further requests
+        status, _, lines = await request(port, 'GET', '/health', connection=connection)
+        assert status == 200 and json.loads(lines[0]) == {'workers': 1, 'busy': 0, 'queued': 0}
+
+    assert expected
+    run_server(test)
+
+def test_requests_beyond_the_queue_are_rejected(instance_path):
+    body = read_file(instance_path)
+
+    async def test(pool, port):
+        # Occupy the only worker, so that the next request waits in the queue
+        worker = await pool.idle.get()
+        queued = asyncio.ensure_future(request(port, 'POST', '/validate', body))
+        await wait_for_health(port, busy=1, queued=1)
+        status, _, lines = await request(port, 'POST', '/validate', body)
+        assert status == 503
+        assert 'busy' in json.loads(lines[0])['error']
+        pool.idle.put_nowait(worker)
+        status, _, lines = await queued
+        assert status == 200
+        assert json.loads(lines[-1])['findings'] == len(lines) - 1
+        assert await health(port) == {'workers': 1, 'busy': 0, 'queued': 0}
+
+    run_server(test, max_queue=1)
+
+async def start_slow_request(port, path):
+    """Sends the instance on a connection with a small receive buffer and reads the first finding, while the worker is still busy."""
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect(('127.0.0.1', port))
+    reader, writer = await asyncio.open_connection(sock=sock)
+    body = read_file(path)
+    writer.write(b'POST /validate HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s' % (len(body), body))
+    assert await reader.readline() == b'HTTP/1.1 200 OK\r\n'
+    await reader.readuntil(b'\r\n\r\n')
+    size = int(await reader.readline(), 16)
+    assert json.loads(await reader.readexactly(size + 2))['rule'] == '2.16'
+    assert (await health(port))['busy'] == 1
+    return reader, writer
+
+async def read_chunks(reader):
+    """Returns the lines of the rest of a chunked response, which must end with the last chunk."""
+    data = b''
+    while True:
+        size = int(await reader.readline(), 16)
+        data += (await reader.readexactly(size + 2))[:-2]
+        if not size:
+            return data.decode('utf-8').splitlines()
+
+def test_worker_is_reused_after_client_disconnects(instance_path, large_instance_path):
+    async def test(pool, port):
+        pid = pool.workers[0].process.pid
+        reader, writer = await start_slow_request(port, large_instance_path)
+        # The worker is still sending findings when the client goes away
+        writer.transport.abort()
+        await wait_for_health(port, busy=0)
+        assert len(pool.workers) == 1 and pool.workers[0].process.pid == pid
+        status, _, lines = await request(port, 'POST', '/validate', read_file(instance_path))
+        assert status == 200
+        assert [json.loads(line) for line in lines[:-1]] == expected_findings(instance_path)
+        assert pool.workers[0].process.pid == pid
+
+    run_server(test)
+
+def test_worker_exit_fails_the_request(instance_path, large_instance_path):
+    async def test(pool, port):
+        pid = pool.workers[0].process.pid
+        reader, writer = await start_slow_request(port, large_instance_path)
+        pool.workers[0].process.kill()
+        lines = await read_chunks(reader)
+        summary = json.loads(lines[-1])
+        assert summary['failure'] == 'worker exited'
+        assert 0 < summary['findings'] == len(lines)
+        writer.close()
+        # The worker is replaced and serves the next request
+        await wait_for_health(port, busy=0)
+        assert len(pool.workers) == 1 and pool.workers[0].process.pid != pid
+        status, _, lines = await request(port, 'POST', '/validate', read_file(instance_path))
+        assert status == 200
+        assert [json.loads(line) for line in lines[:-1]] == expected_findings(instance_path)
+
+    run_server(test)
+
+def test_drain_leaves_replacing_a_dead_worker_to_the_loop():
+    async def test(pool, port):
+        worker = pool.workers[0]
+        worker.process.kill()
+        worker.process.join(TIMEOUT)
+        # drain runs on an executor thread and must neither stop nor start worker processes
+        assert not pool.drain(worker)
+        assert pool.workers == [worker]
+        replacement = pool.replace(worker)
+        assert pool.workers == [replacement] and replacement.process.is_alive()
+        pool.close()
+        assert pool.replace(replacement) is None and not replacement.process.is_alive()
+
+    run_server(test)
+
+@pytest.mark.parametrize('data, status', [
+    (b'GARBAGE\r\n\r\n', 400),
+    (b'GET /health\r\n\r\n', 400),
+    (b'GET /health SPDY/3\r\n\r\n', 400),
+    (b'GET /health HTTP/1.1\r\nNoColon\r\n\r\n', 400),
+    (b'GET /health HTTP/1.1\r\n Folded: value\r\n\r\n', 400),
+    (b'GET /health HTTP/1.1\r\nX-Long: ' + b'x' * 100000 + b'\r\n\r\n', 400),
+    (b'POST /validate HTTP/1.1\r\nContent-Length: abc\r\n\r\n', 400),
+    (b'POST /validate HTTP/1.1\r\nContent-Length: -1\r\n\r\n', 400),
+    (b'POST /validate HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n1\r\nx\r\n0\r\n\r\n', 501),
+    (b'POST /validate HTTP/1.1\r\nContent-Length: 100\r\n\r\n', 413),
+    (b'GET /health HTTP/1.1\r\nHost: local', None),
+])
+def test_malformed_requests(data, status):
+    async def test(pool, port):
+        response = await raw_request(port, data)
+        if status is None:
+            assert response == b''
+        else:
+            head, _, body = response.partition(b'\r\n\r\n')
+            lines = head.decode('latin-1').split('\r\n')
+            assert lines[0].startswith('HTTP/1.1 %d ' % status)
+            assert 'Connection: close' in lines[1:]
+            assert 'error' in json.loads(body)
+        # The server keeps serving other connections
+        assert await health(port) == {'workers': 1, 'busy': 0, 'queued': 0}
+
+    run_server(test, max_request_size=10)
+
+def test_instance_paths_are_refused_by_default(instance_path):
+    async def test(pool, port):
+        status, _, lines = await request(port, 'POST', '/validate', json.dumps({'instance': instance_path}), {'Content-Type': 'application/json'})
+        assert status == 403
+
+    run_server(test)
+
+def test_instance_paths_below_the_instance_root(instance_path, tmp_path):
+    root = os.path.dirname(instance_path)
+    tables = str(tmp_path / 'tables.json')
+
+    async def test(pool, port):
+        async def validate(request_body):
+            return await request(port, 'POST', '/validate', json.dumps(request_body), {'Content-Type': 'application/json'})
+
+        status, _, lines = await validate({'instance': os.path.basename(instance_path), 'params': {'max-id-length': 3}})
+        assert status == 200
+        assert [json.loads(line) for line in lines[:-1]] == expected_findings(instance_path, {'max-id-length': '3'})
+        assert (await validate({'instance': os.path.join(root, '..', os.path.basename(root), os.path.basename(instance_path))}))[0] == 200
+        for request_body in ({'instance': '../' + os.path.basename(root) + '-other/instance.xbrl'}, {'instance': os.path.abspath(__file__)}, {'instance': '/etc/passwd'},
+                             {'instance': os.path.basename(instance_path), 'taxonomy_tables': tables},
+                             {'instance': os.path.basename(instance_path), 'params': {'findings-output': str(tmp_path / 'findings.jsonl')}}):
+            assert (await validate(request_body))[0] == 403
+        status, _, _ = await request(port, 'POST', '/validate?taxonomy-tables=%s' % tables, read_file(instance_path))
+        assert status == 403
+        assert not os.path.exists(tmp_path / 'findings.jsonl')
+
+    run_server(test, instance_root=root)
+
+def test_taxonomy_package(instance_path, tmp_path):
+    # The entry point binds the metrics namespace to another prefix than the instance, which 3.5 reports
+    package = str(tmp_path / 'taxonomy.zip')
+    base, _, name = ENTRY_POINT.rpartition('/')
+    with zipfile.ZipFile(package, 'w') as archive:
+        archive.writestr('taxonomy/META-INF/catalog.xml', '<catalog xmlns="urn:oasis:names:tc:entity:xmlns:xml:catalog"><rewriteURI uriStartString="%s/" rewritePrefix="../schemas/"/></catalog>' % base)
+        archive.writestr('taxonomy/schemas/' + name, '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" xmlns:met="%s" targetNamespace="%s"/>' % (METRICS_NAMESPACE, METRICS_NAMESPACE))
+    expected = [json.loads(json.dumps(finding._asdict())) for finding in eba_streaming.StreamingValidator(None, None, [package]).validate_file(instance_path)]
+    assert any(finding['rule'] == '3.5' for finding in expected)
+
+    async def test(pool, port):
+        for _ in range(2):
+            status, _, lines = await request(port, 'POST', '/validate', read_file(instance_path))
+            assert status == 200
+            assert [json.loads(line) for line in lines[:-1]] == expected
+
+    run_server(test, taxonomy_packages=[package])